@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: AsyncIRCClient vs threaded IRCClient throughput and latency
+
+Run with: python -m benchmarks.bench_async_client
+
+Author: Preocts <preocts@preocts.com>
+"""
+import io
+import time
+import asyncio
+import logging
+import threading
+import statistics
+import contextlib
+from typing import List
+from typing import Tuple
+
+from src.ircclient import IRCClient
+from src.readqueue import READ_BLOCK
+from src.asyncircclient import AsyncIRCClient
+from src.model.message import Message
+
+FLOOD_LINES = 50_000
+PROBE_LINES = 200
+SCALE_CONNECTIONS = 200
+SCALE_LINES = 1_000
+
+FLOOD_LINE = b":user!user@user.tmi.twitch.tv PRIVMSG #bench :hello there chat\r\n"
+
+
+class StandInServer:
+    """ asyncio loopback server, floods or probes on request, on its own thread """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.port = 0
+        ready = threading.Event()
+        threading.Thread(target=self.__run, args=(ready,), daemon=True).start()
+        ready.wait()
+
+    def __run(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(
+            asyncio.start_server(self.__handle, "127.0.0.1", 0)
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        ready.set()
+        self.loop.run_forever()
+
+    async def __handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        while True:
+            try:
+                line = (await reader.readuntil(b"\r\n")).decode("UTF-8").strip()
+            except (asyncio.IncompleteReadError, ConnectionResetError):
+                break
+            if line.startswith("FLOOD "):
+                writer.write(FLOOD_LINE * int(line.split()[1]))
+                writer.write(b":tmi.twitch.tv NOTICE * :END\r\n")
+            elif line.startswith("PROBE "):
+                for _ in range(int(line.split()[1])):
+                    stamp = time.perf_counter()
+                    writer.write(f":tmi.twitch.tv NOTICE * :{stamp!r}\r\n".encode())
+                    await writer.drain()
+                    await asyncio.sleep(0.001)
+                writer.write(b":tmi.twitch.tv NOTICE * :END\r\n")
+            await writer.drain()
+        writer.close()
+
+
+class Collector:
+    """ Handler recording PRIVMSG counts and NOTICE probe latency """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.latencies: List[float] = []
+        self.done = threading.Event()
+
+    def __call__(self, message: Message) -> None:
+        if message.command == "PRIVMSG":
+            self.count += 1
+        elif message.command == "NOTICE":
+            if message.content == "END":
+                self.done.set()
+            else:
+                sent = float(message.content)
+                self.latencies.append((time.perf_counter() - sent) * 1_000_000)
+
+
+def threaded_run(port: int) -> Tuple[float, float]:
+    """ Returns (msg/s, p50 latency us) for the threaded IRCClient """
+    client = IRCClient("bench_bot", None, "127.0.0.1", port, read_policy=READ_BLOCK)
+    collector = Collector()
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.connect()
+        dispatcher = threading.Thread(target=client.dispatch, args=(collector,))
+        dispatcher.start()
+        tic = time.perf_counter()
+        client.send_to_server(f"FLOOD {FLOOD_LINES}")
+        collector.done.wait(120)
+        rate = collector.count / (time.perf_counter() - tic)
+        collector.done.clear()
+        client.send_to_server(f"PROBE {PROBE_LINES}")
+        collector.done.wait(120)
+        client.disconnect()
+        dispatcher.join()
+    return rate, statistics.median(collector.latencies)
+
+
+async def async_flood(port: int, lines: int, collector: Collector) -> None:
+    """ Connects one AsyncIRCClient and floods it with lines """
+    client = AsyncIRCClient("bench_bot", None, "127.0.0.1", port)
+    await client.connect()
+    await client.send_to_server(f"FLOOD {lines}")
+    async for message in client:
+        collector(message)
+        if message.command == "NOTICE":
+            break
+    await client.disconnect()
+
+
+async def async_run(port: int) -> Tuple[float, float, float]:
+    """ Returns (msg/s, p50 latency us, msg/s over many connections) """
+    collector = Collector()
+    tic = time.perf_counter()
+    await async_flood(port, FLOOD_LINES, collector)
+    rate = collector.count / (time.perf_counter() - tic)
+
+    client = AsyncIRCClient("bench_bot", None, "127.0.0.1", port)
+    await client.connect()
+    await client.send_to_server(f"PROBE {PROBE_LINES}")
+    async for message in client:
+        collector(message)
+        if collector.done.is_set():
+            break
+    await client.disconnect()
+
+    scaled = Collector()
+    tic = time.perf_counter()
+    await asyncio.gather(
+        *(async_flood(port, SCALE_LINES, scaled) for _ in range(SCALE_CONNECTIONS))
+    )
+    scaled_rate = scaled.count / (time.perf_counter() - tic)
+    return rate, statistics.median(collector.latencies), scaled_rate
+
+
+def main() -> None:
+    """ Print a side-by-side comparison """
+    logging.disable(logging.ERROR)
+    server = StandInServer()
+    t_rate, t_latency = threaded_run(server.port)
+    a_rate, a_latency, a_scaled = asyncio.run(async_run(server.port))
+    print(f"threaded: {t_rate:>10,.0f} msg/s  p50 latency {t_latency:8.1f}us")
+    print(f"asyncio : {a_rate:>10,.0f} msg/s  p50 latency {a_latency:8.1f}us")
+    print(
+        f"asyncio : {a_scaled:>10,.0f} msg/s over {SCALE_CONNECTIONS} connections "
+        "in one loop"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: dispatch thread cost of print() vs ChatLogger.log()
+
+Run with: python -m benchmarks.bench_chatlog
+
+Author: Preocts <preocts@preocts.com>
+"""
+import os
+import sys
+import time
+import tempfile
+import contextlib
+
+from src.chatlog import ChatLogger
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+
+LINES = 200_000
+
+
+def main() -> None:
+    """ Time the caller side of each, then the writer drain of each format """
+    messages = [Message.from_string(line) for line in twitch_corpus(LINES)]
+    with tempfile.TemporaryDirectory() as directory:
+        sink = os.path.join(directory, "stdout.txt")
+        with open(sink, "w", encoding="UTF-8") as stdout:
+            with contextlib.redirect_stdout(stdout):
+                tic = time.perf_counter()
+                for message in messages:
+                    print(f"{message.channel}>>> {message.message}")
+                    sys.stdout.flush()
+                elapsed = time.perf_counter() - tic
+        print(f"print+flush       {LINES / elapsed:>12,.0f} msg/s on the caller")
+
+        for fmt, compress in (("jsonl", False), ("bin", False), ("bin", True)):
+            chat_log = ChatLogger(
+                os.path.join(directory, f"{fmt}{compress}"),
+                fmt,
+                compress,
+                queue_size=LINES,
+            ).start()
+            tic = time.perf_counter()
+            for message in messages:
+                chat_log.log(message.channel or "", message)
+            queued = time.perf_counter() - tic
+            chat_log.stop()
+            total = time.perf_counter() - tic
+            size = sum(entry.stat().st_size for entry in os.scandir(chat_log.directory))
+            print(
+                f"{fmt:<5} gzip={compress!s:<5} {LINES / queued:>12,.0f} msg/s on the "
+                f"caller, {LINES / total:>10,.0f} msg/s written, "
+                f"{size / LINES:5.1f} B/msg"
+            )
+
+
+if __name__ == "__main__":
+    main()
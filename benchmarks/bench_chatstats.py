@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: ChatAnalytics sketches vs exact per-channel counting
+
+Run with: python -m benchmarks.bench_chatstats [lines]
+
+Author: Preocts <preocts@preocts.com>
+"""
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Set
+
+from src.chatstats import COUNTED_COMMANDS
+from src.chatstats import ChatAnalytics
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+
+LINES = 1_000_000
+CHANNELS = 10
+USERS = 200_000
+# Zipf exponent of user activity, a few users do most of the talking
+SKEW = 1.1
+TOP = 10
+
+
+class ExactStats:
+    """ Exact counting: a Counter per stat and a set of every user """
+
+    def __init__(self) -> None:
+        """ Empty """
+        self.chatters: Dict[str, Counter] = {}
+        self.emotes: Dict[str, Counter] = {}
+        self.users: Dict[str, Set[str]] = {}
+
+    def add(self, message: Message) -> None:
+        """ Count one message """
+        if message.command not in COUNTED_COMMANDS or message.channel is None:
+            return
+        channel = message.channel
+        nick = message.nick or ""
+        self.chatters.setdefault(channel, Counter())[nick] += 1
+        self.users.setdefault(channel, set()).add(nick)
+        spans = message.emotes
+        if spans:
+            content = message.content
+            emotes = self.emotes.setdefault(channel, Counter())
+            for ranges in spans.values():
+                for start, end in ranges:
+                    emotes[content[start : end + 1]] += 1
+
+
+def timed(stats: Any, messages: List[Message]) -> float:
+    """ Seconds to feed every message """
+    tic = time.perf_counter()
+    for message in messages:
+        stats.add(message)
+    return time.perf_counter() - tic
+
+
+def retained(stats: Any, messages: List[Message]) -> int:
+    """ Bytes held by stats after feeding every message """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for message in messages:
+        stats.add(message)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size
+
+
+def main() -> None:
+    """ Feed the same corpus to both, then compare rate, memory, accuracy """
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else LINES
+    messages = [
+        Message.from_string(line)
+        for line in twitch_corpus(lines, CHANNELS, USERS, skew=SKEW)
+    ]
+    analytics = ChatAnalytics(window=10 ** 9)
+    exact = ExactStats()
+    sketch_time = timed(analytics, messages)
+    exact_time = timed(exact, messages)
+    sketch_size = retained(ChatAnalytics(window=10 ** 9), messages)
+    exact_size = retained(ExactStats(), messages)
+    print(f"{lines:,} lines, {CHANNELS} channels, {USERS:,} users, zipf {SKEW}")
+    print(
+        f"sketches {lines / sketch_time:>10,.0f} msg/s "
+        f"{sketch_size / CHANNELS / 1024:>9,.0f} KiB/channel"
+    )
+    print(
+        f"exact    {lines / exact_time:>10,.0f} msg/s "
+        f"{exact_size / CHANNELS / 1024:>9,.0f} KiB/channel"
+    )
+
+    recall: List[float] = []
+    count_error: List[float] = []
+    unique_error: List[float] = []
+    for channel in sorted(exact.chatters):
+        snapshot = analytics.snapshot(channel)
+        assert snapshot is not None
+        true_top = exact.chatters[channel].most_common(TOP)
+        found = {nick for nick, _ in snapshot["top_chatters"]}
+        recall.append(len(found & {nick for nick, _ in true_top}) / TOP)
+        estimates = dict(snapshot["top_chatters"])
+        count_error.extend(
+            (estimates[nick] - count) / count
+            for nick, count in true_top
+            if nick in estimates
+        )
+        true_users = len(exact.users[channel])
+        unique_error.append(abs(snapshot["unique_users"] - true_users) / true_users)
+    print(f"top-{TOP} chatter recall   {sum(recall) / len(recall):8.1%}")
+    print(f"top chatter count error {max(count_error):8.2%} worst overshoot")
+    print(
+        f"unique users error      {sum(unique_error) / len(unique_error):8.2%} mean, "
+        f"{max(unique_error):.2%} worst"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: CommandRouter vs an if-chain over 500 registered commands
+
+Run with: python -m benchmarks.bench_commandrouter
+
+Author: Preocts <preocts@preocts.com>
+"""
+import random
+import time
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+from src.commandrouter import CommandContext
+from src.commandrouter import CommandRouter
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+
+COMMANDS = 500
+CHANNELS = 50
+CORPUS_LINES = 200_000
+COMMAND_SHARE = 0.05
+
+
+def noop(context: CommandContext) -> None:
+    """ Command handler that does nothing """
+
+
+def if_chain(commands: List[Tuple[str, str]]) -> Callable[[Message], bool]:
+    """ The message_handler style: check each (channel, command) in turn """
+
+    def handler(message: Message) -> bool:
+        if message.command != "PRIVMSG":
+            return False
+        for channel, command in commands:
+            if channel in message.params and message.content.split(" ")[0] == command:
+                return True
+        return False
+
+    return handler
+
+
+def main() -> None:
+    """ Route a corpus where a share of chat lines are commands """
+    rng = random.Random(1)
+    commands = [
+        (f"#channel{rng.randrange(CHANNELS)}", f"!cmd{idx}") for idx in range(COMMANDS)
+    ]
+    router = CommandRouter()
+    for channel, command in commands:
+        router.register(command[1:], noop, channel=channel)
+
+    lines = twitch_corpus(CORPUS_LINES, channels=CHANNELS)
+    for idx, line in enumerate(lines):
+        if line.startswith("@") and rng.random() < COMMAND_SHARE:
+            channel, command = rng.choice(commands)
+            lines[idx] = f":u!u@u.tmi.twitch.tv PRIVMSG {channel} :{command} arg"
+    messages = [Message.from_string(line) for line in lines]
+
+    for label, handler in (("if-chain", if_chain(commands)), ("router", router.route)):
+        tic = time.perf_counter()
+        matched = sum(1 for message in messages if handler(message))
+        rate = len(messages) / (time.perf_counter() - tic)
+        print(f"{label:<9} {rate:>12,.0f} msg/s  {matched:,} commands routed")
+
+
+if __name__ == "__main__":
+    main()
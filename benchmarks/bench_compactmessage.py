@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: memory per message of Message, CompactMessage, and MessageBatch
+
+Run with: python -m benchmarks.bench_compactmessage [lines]
+
+Author: Preocts <preocts@preocts.com>
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from typing import Any
+from typing import Callable
+from typing import List
+
+from src.model.compactmessage import CompactMessage
+from src.model.compactmessage import Interner
+from src.model.compactmessage import MessageBatch
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+
+CORPUS_LINES = 1_000_000
+
+
+def measure(label: str, raw: List[bytes], build: Callable[[List[bytes]], Any]) -> None:
+    """ Bytes held per message by whatever build returns, and build time """
+    gc.collect()
+    tracemalloc.start()
+    tic = time.perf_counter()
+    held = build(raw)
+    elapsed = time.perf_counter() - tic
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<16} {current / len(raw):>8,.1f} B/msg  "
+        f"{current / 1e6:>9,.1f} MB  {elapsed:6.2f} s (traced)"
+    )
+    del held
+
+
+def build_compact(raw: List[bytes]) -> List[CompactMessage]:
+    """ Decode into compact messages sharing one interner """
+    interner = Interner()
+    return [
+        CompactMessage.from_message(Message.from_bytes(line), interner) for line in raw
+    ]
+
+
+def build_batch(raw: List[bytes]) -> MessageBatch:
+    """ Decode into a columnar batch """
+    batch = MessageBatch()
+    batch.extend(Message.from_bytes(line) for line in raw)
+    return batch
+
+
+def main() -> None:
+    """ Decode the same raw corpus into each form, as the read loop would """
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else CORPUS_LINES
+    for with_tags in (True, False):
+        corpus = twitch_corpus(lines, with_tags=with_tags)
+        raw = [line.encode("UTF-8") for line in corpus]
+        del corpus
+        mean = sum(len(line) for line in raw) / len(raw)
+        print(f"{lines:,} lines, tags={with_tags}, mean raw line {mean:.1f} B")
+        measure("Message", raw, lambda raw: [Message.from_bytes(b) for b in raw])
+        measure("CompactMessage", raw, build_compact)
+        measure("MessageBatch", raw, build_batch)
+        del raw
+
+    batch = build_batch([line.encode("UTF-8") for line in twitch_corpus(lines)])
+    tic = time.perf_counter()
+    top = batch.count_by("nick").most_common(3)
+    per_command = batch.count_by("command")
+    elapsed = time.perf_counter() - tic
+    print(f"count_by nick + command over {len(batch):,}: {elapsed:.3f} s")
+    print(f"top users {top}, commands {dict(per_command)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: DecayingCounter engines vs the original list-based counter
+
+Run with: python -m benchmarks.bench_decayingcounter
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import datetime
+import tracemalloc
+from functools import partial
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+from src.decayingcounter import DecayingCounter
+
+GROUPS = 100_000
+INCS_PER_GROUP = 5
+HOT_GROUP_INCS = 100_000
+
+
+class LegacyDecayingCounter:
+    """ The original list-based counter, kept here as the 'before' reference """
+
+    def __init__(self, life_span: int, max_count: int) -> None:
+        self.max = max_count
+        self.life_span = datetime.timedelta(seconds=life_span)
+        self.groups: Dict[str, List[datetime.datetime]] = {}
+
+    def inc_to_max(self, group_name: str) -> bool:
+        """ Increment unless group is at max, True if incremented """
+        if self.count(group_name) < self.max:
+            self.inc(group_name)
+            return True
+        return False
+
+    def inc(self, group_name: str) -> int:
+        """ Add a timestamp to group, returns the new count """
+        self.clean_group(group_name)
+        if group_name not in self.groups:
+            self.groups[group_name] = []
+        self.groups[group_name].insert(0, datetime.datetime.now())
+        return len(self.groups[group_name])
+
+    def count(self, group_name: str) -> int:
+        """ Timestamps in group within life_span """
+        self.clean_group(group_name)
+        return len(self.groups[group_name]) if group_name in self.groups else 0
+
+    def clean_group(self, group: str) -> None:
+        """ Pop timestamps older than life_span from the end of group """
+        while self.groups.get(group, []):
+            if (datetime.datetime.now() - self.groups[group][-1]) > self.life_span:
+                self.groups[group].pop()
+            else:
+                break
+
+
+def timed(label: str, func: Callable[[], Any], operations: int) -> None:
+    """ Print ops/sec and peak traced memory of func """
+    tracemalloc.start()
+    tic = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - tic
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"  {label:<10} {operations / elapsed:>12,.0f} ops/s "
+        f"peak {peak / 1_048_576:8.1f} MiB"
+    )
+
+
+def many_groups(counter: Any) -> None:
+    """ GROUPS groups round-robin, INCS_PER_GROUP each through inc_to_max """
+    names = [f"group{idx}" for idx in range(GROUPS)]
+    for _ in range(INCS_PER_GROUP):
+        for name in names:
+            counter.inc_to_max(name)
+            counter.count(name)
+
+
+def hot_group(counter: Any) -> None:
+    """ One group taking HOT_GROUP_INCS increments """
+    for _ in range(HOT_GROUP_INCS):
+        counter.inc("hot")
+
+
+def main() -> None:
+    """ Compare engines on many groups, one hot group, and idle eviction """
+    factories = {
+        "legacy": lambda: LegacyDecayingCounter(30, 20),
+        "window": lambda: DecayingCounter(30, 20),
+        "gcra": lambda: DecayingCounter(30, 20, gcra=True),
+    }
+    print(f"{GROUPS:,} groups x {INCS_PER_GROUP} inc_to_max + count")
+    for label, factory in factories.items():
+        counter = factory()
+        timed(label, partial(many_groups, counter), GROUPS * INCS_PER_GROUP * 2)
+
+    print(f"1 group x {HOT_GROUP_INCS:,} inc")
+    for label in ("legacy", "window"):
+        counter = factories[label]()
+        timed(label, partial(hot_group, counter), HOT_GROUP_INCS)
+
+    print(f"{GROUPS:,} idle groups after life_span")
+    for label in ("window", "gcra"):
+        counter = DecayingCounter(1, 20, gcra=label == "gcra")
+        for idx in range(GROUPS):
+            counter.inc(f"group{idx}")
+        time.sleep(1.1)
+        counter.inc("wake")
+        print(f"  {label:<10} {len(counter):>12,} groups retained")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: idle CPU and peak throughput of IRCClient.dispatch
+
+Run with: python -m benchmarks.bench_dispatch
+
+Author: Preocts <preocts@preocts.com>
+"""
+import io
+import time
+import logging
+import threading
+import contextlib
+
+from src.ircclient import IRCClient
+from src.readqueue import READ_BLOCK
+from src.model.message import Message
+from tests.fakeserver import FakeIRCServer
+
+IDLE_SECONDS = 2.0
+FLOOD_LINES = 50_000
+
+
+class CountingHandler:
+    """ Handler that counts messages and flags when a target is reached """
+
+    def __init__(self, target: int) -> None:
+        self.target = target
+        self.count = 0
+        self.done = threading.Event()
+
+    def __call__(self, message: Message) -> None:
+        if message.command == "PRIVMSG":
+            self.count += 1
+            if self.count >= self.target:
+                self.done.set()
+
+
+def main() -> None:
+    """ Measure idle dispatch CPU then flood the client from the server """
+    logging.disable(logging.ERROR)
+    server = FakeIRCServer().start()
+    client = IRCClient(
+        "bench_bot", None, server.host, server.port, read_policy=READ_BLOCK
+    )
+    handler = CountingHandler(FLOOD_LINES)
+    client.connect()
+    server.wait_for_clients()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        dispatcher = threading.Thread(target=client.dispatch, args=(handler,))
+        dispatcher.start()
+        time.sleep(0.2)
+
+        cpu_start = time.process_time()
+        time.sleep(IDLE_SECONDS)
+        idle_cpu = (time.process_time() - cpu_start) / IDLE_SECONDS * 100
+
+        line = ":user!user@user.tmi.twitch.tv PRIVMSG #bench :hello there chat"
+        payload = f"{line}\r\n".encode("UTF-8") * FLOOD_LINES
+        tic = time.perf_counter()
+        server.send_raw(payload)
+        handler.done.wait(timeout=120)
+        elapsed = time.perf_counter() - tic
+
+        client.disconnect()
+        dispatcher.join()
+    server.stop()
+
+    print(f"idle_cpu={idle_cpu:6.2f}%")
+    print(
+        f"dispatched={handler.count} in {elapsed:.3f}s "
+        f"({handler.count / elapsed:,.0f} msg/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
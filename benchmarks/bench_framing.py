@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: socket read framing, legacy concat/decode vs LineBuffer
+
+Run with: python -m benchmarks.bench_framing
+
+Author: Preocts <preocts@preocts.com>
+"""
+import io
+import time
+import logging
+import threading
+import contextlib
+from typing import List
+
+from src.ircclient import IRCClient
+from src.readqueue import READ_BLOCK
+from src.linebuffer import LineBuffer
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+from tests.fakeserver import FakeIRCServer
+
+CORPUS_LINES = 200_000
+LONG_LINES = 500
+LONG_LINE_SIZE = 16_384
+
+
+def legacy_frame(stream: bytes, chunk: int) -> int:
+    """ The original reader framing, kept here as the 'before' reference """
+    count = 0
+    remaining = b""
+    for idx in range(0, len(stream), chunk):
+        segment = remaining + stream[idx : idx + chunk]
+        lines = segment.decode("UTF-8", errors="replace").split("\r\n")
+        remaining = lines.pop().encode("UTF-8")
+        count += len(lines)
+    return count
+
+
+def buffer_frame(stream: bytes, chunk: int) -> int:
+    """ LineBuffer framing over the same chunks, decoding each line """
+    count = 0
+    buffer = LineBuffer(read_size=chunk)
+    with memoryview(stream) as view:
+        for idx in range(0, len(stream), chunk):
+            buffer.feed(view[idx : idx + chunk])
+            for line in buffer.lines():
+                line.decode("UTF-8", errors="replace")
+                count += 1
+    return count
+
+
+def framing(label: str, stream: bytes, chunk: int) -> None:
+    """ Print lines/sec of both framings over stream in chunk sized reads """
+    for name, frame in (("legacy", legacy_frame), ("LineBuffer", buffer_frame)):
+        tic = time.perf_counter()
+        count = frame(stream, chunk)
+        rate = count / (time.perf_counter() - tic)
+        print(f"  {label:<28} {name:<10} {rate:>12,.0f} lines/s")
+
+
+def loopback(lines: List[str]) -> None:
+    """ Stream the corpus from the fake server through IRCClient.dispatch """
+    server = FakeIRCServer().start()
+    client = IRCClient(
+        "bench_bot", None, server.host, server.port, read_policy=READ_BLOCK
+    )
+    done = threading.Event()
+    seen = [0]
+
+    def handler(message: Message) -> None:
+        seen[0] += 1
+        if message.command == "NOTICE" and message.content == "END":
+            done.set()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.connect()
+        server.wait_for_clients()
+        dispatcher = threading.Thread(target=client.dispatch, args=(handler,))
+        dispatcher.start()
+        payload = ("\r\n".join(lines) + "\r\n:tmi NOTICE * :END\r\n").encode()
+        tic = time.perf_counter()
+        server.send_raw(payload)
+        done.wait(120)
+        elapsed = time.perf_counter() - tic
+        client.disconnect()
+        dispatcher.join()
+    server.stop()
+    print(f"  loopback dispatch {seen[0]:,} lines {seen[0] / elapsed:>12,.0f} lines/s")
+
+
+def main() -> None:
+    """ Chat-sized lines at several read sizes, very long lines, and loopback """
+    logging.disable(logging.ERROR)
+    corpus = twitch_corpus(CORPUS_LINES)
+    stream = ("\r\n".join(corpus) + "\r\n").encode("UTF-8")
+    print(f"{CORPUS_LINES:,} tagged Twitch lines, {len(stream) / 1_048_576:.1f} MiB")
+    for chunk in (512, 4_096, 65_536):
+        framing(f"{chunk} byte reads", stream, chunk)
+    long_stream = (("x" * LONG_LINE_SIZE + "\r\n") * LONG_LINES).encode("UTF-8")
+    print(f"{LONG_LINES} lines of {LONG_LINE_SIZE:,} bytes")
+    framing("512 byte reads", long_stream, 512)
+    print("end to end")
+    loopback(corpus)
+
+
+if __name__ == "__main__":
+    main()
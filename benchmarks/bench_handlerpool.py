@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: inline handlers vs HandlerPool thread and process lanes
+
+Run with: python -m benchmarks.bench_handlerpool
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+from typing import Callable
+from typing import List
+
+from src.handlerpool import HandlerPool
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+
+MESSAGES = 2_000
+IO_SECONDS = 0.001
+CPU_LOOPS = 20_000
+
+
+def io_handler(message: Message) -> None:
+    """ Waits like a handler calling out to a web API """
+    time.sleep(IO_SECONDS)
+
+
+def cpu_handler(message: Message) -> None:
+    """ Burns CPU like a handler scoring chat text """
+    total = 0
+    for idx in range(CPU_LOOPS):
+        total += idx * len(message.content)
+
+
+def run(label: str, handler: Callable[[Message], None], messages: List[Message]):
+    """ Print msg/s inline, on 8 thread lanes, and on 4 process lanes """
+    tic = time.perf_counter()
+    for message in messages:
+        handler(message)
+    inline = len(messages) / (time.perf_counter() - tic)
+    print(f"{label}\n  inline            {inline:>10,.0f} msg/s")
+    for mode, workers in (("thread", 8), ("process", 4)):
+        pool = HandlerPool([handler], workers=workers, mode=mode).start()
+        tic = time.perf_counter()
+        for message in messages:
+            pool.submit(message)
+        pool.stop()
+        rate = len(messages) / (time.perf_counter() - tic)
+        stats = pool.metrics()[handler.__qualname__]
+        print(
+            f"  {mode:<7} x{workers:<2}       {rate:>10,.0f} msg/s "
+            f"mean {stats.mean * 1_000_000:8.1f}us max {stats.max * 1_000_000:9.1f}us"
+        )
+
+
+def main() -> None:
+    """ I/O bound and CPU bound handlers over a 50 channel corpus """
+    messages = [
+        Message.from_string(line) for line in twitch_corpus(MESSAGES, channels=50)
+    ]
+    run("I/O bound handler", io_handler, messages)
+    run("CPU bound handler", cpu_handler, messages)
+
+
+if __name__ == "__main__":
+    main()
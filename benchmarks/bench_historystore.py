@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: HistoryStore insert throughput and query rates
+
+Run with: python -m benchmarks.bench_historystore
+
+Author: Preocts <preocts@preocts.com>
+"""
+import os
+import time
+import random
+import tempfile
+
+from src.historystore import HistoryStore
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+
+LINES = 200_000
+QUERIES = 2_000
+# Searches scan every row in the window, so fewer are timed
+SEARCHES = 100
+
+
+def main() -> None:
+    """ Time add() on the caller, the writer drain, then each query """
+    messages = [Message.from_string(line) for line in twitch_corpus(LINES)]
+    pairs = [
+        (message.channel or "", message.nick or "")
+        for message in messages
+        if message.command == "PRIVMSG"
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(
+            os.path.join(directory, "history.db"), queue_size=LINES
+        ).start()
+        tic = time.perf_counter()
+        for message in messages:
+            store.add(message)
+        queued = time.perf_counter() - tic
+        store.flush()
+        total = time.perf_counter() - tic
+        print(
+            f"insert {store.count():,} rows: {LINES / queued:>12,.0f} msg/s on the "
+            f"caller, {LINES / total:>10,.0f} msg/s committed"
+        )
+
+        random.seed(20)
+        picks = [random.choice(pairs) for _ in range(QUERIES)]
+        queries = (
+            ("last_by_user", QUERIES, lambda pick: store.last_by_user(*pick)),
+            ("last_in_channel", QUERIES, lambda pick: store.last_in_channel(pick[0])),
+            (
+                "search channel",
+                SEARCHES,
+                lambda pick: store.search("kappa", 600, pick[0]),
+            ),
+            ("search all", SEARCHES, lambda pick: store.search("kappa", 600)),
+        )
+        for name, count, query in queries:
+            tic = time.perf_counter()
+            for pick in picks[:count]:
+                query(pick)
+            elapsed = time.perf_counter() - tic
+            print(
+                f"{name:<16} {count / elapsed:>10,.0f} queries/s "
+                f"{elapsed / count * 1e3:8.3f} ms each"
+            )
+        store.stop()
+
+
+if __name__ == "__main__":
+    main()
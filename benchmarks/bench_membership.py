@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: MembershipIndex memory and lookups vs plain dicts of sets
+
+Run with: python -m benchmarks.bench_membership
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import random
+import tracemalloc
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Set
+
+from src.membership import MembershipIndex
+from src.model.message import Message
+from benchmarks.corpus import user_names
+
+CHANNELS = 2_000
+USERS = 300_000
+# Viewers of the largest channels, every other channel gets SMALL_CHANNEL
+BIG_CHANNELS = (100_000, 50_000, 20_000, 10_000, 10_000)
+SMALL_CHANNEL = 150
+# Nicks per 353 line, as Twitch sends them
+NAMES_PER_LINE = 100
+LOOKUPS = 200_000
+
+
+class NaiveIndex:
+    """ Forward and reverse dicts of sets holding the parsed strings as is """
+
+    def __init__(self) -> None:
+        """ Empty """
+        self.members: Dict[str, Set[str]] = {}
+        self.channels: Dict[str, Set[str]] = {}
+
+    def __call__(self, message: Message) -> None:
+        """ Only 353 replies are fed here """
+        channel = message.channel or ""
+        members = self.members.setdefault(channel, set())
+        for nick in message.content.split():
+            members.add(nick)
+            self.channels.setdefault(nick, set()).add(channel)
+
+    def channels_of(self, nick: str) -> Set[str]:
+        """ Channels of nick """
+        return self.channels.get(nick, set())
+
+
+def names_replies(rng: random.Random, names: List[str]) -> List[str]:
+    """ 353 lines filling every channel from one pool of users """
+    sizes = list(BIG_CHANNELS) + [SMALL_CHANNEL] * (CHANNELS - len(BIG_CHANNELS))
+    lines = []
+    for idx, size in enumerate(sizes):
+        viewers = rng.sample(names, size)
+        for start in range(0, size, NAMES_PER_LINE):
+            chunk = " ".join(viewers[start : start + NAMES_PER_LINE])
+            lines.append(f":bot.tmi.twitch.tv 353 bot = #channel{idx} :{chunk}")
+    return lines
+
+
+def build(index: Any, lines: List[str]) -> int:
+    """ Bytes held by index after parsing and feeding every line """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for line in lines:
+        index(Message.from_string(line))
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size
+
+
+def main() -> None:
+    """ Fill both from the same replies, compare memory and lookup rate """
+    rng = random.Random(23)
+    names = user_names(USERS, 23)
+    lines = names_replies(rng, names)
+    memberships = sum(BIG_CHANNELS) + SMALL_CHANNEL * (CHANNELS - len(BIG_CHANNELS))
+    print(f"{CHANNELS:,} channels, {memberships:,} memberships, {len(lines):,} lines")
+    index = MembershipIndex("bot")
+    naive = NaiveIndex()
+    for name, built in (("MembershipIndex", index), ("dicts of sets", naive)):
+        size = build(built, lines)
+        print(
+            f"{name:<16} {size / 2**20:8.1f} MiB "
+            f"{size / memberships:6.1f} B/membership"
+        )
+
+    picks = [rng.choice(names) for _ in range(LOOKUPS)]
+    for name, lookup in (
+        ("MembershipIndex", index.channels_of),
+        ("dicts of sets", naive.channels_of),
+    ):
+        tic = time.perf_counter()
+        for nick in picks:
+            lookup(nick)
+        elapsed = time.perf_counter() - tic
+        print(f"{name:<16} channels_of {elapsed / LOOKUPS * 1e9:8.0f} ns")
+
+    tic = time.perf_counter()
+    for nick in picks[:10_000]:
+        index.add("#channel0", nick)
+        index.remove("#channel0", nick)
+    elapsed = time.perf_counter() - tic
+    print(f"JOIN+PART pair   {elapsed / 10_000 * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
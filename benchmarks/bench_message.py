@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Micro-benchmark: Message parsing lines/sec, legacy vs current parser
+
+Run with: python -m benchmarks.bench_message
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+from typing import Any
+from typing import Callable
+from typing import List
+
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+
+CORPUS_LINES = 100_000
+ROUNDS = 3
+
+
+def legacy_from_string(message: str) -> Any:
+    """ The original multi-split parser, kept here as the 'before' reference """
+    if not message:
+        return None
+    prefix = message.split()[0] if message.startswith(":") else None
+    command = message.split()[1] if prefix else message.split()[0]
+    params = message.split()[2:] if prefix else message.split()[1:]
+    middle, trailing, idx = [None, None, 0]
+    if params:
+        for idx, param in enumerate(params):
+            if param.startswith(":"):
+                break
+        middle = params[0:idx] if params[idx].startswith(":") else params[0 : idx + 1]
+        trailing = params[idx:] if params[idx].startswith(":") else []
+    content = (" ".join(trailing)).lstrip(":") if trailing else ""
+    return (message, prefix, command, middle, content)
+
+
+def rate(parse: Callable[[Any], Any], corpus: List[Any]) -> float:
+    """ Best lines/sec of parse over corpus """
+    best = 0.0
+    for _ in range(ROUNDS):
+        tic = time.perf_counter()
+        for line in corpus:
+            parse(line)
+        best = max(best, len(corpus) / (time.perf_counter() - tic))
+    return best
+
+
+def main() -> None:
+    """ Report lines/sec for each corpus and parser """
+    for label, with_tags in (("untagged", False), ("tagged", True)):
+        corpus = twitch_corpus(CORPUS_LINES, with_tags=with_tags)
+        raw = [line.encode("UTF-8") for line in corpus]
+        print(f"{label} corpus, {CORPUS_LINES:,} lines")
+        print(f"  legacy from_string : {rate(legacy_from_string, corpus):>12,.0f}/s")
+        print(f"  from_string        : {rate(Message.from_string, corpus):>12,.0f}/s")
+        print(f"  from_bytes         : {rate(Message.from_bytes, raw):>12,.0f}/s")
+        if with_tags:
+            sent_ts = rate(lambda line: Message.from_string(line).sent_ts, corpus)
+            all_tags = rate(lambda line: Message.from_string(line).tags, corpus)
+            print(f"  + sent_ts lookup   : {sent_ts:>12,.0f}/s")
+            print(f"  + full tags dict   : {all_tags:>12,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
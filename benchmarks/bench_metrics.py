@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: dispatch throughput with runtime metrics on and off
+
+Run with: python -m benchmarks.bench_metrics
+
+Author: Preocts <preocts@preocts.com>
+"""
+import io
+import time
+import logging
+import threading
+import contextlib
+import statistics
+from typing import Dict
+from typing import List
+
+from src.ircclient import IRCClient
+from src.metrics import Histogram
+from src.readqueue import READ_BLOCK
+from benchmarks.bench_dispatch import CountingHandler
+from tests.fakeserver import FakeIRCServer
+
+FLOOD_LINES = 50_000
+ROUNDS = 9
+OBSERVATIONS = 1_000_000
+
+
+def flood(metrics: bool) -> float:
+    """ Messages per second dispatched for one flood """
+    server = FakeIRCServer().start()
+    client = IRCClient(
+        "bench_bot",
+        None,
+        server.host,
+        server.port,
+        metrics=metrics,
+        read_policy=READ_BLOCK,
+    )
+    handler = CountingHandler(FLOOD_LINES)
+    client.connect()
+    server.wait_for_clients()
+    with contextlib.redirect_stdout(io.StringIO()):
+        dispatcher = threading.Thread(target=client.dispatch, args=(handler,))
+        dispatcher.start()
+        line = ":user!user@user.tmi.twitch.tv PRIVMSG #bench :hello there chat"
+        payload = f"{line}\r\n".encode("UTF-8") * FLOOD_LINES
+        tic = time.perf_counter()
+        server.send_raw(payload)
+        handler.done.wait(timeout=120)
+        elapsed = time.perf_counter() - tic
+        client.disconnect()
+        dispatcher.join()
+    server.stop()
+    return handler.count / elapsed
+
+
+def main() -> None:
+    """ Alternate rounds with metrics off and on, report the median of each """
+    logging.disable(logging.ERROR)
+    hist = Histogram()
+    tic = time.perf_counter()
+    for _ in range(OBSERVATIONS):
+        hist.observe(time.perf_counter() - tic)
+    observe_ns = (time.perf_counter() - tic) / OBSERVATIONS * 1e9
+    print(f"timed observe: {observe_ns:,.0f} ns/op")
+
+    results: Dict[bool, List[float]] = {False: [], True: []}
+    for _ in range(ROUNDS):
+        for metrics in (False, True):
+            results[metrics].append(flood(metrics))
+    off = statistics.median(results[False])
+    on = statistics.median(results[True])
+    print(f"metrics off: {off:>10,.0f} msg/s")
+    print(f"metrics on:  {on:>10,.0f} msg/s  overhead {(off - on) / off:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: one compiled RuleSet vs checking rules one at a time
+
+Run with: python -m benchmarks.bench_modfilter [lines]
+
+Author: Preocts <preocts@preocts.com>
+"""
+import re
+import sys
+import time
+import random
+import logging
+from typing import List
+
+from src.model.message import Message
+from src.modfilter import ANY_CHANNEL
+from src.modfilter import ModerationFilter
+from src.modfilter import Rule
+from benchmarks.corpus import WORDS
+from benchmarks.corpus import twitch_corpus
+
+LINES = 1_000_000
+PHRASES = 4_950
+REGEXES = 50
+# Lines given to the rule-at-a-time loop, its rate is extrapolated
+NAIVE_LINES = 2_000
+
+
+def make_rules(rng: random.Random) -> List[Rule]:
+    """ Random phrases, a few built from chat words so some lines match """
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    rules = []
+    for idx in range(PHRASES):
+        if idx % 500 == 0:
+            phrase = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)}"
+        else:
+            phrase = "".join(rng.choice(letters) for _ in range(rng.randint(5, 14)))
+        rules.append(Rule(phrase, "log"))
+    for idx in range(REGEXES):
+        rules.append(Rule(rf"free\s+{idx}\d*\s*coins", "log", regex=True))
+    return rules
+
+
+def main() -> None:
+    """ Time ModerationFilter.check() over the corpus, then the naive loop """
+    logging.disable(logging.CRITICAL)
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else LINES
+    rng = random.Random(21)
+    rules = make_rules(rng)
+    messages = [Message.from_string(line) for line in twitch_corpus(lines)]
+
+    tic = time.perf_counter()
+    mod_filter = ModerationFilter(lambda channel, line: None, {ANY_CHANNEL: rules})
+    print(f"compile {len(rules):,} rules: {time.perf_counter() - tic:8.3f} s")
+
+    tic = time.perf_counter()
+    for message in messages:
+        mod_filter.check(message)
+    elapsed = time.perf_counter() - tic
+    print(
+        f"compiled  {lines / elapsed:>12,.0f} msg/s "
+        f"{elapsed / lines * 1e6:8.2f} us/msg, {mod_filter.matches:,} matches"
+    )
+
+    phrases = [rule.pattern.lower() for rule in rules if not rule.regex]
+    regexes = [rule.pattern for rule in rules if rule.regex]
+    compiled = [re.compile(pattern, re.IGNORECASE) for pattern in regexes]
+    sample = messages[:NAIVE_LINES]
+    tic = time.perf_counter()
+    for message in sample:
+        if message.command != "PRIVMSG":
+            continue
+        text = message.content.lower()
+        if not any(phrase in text for phrase in phrases):
+            any(regex.search(text) for regex in compiled)
+    elapsed = time.perf_counter() - tic
+    print(
+        f"one-by-one {len(sample) / elapsed:>11,.0f} msg/s "
+        f"{elapsed / len(sample) * 1e6:8.2f} us/msg"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: PONG latency while 10k chat lines wait in the write queues
+
+Run with: python -m benchmarks.bench_pong_latency
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import logging
+import statistics
+from typing import List
+
+from src.ircclient import IRCClient
+from tests.fakeserver import FakeIRCServer
+
+CHANNELS = 10
+LINES_PER_CHANNEL = 1_000
+PINGS = 500
+
+
+def main() -> None:
+    """ Answer PINGs with a full chat backlog, report latency percentiles """
+    logging.disable(logging.ERROR)
+    server = FakeIRCServer().start()
+    client = IRCClient(
+        "bench_bot", "oauth:bench", server.host, server.port, metrics=False
+    )
+    client.connect()
+    channels = [f"#bench{idx}" for idx in range(CHANNELS)]
+    client.join_channels(channels)
+    server.wait_for_lines(4)
+    for channel in channels:
+        for idx in range(LINES_PER_CHANNEL):
+            client.send_to_channel(channel, f"PRIVMSG {channel} :{idx}")
+
+    latencies: List[float] = []
+    for idx in range(PINGS):
+        expected = len(server.received) + 1
+        tic = time.perf_counter()
+        server.send_all(f"PING :{idx}")
+        server.wait_for_lines(expected)
+        latencies.append(server.received[-1][0] - tic)
+    client.disconnect()
+    server.stop()
+
+    latencies.sort()
+    print(f"queued chat={CHANNELS * LINES_PER_CHANNEL} pings={PINGS}")
+    print(
+        f"PONG latency p50={statistics.median(latencies) * 1000:.3f} ms "
+        f"p99={latencies[int(PINGS * 0.99)] * 1000:.3f} ms "
+        f"max={latencies[-1] * 1000:.3f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: IRCClientPool joining 5k channels over many loopback sockets
+
+Run with: python -m benchmarks.bench_pool
+
+Author: Preocts <preocts@preocts.com>
+"""
+import io
+import time
+import logging
+import threading
+import contextlib
+from typing import Dict
+from typing import List
+
+from src.ircpool import IRCClientPool
+from src.readqueue import READ_BLOCK
+from src.model.message import Message
+from tests.fakeserver import FakeIRCServer
+
+CHANNELS = 5_000
+CONNECTIONS = 10
+FLOOD_LINES = 10_000
+
+
+class Tally:
+    """ Counts merged messages by command """
+
+    def __init__(self) -> None:
+        self.counts: Dict[str, int] = {}
+        self.total = 0
+
+    def __call__(self, message: Message) -> None:
+        self.counts[message.command] = self.counts.get(message.command, 0) + 1
+        self.total += 1
+
+    def wait_for(self, command: str, count: int, timeout: float = 120) -> float:
+        """ Seconds until command was seen count times """
+        tic = time.perf_counter()
+        while self.counts.get(command, 0) < count:
+            if time.perf_counter() - tic > timeout:
+                break
+            time.sleep(0.001)
+        return time.perf_counter() - tic
+
+
+def run(workers: bool, channels: int) -> List[str]:
+    """ Join, flood, and kill one connection, reporting each phase """
+    report = [f"{'process' if workers else 'thread'} shards x {CONNECTIONS}"]
+    server = FakeIRCServer().start()
+    pool = IRCClientPool(
+        "bench_bot",
+        None,
+        server.host,
+        server.port,
+        CONNECTIONS,
+        workers=workers,
+        join_rate_count=100_000,
+        join_rate_span=1,
+        read_policy=READ_BLOCK,
+    )
+    tally = Tally()
+    pool.connect()
+    server.wait_for_clients(CONNECTIONS)
+    dispatcher = threading.Thread(target=pool.dispatch, args=(tally,))
+    dispatcher.start()
+
+    for idx in range(channels):
+        pool.join_channel(f"#bench{idx}")
+    joined = tally.wait_for("366", channels)
+    report.append(f"  joined {channels:,} channels in {joined:.3f}s")
+    report.append(f"  channels per connection {list(pool.connections().values())}")
+
+    line = ":user!user@user.tmi.twitch.tv PRIVMSG #bench0 :hello there chat"
+    start_total = tally.total
+    tic = time.perf_counter()
+    server.send_raw(f"{line}\r\n".encode("UTF-8") * FLOOD_LINES)
+    tally.wait_for("PRIVMSG", FLOOD_LINES * CONNECTIONS)
+    elapsed = time.perf_counter() - tic
+    merged = tally.total - start_total
+    report.append(f"  merged {merged:,} messages at {merged / elapsed:,.0f} msg/s")
+
+    server.drop_client(0)
+    rebalance = tally.wait_for("366", channels + channels // CONNECTIONS)
+    report.append(
+        f"  lost a connection, channels re-joined in {rebalance * 1000:.0f}ms"
+    )
+
+    pool.disconnect()
+    dispatcher.join()
+    server.stop()
+    return report
+
+
+def main() -> None:
+    """ Thread shards with 5k channels, then process shards """
+    logging.disable(logging.CRITICAL)
+    report: List[str] = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for workers in (False, True):
+            report.extend(run(workers, CHANNELS))
+    print("\n".join(report))
+
+
+if __name__ == "__main__":
+    main()
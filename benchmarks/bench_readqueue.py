@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: PONG latency and drops per read policy with a slow handler
+
+Run with: python -m benchmarks.bench_readqueue
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import logging
+import statistics
+import threading
+from typing import List
+
+from src.ircclient import IRCClient
+from src.model.message import Message
+from src.readqueue import READ_POLICIES
+from tests.fakeserver import FakeIRCServer
+
+BURSTS = 10
+LINES_PER_BURST = 2_000
+CHANNELS = 4
+# Time a handler spends on each message, about 2k messages a second
+HANDLER_DELAY = 0.0005
+# Chat lane size, small so every policy meets a full lane
+QUEUE_SIZE = 1_000
+# Give up on a PONG after this long
+PONG_TIMEOUT = 30.0
+
+
+def run(policy: str) -> None:
+    """ Flood a client behind a slow handler, PING after each burst """
+    server = FakeIRCServer().start()
+    client = IRCClient(
+        "bench_bot",
+        "oauth:bench",
+        server.host,
+        server.port,
+        read_policy=policy,
+        read_queue_size=QUEUE_SIZE,
+    )
+    handled = [0]
+
+    def slow_handler(message: Message) -> None:
+        """ Count and stall """
+        handled[0] += 1
+        time.sleep(HANDLER_DELAY)
+
+    client.connect()
+    server.wait_for_clients()
+    dispatcher = threading.Thread(target=client.dispatch, args=(slow_handler,))
+    dispatcher.start()
+    flood = "".join(
+        f":bench!bench@bench PRIVMSG #bench{idx % CHANNELS} :chat {idx}\r\n"
+        for idx in range(LINES_PER_BURST)
+    ).encode()
+    latencies: List[float] = []
+    tic = time.perf_counter()
+    for burst in range(BURSTS):
+        server.send_raw(flood)
+        sent = time.perf_counter()
+        server.send_all(f"PING :{burst}")
+        deadline = sent + PONG_TIMEOUT
+        while f"PONG :{burst}" not in server.lines() and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - tic
+    client.disconnect()
+    dispatcher.join()
+    server.stop()
+
+    print(
+        f"{policy:<12} PONG p50={statistics.median(latencies) * 1000:8.1f} ms "
+        f"max={max(latencies) * 1000:8.1f} ms "
+        f"dropped={sum(client.read_drops().values()):>6,} "
+        f"handled={handled[0]:>6,} in {elapsed:5.1f} s"
+    )
+
+
+def main() -> None:
+    """ Every policy against the same flood """
+    logging.disable(logging.ERROR)
+    print(
+        f"{BURSTS} bursts of {LINES_PER_BURST:,} lines, "
+        f"handler {HANDLER_DELAY * 1000:.1f} ms/msg, lane {QUEUE_SIZE:,}"
+    )
+    for policy in READ_POLICIES:
+        run(policy)
+
+
+if __name__ == "__main__":
+    main()
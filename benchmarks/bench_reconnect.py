@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: reconnect downtime and shutdown time of IRCClient
+
+Run with: python -m benchmarks.bench_reconnect
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import logging
+import statistics
+from typing import List
+
+from src.ircclient import IRCClient
+from tests.fakeserver import FakeIRCServer
+
+# Logins skip the throttles, only the first re-JOIN is timed
+DROPS = 20
+# The first JOIN and one re-JOIN of 20 channels fit in a join rate of 40
+CHANNELS = 20
+
+
+def count(server: FakeIRCServer, prefix: str) -> int:
+    """ Lines received starting with prefix """
+    return sum(line.startswith(prefix) for line in server.lines())
+
+
+def wait_for(server: FakeIRCServer, prefix: str, total: int) -> None:
+    """ Block until server has seen total lines starting with prefix """
+    while count(server, prefix) < total:
+        time.sleep(0.001)
+
+
+def main() -> None:
+    """ Drop the link repeatedly, time until login and re-JOIN are sent """
+    logging.disable(logging.ERROR)
+    server = FakeIRCServer().start()
+    client = IRCClient(
+        "bench_bot",
+        "oauth:bench",
+        server.host,
+        server.port,
+        join_rate_count=CHANNELS * 2,
+    )
+    client.connect()
+    client.join_channels([f"#bench{idx}" for idx in range(CHANNELS)])
+    wait_for(server, "JOIN", 1)
+
+    login: List[float] = []
+    rejoin = 0.0
+    for drop in range(DROPS):
+        tic = time.perf_counter()
+        server.drop_client()
+        wait_for(server, "NICK", drop + 2)
+        login.append(time.perf_counter() - tic)
+        if not drop:
+            wait_for(server, "JOIN", 2)
+            rejoin = time.perf_counter() - tic
+
+    assert client.metrics is not None
+    downtime = client.metrics.reconnect_downtime
+    tic = time.perf_counter()
+    client.disconnect()
+    shutdown = time.perf_counter() - tic
+    server.stop()
+
+    print(f"reconnects={client.metrics.reconnects}")
+    print(f"link downtime mean={downtime.mean * 1000:.2f} ms")
+    print(f"drop to login sent p50={statistics.median(login) * 1000:.2f} ms")
+    print(f"drop to {CHANNELS} channels re-joined={rejoin * 1000:.2f} ms")
+    print(f"disconnect={shutdown * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
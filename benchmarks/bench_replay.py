@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: end to end parse, dispatch, and handler throughput from a replay
+
+Run with: python -m benchmarks.bench_replay [recording]
+
+Without a recording argument a synthetic one is built from the corpus.
+
+Author: Preocts <preocts@preocts.com>
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import threading
+
+from src.ircclient import IRCClient
+from src.readqueue import READ_BLOCK
+from src.commandrouter import CommandRouter
+from src.recorder import ReplayServer
+from src.recorder import TrafficRecorder
+from src.recorder import read_recording
+from benchmarks.corpus import twitch_corpus
+
+CORPUS_LINES = 200_000
+# Synthetic recordings read about 4 KiB per chunk at 5k lines a second
+LINES_PER_CHUNK = 20
+LINES_PER_SECOND = 5_000
+
+
+def synthetic_recording(path: str) -> None:
+    """ Write the corpus as a recording of small chunks at a steady rate """
+    lines = twitch_corpus(CORPUS_LINES)
+    recorder = TrafficRecorder(path)
+    for idx in range(0, len(lines), LINES_PER_CHUNK):
+        chunk = "".join(f"{line}\r\n" for line in lines[idx : idx + LINES_PER_CHUNK])
+        recorder.record(chunk.encode("UTF-8"), idx / LINES_PER_SECOND)
+    recorder.close()
+
+
+def replay(path: str) -> None:
+    """ Replay path at maximum speed through a client with a router """
+    stamps = [stamp for stamp, _ in read_recording(path)]
+    router = CommandRouter()
+    router.register("hello", lambda context: None)
+    count = 0
+
+    def counter(_: object) -> None:
+        nonlocal count
+        count += 1
+
+    server = ReplayServer(path, speed=0).start()
+    client = IRCClient(
+        "bench_bot",
+        None,
+        server.host,
+        server.port,
+        reconnect=False,
+        read_policy=READ_BLOCK,
+    )
+    tic = time.perf_counter()
+    client.connect()
+    dispatcher = threading.Thread(target=client.dispatch, args=(router, counter))
+    dispatcher.start()
+    dispatcher.join()
+    elapsed = time.perf_counter() - tic
+    client.disconnect()
+    server.stop()
+
+    size = os.path.getsize(path)
+    print(f"recording: {len(stamps):,} chunks, {size / 1e6:.1f} MB")
+    print(f"recorded span: {stamps[-1] - stamps[0]:.1f} s")
+    print(
+        f"replayed {count:,} messages in {elapsed:.2f} s "
+        f"({count / elapsed:,.0f} msg/s, {size / elapsed / 1e6:.1f} MB/s)"
+    )
+
+
+def main() -> None:
+    """ Replay the given recording, or a synthetic one """
+    logging.disable(logging.ERROR)
+    if len(sys.argv) > 1:
+        replay(sys.argv[1])
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "corpus.rec")
+        synthetic_recording(path)
+        replay(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: send syscalls and latency per message, with and without batching
+
+Run with: python -m benchmarks.bench_write_batching
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import socket
+import logging
+import statistics
+from typing import Any
+from typing import Dict
+
+from src import ircclient
+from src.ircclient import IRCClient
+from tests.fakeserver import FakeIRCServer
+
+CHANNELS = 200
+MESSAGES_PER_CHANNEL = 10
+
+
+class CountingSocket(socket.socket):
+    """ Socket that counts send calls """
+
+    sends = 0
+
+    def send(self, data: Any, flags: int = 0) -> int:
+        CountingSocket.sends += 1
+        return super().send(data, flags)
+
+
+def run(batch_bytes: int) -> Dict[str, float]:
+    """ Burst every channel's messages at once and time their delivery """
+    ircclient.WRITE_BATCH_BYTES = batch_bytes
+    server = FakeIRCServer().start()
+    client = IRCClient(
+        "bench_bot",
+        None,
+        server.host,
+        server.port,
+        global_throttle_count=100_000,
+        join_rate_count=CHANNELS,
+    )
+    client.irc_client = CountingSocket(socket.AF_INET, socket.SOCK_STREAM)
+    client.connect()
+    for idx in range(CHANNELS):
+        client.join_channel(f"#bench{idx}")
+    time.sleep(0.5)
+
+    offset = len(server.received)
+    CountingSocket.sends = 0
+    sent_at: Dict[str, float] = {}
+    for seq in range(MESSAGES_PER_CHANNEL):
+        for idx in range(CHANNELS):
+            body = f"PRIVMSG #bench{idx} :burst {seq}"
+            sent_at[body] = time.perf_counter()
+            client.send_to_channel(f"#bench{idx}", body)
+    server.wait_for_lines(offset + len(sent_at), timeout=30)
+    latencies = [
+        (stamp - sent_at[line]) * 1_000_000
+        for stamp, line in server.received[offset:]
+        if line in sent_at
+    ]
+    sends = CountingSocket.sends
+    client.disconnect()
+    server.stop()
+    return {
+        "delivered": len(latencies),
+        "sends_per_msg": sends / max(len(latencies), 1),
+        "p50_us": statistics.median(latencies),
+        "max_us": max(latencies),
+    }
+
+
+def main() -> None:
+    """ Compare one line per send with coalesced batches """
+    logging.disable(logging.ERROR)
+    default = ircclient.WRITE_BATCH_BYTES
+    print(f"{CHANNELS} channels x {MESSAGES_PER_CHANNEL} messages queued in a burst")
+    for label, batch_bytes in (("one line per send", 1), ("coalesced", default)):
+        result = run(batch_bytes)
+        print(
+            f"  {label:<18} delivered={result['delivered']:>5} "
+            f"sends/msg={result['sends_per_msg']:.3f} "
+            f"p50={result['p50_us']:9.1f}us max={result['max_us']:9.1f}us"
+        )
+    ircclient.WRITE_BATCH_BYTES = default
+
+
+if __name__ == "__main__":
+    main()
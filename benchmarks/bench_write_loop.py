@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark: idle CPU and send latency of the IRCClient write loop
+
+Run with: python -m benchmarks.bench_write_loop
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import logging
+import statistics
+from typing import Dict
+
+from src.ircclient import IRCClient
+from tests.fakeserver import FakeIRCServer
+
+IDLE_SECONDS = 2.0
+LATENCY_SAMPLES = 200
+# Per-channel throttle allows 20 messages per 30 seconds
+SAMPLES_PER_CHANNEL = 20
+
+
+def run(channel_count: int) -> Dict[str, float]:
+    """ Join channel_count channels on a loopback server, measure idle + latency """
+    server = FakeIRCServer().start()
+    client = IRCClient(
+        "bench_bot",
+        None,
+        server.host,
+        server.port,
+        global_throttle_count=10_000,
+        join_rate_count=channel_count,
+    )
+    client.connect()
+    for idx in range(channel_count):
+        client.join_channel(f"#bench{idx}")
+    time.sleep(0.5)
+
+    cpu_start = time.process_time()
+    time.sleep(IDLE_SECONDS)
+    idle_cpu = (time.process_time() - cpu_start) / IDLE_SECONDS * 100
+
+    offset = len(server.received)
+    sent_at: Dict[str, float] = {}
+    for idx in range(min(LATENCY_SAMPLES, SAMPLES_PER_CHANNEL * channel_count)):
+        body = f"PRIVMSG #bench{idx % channel_count} :latency {idx}"
+        sent_at[body] = time.perf_counter()
+        client.send_to_channel(f"#bench{idx % channel_count}", body)
+        time.sleep(0.001)
+    server.wait_for_lines(offset + len(sent_at))
+    latencies = [
+        (stamp - sent_at[line]) * 1_000_000
+        for stamp, line in server.received[offset:]
+        if line in sent_at
+    ]
+
+    client.disconnect()
+    server.stop()
+    return {
+        "channels": channel_count,
+        "idle_cpu_pct": idle_cpu,
+        "delivered": len(latencies),
+        "latency_p50_us": statistics.median(latencies) if latencies else 0.0,
+        "latency_max_us": max(latencies) if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    """ Print results for 1 and 500 joined channels """
+    logging.disable(logging.ERROR)
+    for channel_count in (1, 500):
+        result = run(channel_count)
+        print(
+            f"channels={result['channels']:>4} "
+            f"idle_cpu={result['idle_cpu_pct']:6.2f}% "
+            f"delivered={result['delivered']:>4} "
+            f"p50={result['latency_p50_us']:8.1f}us "
+            f"max={result['latency_max_us']:8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
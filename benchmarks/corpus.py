@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Reproducible synthetic Twitch-like IRC corpora for benchmarks
+
+Author: Preocts <preocts@preocts.com>
+"""
+import random
+from itertools import accumulate
+from typing import Dict
+from typing import List
+
+WORDS = (
+    "lul pog gg hype kappa monkaS clip that wow no way chat is this real "
+    "lets go ez clap nice play what happened omegalul first time here "
+    "streamer pls !discord !uptime hello everyone PogChamp"
+).split()
+EMOTES = ["Kappa", "PogChamp", "LUL", "BibleThump", "Kreygasm", "SeemsGood"]
+EMOTE_IDS = {"Kappa": 25, "PogChamp": 88, "LUL": 425618, "BibleThump": 86}
+BADGES = ["broadcaster/1", "moderator/1", "subscriber/12", "premium/1", "vip/1"]
+
+
+def user_names(count: int, seed: int = 1) -> List[str]:
+    """ Returns count deterministic user names """
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz_0123456789") for _ in range(10))
+        for _ in range(count)
+    ]
+
+
+def chat_text(rng: random.Random) -> str:
+    """ Returns a chat line of 1 to 16 words and emotes """
+    return " ".join(
+        rng.choice(EMOTES) if rng.random() < 0.15 else rng.choice(WORDS)
+        for _ in range(rng.randint(1, 16))
+    )
+
+
+def emote_tag(text: str) -> str:
+    """ Returns the Twitch emotes tag value for text """
+    ranges: Dict[int, List[str]] = {}
+    position = 0
+    for word in text.split(" "):
+        if word in EMOTE_IDS:
+            ranges.setdefault(EMOTE_IDS[word], []).append(
+                f"{position}-{position + len(word) - 1}"
+            )
+        position += len(word) + 1
+    return "/".join(f"{eid}:{','.join(spans)}" for eid, spans in ranges.items())
+
+
+def tags(rng: random.Random, user: str, sent_ts: int, text: str) -> str:
+    """ Returns a PRIVMSG-like IRCv3 tag block, without the leading '@' """
+    badges = ",".join(rng.sample(BADGES, rng.randint(0, 2)))
+    return (
+        f"badge-info=subscriber/{rng.randint(1, 48)};badges={badges};"
+        f"color=#{rng.randint(0, 0xFFFFFF):06X};display-name={user};"
+        f"emotes={emote_tag(text)};first-msg=0;flags=;"
+        f"id={rng.getrandbits(128):032x};mod=0;returning-chatter=0;"
+        f"room-id=12345678;subscriber=1;tmi-sent-ts={sent_ts};turbo=0;"
+        f"user-id={rng.randint(1, 10**9)};user-type="
+    )
+
+
+def twitch_corpus(
+    lines: int,
+    channels: int = 10,
+    users: int = 5_000,
+    seed: int = 1,
+    with_tags: bool = True,
+    skew: float = 0.0,
+) -> List[str]:
+    """Returns lines of raw Twitch IRC traffic, without CRLF
+
+    Mix is mostly PRIVMSG with some USERNOTICE, JOIN, PART, PING and
+    NAMES numerics. Users are picked uniformly, or with skew > 0 by a
+    Zipf law of that exponent so a few users do most of the talking.
+    The same arguments always return the same corpus.
+    """
+    rng = random.Random(seed)
+    names = user_names(users, seed)
+    weights = list(accumulate(1 / rank ** skew for rank in range(1, users + 1)))
+    sent_ts = 1_600_000_000_000
+    corpus: List[str] = []
+    for _ in range(lines):
+        user = rng.choices(names, cum_weights=weights)[0] if skew else rng.choice(names)
+        channel = f"#channel{rng.randrange(channels)}"
+        host = f":{user}!{user}@{user}.tmi.twitch.tv"
+        sent_ts += rng.randint(0, 50)
+        roll = rng.random()
+        if roll < 0.88:
+            text = chat_text(rng)
+            line = f"{host} PRIVMSG {channel} :{text}"
+            if with_tags:
+                line = f"@{tags(rng, user, sent_ts, text)} {line}"
+        elif roll < 0.91:
+            text = chat_text(rng)
+            line = f":tmi.twitch.tv USERNOTICE {channel} :{text}"
+            if with_tags:
+                line = (
+                    f"@{tags(rng, user, sent_ts, text)};msg-id=resub;"
+                    f"msg-param-cumulative-months={rng.randint(1, 60)};"
+                    f"system-msg={user}\\ssubscribed\\sat\\sTier\\s1. {line}"
+                )
+        elif roll < 0.95:
+            line = f"{host} JOIN {channel}"
+        elif roll < 0.98:
+            line = f"{host} PART {channel}"
+        elif roll < 0.99:
+            line = "PING :tmi.twitch.tv"
+        else:
+            line = f":bot.tmi.twitch.tv 353 bot = {channel} :{' '.join(names[:20])}"
+        corpus.append(line)
+    return corpus
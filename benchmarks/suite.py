@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Performance regression suite over the core hot paths
+
+Times each case on the same reproducible corpus and keeps the best of
+ROUNDS runs. Each round also times a fixed reference workload, and the
+case is scaled by how much faster or slower that ran than when the
+baseline was saved, so a host that is slower overall is not mistaken
+for slower code. A case still over the threshold is measured up to
+RETRIES more times keeping the best; if still slower it is a
+regression and the run exits 1.
+
+Run with: python -m benchmarks.suite [--save] [--threshold 0.2] [case ...]
+Or: make bench-baseline, then make bench after a change
+
+Author: Preocts <preocts@preocts.com>
+"""
+import gc
+import io
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import threading
+import contextlib
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from src.decayingcounter import DecayingCounter
+from src.ircclient import IRCClient
+from src.linebuffer import LineBuffer
+from src.readqueue import READ_BLOCK
+from src.model.message import Message
+from benchmarks.corpus import twitch_corpus
+from tests.fakeserver import FakeIRCServer
+
+# Baseline written by --save and read otherwise, machine specific so not committed
+BASELINE_PATH = "benchmarks/baseline.json"
+# Slowdown over the baseline flagged as a regression, 0.2 is 20% slower
+THRESHOLD = 0.2
+# Each case runs this many times, the fastest run is kept
+ROUNDS = 7
+# A case over the threshold is measured again up to this many times
+RETRIES = 3
+# Loop passes of the reference workload timed alongside every round
+REFERENCE_OPS = 200_000
+
+CORPUS_LINES = 50_000
+COUNTER_GROUPS = 50_000
+READ_SIZE = 4_096
+WRITE_CHANNELS = 200
+# Per-channel throttle allows 20 messages per 30 seconds
+WRITE_PER_CHANNEL = 20
+# Give up on a loopback round after this long
+LOOPBACK_TIMEOUT = 60.0
+
+
+class Case(NamedTuple):
+    """ A named timing: run() returns seconds for ops operations """
+
+    name: str
+    ops: int
+    run: Callable[[], float]
+
+
+def timed(func: Callable[[], object]) -> float:
+    """ Seconds taken by func, with the garbage collector off as timeit does """
+    gc.collect()
+    gc.disable()
+    try:
+        tic = time.perf_counter()
+        func()
+        return time.perf_counter() - tic
+    finally:
+        gc.enable()
+
+
+def each(func: Callable[[Any], object], items: List[Any]) -> Callable[[], None]:
+    """ A callable applying func to every item, keeping no results """
+
+    def run() -> None:
+        for item in items:
+            func(item)
+
+    return run
+
+
+def message_cases(corpus: List[str]) -> List[Case]:
+    """ Message parsing and the lazy fields handlers read most """
+    raw = [line.encode("UTF-8") for line in corpus]
+
+    def content_params() -> float:
+        messages = [Message.from_string(line) for line in corpus]
+        return timed(each(lambda msg: (msg.content, msg.params), messages))
+
+    def channel_nick() -> float:
+        messages = [Message.from_string(line) for line in corpus]
+        return timed(each(lambda msg: (msg.channel, msg.nick), messages))
+
+    return [
+        Case(
+            "message.from_string",
+            len(corpus),
+            lambda: timed(each(Message.from_string, corpus)),
+        ),
+        Case(
+            "message.from_bytes",
+            len(raw),
+            lambda: timed(each(Message.from_bytes, raw)),
+        ),
+        Case("message.content_params", len(corpus), content_params),
+        Case("message.channel_nick", len(corpus), channel_nick),
+    ]
+
+
+def counter_cases() -> List[Case]:
+    """ DecayingCounter spread over many groups, as the per-user throttles are """
+    names = [f"group{idx}" for idx in range(COUNTER_GROUPS)]
+
+    def filled() -> DecayingCounter:
+        counter = DecayingCounter(30, 20)
+        for name in names:
+            counter.inc(name)
+        return counter
+
+    def inc() -> float:
+        counter = DecayingCounter(30, 20)
+        return timed(each(counter.inc, names))
+
+    def count() -> float:
+        counter = filled()
+        return timed(each(counter.count, names))
+
+    def inc_to_max() -> float:
+        counter = filled()
+        return timed(each(counter.inc_to_max, names))
+
+    return [
+        Case("decayingcounter.inc", COUNTER_GROUPS, inc),
+        Case("decayingcounter.count", COUNTER_GROUPS, count),
+        Case("decayingcounter.inc_to_max", COUNTER_GROUPS, inc_to_max),
+    ]
+
+
+def framing_case(corpus: List[str]) -> Case:
+    """ The reader's LineBuffer framing over READ_SIZE socket reads """
+    stream = ("\r\n".join(corpus) + "\r\n").encode("UTF-8")
+
+    def frame() -> None:
+        buffer = LineBuffer(read_size=READ_SIZE)
+        with memoryview(stream) as view:
+            for idx in range(0, len(stream), READ_SIZE):
+                buffer.feed(view[idx : idx + READ_SIZE])
+                for line in buffer.lines():
+                    Message.from_bytes(line)
+
+    return Case("ircclient.read_framing", len(corpus), lambda: timed(frame))
+
+
+def dispatch_case(corpus: List[str]) -> Case:
+    """ Corpus sent by a loopback server, read, framed, queued and dispatched """
+    payload = ("\r\n".join(corpus) + "\r\n:tmi NOTICE * :END\r\n").encode()
+
+    def run() -> float:
+        server = FakeIRCServer().start()
+        client = IRCClient(
+            "bench_bot",
+            None,
+            server.host,
+            server.port,
+            metrics=False,
+            read_policy=READ_BLOCK,
+        )
+        done = threading.Event()
+
+        def handler(message: Message) -> None:
+            if message.command == "NOTICE" and message.content == "END":
+                done.set()
+
+        dispatcher = threading.Thread(target=client.dispatch, args=(handler,))
+        try:
+            client.connect()
+            server.wait_for_clients()
+            dispatcher.start()
+            tic = time.perf_counter()
+            server.send_raw(payload)
+            finished = done.wait(LOOPBACK_TIMEOUT)
+            elapsed = time.perf_counter() - tic
+        finally:
+            client.disconnect()
+            if dispatcher.is_alive():
+                dispatcher.join()
+            server.stop()
+        if not finished:
+            raise RuntimeError("Dispatch did not finish the corpus")
+        return elapsed
+
+    return Case("ircclient.dispatch", len(corpus), run)
+
+
+def write_case() -> Case:
+    """ Chat queued on many channels until the loopback server has it all """
+    messages = WRITE_CHANNELS * WRITE_PER_CHANNEL
+
+    def run() -> float:
+        server = FakeIRCServer().start()
+        client = IRCClient(
+            "bench_bot",
+            None,
+            server.host,
+            server.port,
+            global_throttle_count=100_000,
+            metrics=False,
+            join_rate_count=WRITE_CHANNELS,
+        )
+        try:
+            client.connect()
+            for idx in range(WRITE_CHANNELS):
+                client.join_channel(f"#bench{idx}")
+            time.sleep(0.5)
+            target = len(server.received) + messages
+            tic = time.perf_counter()
+            for seq in range(WRITE_PER_CHANNEL):
+                for idx in range(WRITE_CHANNELS):
+                    name = f"#bench{idx}"
+                    client.send_to_channel(name, f"PRIVMSG {name} :{seq}")
+            finished = server.wait_for_lines(target, timeout=LOOPBACK_TIMEOUT)
+            elapsed = time.perf_counter() - tic
+        finally:
+            client.disconnect()
+            server.stop()
+        if not finished:
+            raise RuntimeError("Server did not receive every message")
+        return elapsed
+
+    return Case("ircclient.write_path", messages, run)
+
+
+def all_cases() -> List[Case]:
+    """ Every case of the suite, in run order """
+    corpus = twitch_corpus(CORPUS_LINES)
+    return [
+        *message_cases(corpus),
+        *counter_cases(),
+        framing_case(corpus),
+        dispatch_case(corpus),
+        write_case(),
+    ]
+
+
+def reference() -> float:
+    """ Seconds taken by fixed parsing and dict work, tracks the host's speed """
+    keys = [f"user{idx % 1_000}!user@tmi PRIVMSG" for idx in range(REFERENCE_OPS)]
+
+    def run() -> None:
+        counts: Dict[str, int] = {}
+        for key in keys:
+            nick = key.split("!", 1)[0]
+            counts[nick] = counts.get(nick, 0) + 1
+
+    return timed(run)
+
+
+def measure(case: Case, rounds: int = ROUNDS) -> Tuple[float, float]:
+    """ Best microseconds per operation of case and of reference, interleaved """
+    case_best = ref_best = float("inf")
+    for _ in range(rounds):
+        ref_best = min(ref_best, reference())
+        case_best = min(case_best, case.run())
+    return (
+        case_best / case.ops * 1_000_000,
+        ref_best / REFERENCE_OPS * 1_000_000,
+    )
+
+
+def environment() -> Dict[str, str]:
+    """ Interpreter and machine the results were taken on """
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    """ Saved baseline, None if there is none """
+    try:
+        with open(path, "r", encoding="UTF-8") as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path: str, results: Dict[str, float], ref: float) -> None:
+    """ Write results, the reference they are scaled to, and the environment """
+    with open(path, "w", encoding="UTF-8") as outfile:
+        json.dump(
+            {"environment": environment(), "reference": ref, "results": results},
+            outfile,
+            indent=2,
+            sort_keys=True,
+        )
+        outfile.write("\n")
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[str]:
+    """ Names of cases slower than their baseline by more than threshold """
+    return [
+        name
+        for name, value in results.items()
+        if name in baseline and value > baseline[name] * (1 + threshold)
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """ Run the suite, save or compare with the baseline, 1 on a regression """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0].strip())
+    parser.add_argument("cases", nargs="*", help="run only cases starting with these")
+    parser.add_argument("--save", action="store_true", help="write a new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    args = parser.parse_args(argv)
+    logging.disable(logging.ERROR)
+
+    saved = load_baseline(args.baseline)
+    baseline: Dict[str, float] = {}
+    if saved and "reference" in saved:
+        baseline = dict(saved["results"])
+        base_ref = float(saved["reference"])
+        if saved.get("environment") != environment():
+            print(f"warning: baseline taken on {saved.get('environment')}")
+    else:
+        if saved:
+            print("warning: baseline has no reference timing, save it again")
+        base_ref = min(reference() for _ in range(args.rounds))
+        base_ref = base_ref / REFERENCE_OPS * 1_000_000
+
+    results: Dict[str, float] = {}
+    print(f"{'case':<28} {'us/op':>10} {'baseline':>10} {'change':>8}")
+    for case in all_cases():
+        if args.cases and not case.name.startswith(tuple(args.cases)):
+            continue
+        value = float("inf")
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(1 + args.retries):
+                raw, ref = measure(case, args.rounds)
+                value = min(value, raw * base_ref / ref)
+                if not compare({case.name: value}, baseline, args.threshold):
+                    break
+        results[case.name] = value
+        if case.name in baseline:
+            change = value / baseline[case.name] - 1
+            flag = "  REGRESSION" if change > args.threshold else ""
+            print(
+                f"{case.name:<28} {value:>10.3f} {baseline[case.name]:>10.3f} "
+                f"{change:>+8.1%}{flag}"
+            )
+        else:
+            print(f"{case.name:<28} {value:>10.3f} {'-':>10} {'-':>8}")
+
+    if args.save:
+        save_baseline(args.baseline, {**baseline, **results}, base_ref)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not baseline:
+        print(f"no baseline at {args.baseline}, run with --save first")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    print(f"no regressions over {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
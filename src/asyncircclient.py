@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" asyncio IRC Abstract layer designed for TwitchTV IRC chat
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import socket
+import asyncio
+import inspect
+import logging
+from typing import Any
+from typing import Set
+from typing import Callable
+from typing import Optional
+from typing import Awaitable
+from typing import Union
+
+from src.model.message import Message
+from src.decayingcounter import DecayingCounter
+from src.ircchannel import normalize_channel_name
+from src.ircclient import READ_QUEUE_MAX_SIZE
+from src.ircclient import WRITE_THROTTLE_MSG_COUNT
+from src.ircclient import WRITE_THROTTLE_SEC_SPAN
+
+Handler = Callable[[Message], Union[None, Awaitable[None]]]
+
+
+class AsyncIRCClient:
+    """ Connection layer to IRC running on an asyncio event loop """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        nickname: str,
+        password: Optional[str],
+        server_url: str,
+        port: int,
+    ) -> None:
+        """Create an asyncio IRC Client object, no I/O until connect()
+
+        Args:
+            nickname: Name to use on the server
+            password: Password if used, set None to bypass
+            server_url: IRC host server url
+            port: Host port
+        """
+        self.nickname = nickname
+        self.__password = password
+        self.__url = server_url
+        self.__port = port
+        self.__channels: Set[str] = set()
+        self.__throttle = DecayingCounter(
+            WRITE_THROTTLE_SEC_SPAN, WRITE_THROTTLE_MSG_COUNT
+        )
+        self.__reader: Optional[asyncio.StreamReader] = None
+        self.__writer: Optional[asyncio.StreamWriter] = None
+        self.__read_task: Optional[asyncio.Task[None]] = None
+        self.__read_queue: Optional[asyncio.Queue[Optional[Message]]] = None
+        self.__send_lock: Optional[asyncio.Lock] = None
+        self.__socket_open = False
+        self.__dropped = 0
+
+    @property
+    def connected(self) -> bool:
+        """ Returns True if IRC stream is open """
+        return self.__socket_open
+
+    @property
+    def dropped(self) -> int:
+        """ Messages dropped, oldest first, while the read queue was full """
+        return self.__dropped
+
+    async def connect(self) -> None:
+        """ Opens the stream, starts the reader task, and queues authentication """
+        self.logger.info("Connecting to IRC server...")
+        self.__reader, self.__writer = await asyncio.open_connection(
+            self.__url, self.__port
+        )
+        sock = self.__writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__read_queue = asyncio.Queue(maxsize=READ_QUEUE_MAX_SIZE)
+        self.__send_lock = asyncio.Lock()
+        self.__socket_open = True
+        self.__read_task = asyncio.ensure_future(self.__read_loop())
+        self.logger.info("Connection established.")
+        if self.__password:
+            await self.send_to_server(f"PASS {self.__password}")
+        await self.send_to_server(f"NICK {self.nickname}")
+        await self.send_to_server(
+            f"USER {self.nickname} {self.nickname} {self.nickname}"
+        )
+
+    async def disconnect(self) -> None:
+        """ Closes the stream and stops the reader task """
+        self.__socket_open = False
+        if self.__read_task is not None and not self.__read_task.done():
+            self.__read_task.cancel()
+            try:
+                await self.__read_task
+            except asyncio.CancelledError:
+                pass
+        if self.__writer is not None:
+            self.__writer.close()
+            try:
+                await self.__writer.wait_closed()
+            except OSError as err:
+                self.logger.error(err)
+        self.__wake_iterators()
+
+    async def send_to_server(self, message: str) -> None:
+        """ Sends a message to the server under the SYSTEM throttle """
+        await self.__throttled_send("SYSTEM", message)
+
+    async def send_to_channel(self, channel_name: str, message: str) -> None:
+        """ Sends a message to a joined channel """
+        key = normalize_channel_name(channel_name)
+        if key not in self.__channels:
+            self.logger.error("Not in channel: %s", channel_name)
+            return
+        await self.__throttled_send(key, message)
+
+    async def join_channel(self, channel_name: str) -> None:
+        """ Join channel """
+        key = normalize_channel_name(channel_name)
+        if key in self.__channels:
+            self.logger.error("Already in channel: %s", channel_name)
+            return
+        self.__channels.add(key)
+        await self.send_to_server(f"JOIN {channel_name}")
+
+    async def dispatch(self, *args: Handler) -> None:
+        """ Hands each read message to every handler until disconnected """
+        async for message in self:
+            for arg in args:
+                result = arg(message)
+                if inspect.isawaitable(result):
+                    await result
+
+    def __aiter__(self) -> AsyncIRCClient:
+        """ Iterate over parsed messages as they are read """
+        return self
+
+    async def __anext__(self) -> Message:
+        """ Next read message, stops once disconnected and drained """
+        if self.__read_queue is None:
+            raise StopAsyncIteration
+        if not self.__socket_open and self.__read_queue.empty():
+            raise StopAsyncIteration
+        message = await self.__read_queue.get()
+        if message is None:
+            self.__wake_iterators()
+            raise StopAsyncIteration
+        return message
+
+    async def __throttled_send(self, group: str, message: str) -> None:
+        """ Writes a line once the group throttle allows it """
+        while self.__socket_open and not self.__throttle.inc_to_max(group):
+            await asyncio.sleep(self.__throttle.wait_time(group))
+        await self.__send(message)
+
+    async def __send(self, message: str) -> None:
+        """ Writes a line to the stream and waits for the buffer to drain """
+        if self.__writer is None or self.__send_lock is None:
+            return
+        if not self.__socket_open:
+            return
+        self.logger.debug(
+            "Send message: %s", message if "PASS" not in message else "PASS ***"
+        )
+        try:
+            async with self.__send_lock:
+                self.__writer.write(f"{message}\r\n".encode("UTF-8"))
+                await self.__writer.drain()
+        except (ConnectionResetError, OSError) as err:
+            self.logger.error("Send failed: %s", err)
+            self.__socket_open = False
+            self.__wake_iterators()
+
+    async def __read_loop(self) -> None:
+        """Reads lines into the read queue, answers PING, exits on close
+
+        The queue is never awaited: when a slow consumer lets it fill, the
+        oldest message is dropped so PINGs behind it are still answered.
+        """
+        assert self.__reader is not None and self.__read_queue is not None
+        self.logger.debug("Enter stream read loop.")
+        while self.__socket_open:
+            try:
+                line = await self.__reader.readuntil(b"\r\n")
+            except asyncio.IncompleteReadError:
+                self.logger.warning("Read: Stream is closed!")
+                break
+            except (asyncio.LimitOverrunError, ConnectionResetError, OSError) as err:
+                self.logger.error("Read failed: %s", err)
+                break
+            msg = Message.from_bytes(line[:-2])
+            if msg.command == "PING":
+                self.logger.info("PING? PONG!")
+                await self.__send(f"PONG :{msg.content}")
+            if self.__read_queue.full():
+                self.__read_queue.get_nowait()
+                self.__dropped += 1
+            self.__read_queue.put_nowait(msg)
+        self.__socket_open = False
+        self.__wake_iterators()
+        self.logger.debug("Exit stream read loop.")
+
+    def __wake_iterators(self) -> None:
+        """ Drop a sentinel in the read queue so waiting iterators can stop """
+        if self.__read_queue is None:
+            return
+        try:
+            self.__read_queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def __aenter__(self) -> AsyncIRCClient:
+        """ Connect on context entry """
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        """ Disconnect on context exit """
+        await self.disconnect()
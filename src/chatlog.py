@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Writes each channel's chat to rotating files from a background thread
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import os
+import gzip
+import json
+import time
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from collections import deque
+from typing import IO
+from typing import Any
+from typing import Deque
+from typing import Iterator
+from typing import Tuple
+
+from src.model.message import Message
+
+FORMAT_JSONL = "jsonl"
+FORMAT_BINARY = "bin"
+
+POLICY_DROP = "drop"
+POLICY_BLOCK = "block"
+
+# Records waiting for the writer before log() drops or blocks
+LOG_QUEUE_SIZE = 100_000
+# Most records written per pass of the writer
+LOG_BATCH_SIZE = 1_000
+# Writer flushes buffered records at least this often, in seconds
+FLUSH_INTERVAL = 1.0
+# Record bytes written to a file before it is rotated
+ROTATE_BYTES = 16_777_216
+# Rotated files kept per channel, name.1 is the newest
+ROTATE_BACKUPS = 5
+# Channel files held open at once, least recently written are closed first
+MAX_OPEN_FILES = 64
+# Bytes decompressed per read when sizing an existing gzip log
+SIZE_READ_CHUNK = 65_536
+
+# Binary record header: wall clock timestamp, then length of the raw line
+RECORD_HEADER = struct.Struct("<dI")
+
+Record = Tuple[float, str, Message]
+
+
+def log_file_name(channel_name: str, fmt: str, compress: bool) -> str:
+    """ File name of a channel's current log """
+    name = channel_name.strip().lower().lstrip("#").replace(os.sep, "_") or "_"
+    return f"{name}.{fmt}{'.gz' if compress else ''}"
+
+
+def read_log(path: str) -> Iterator[Tuple[float, str]]:
+    """ Yields (timestamp, raw line) of every record of a log file """
+    opener: Any = gzip.open if ".gz" in os.path.basename(path) else open
+    with opener(path, "rb") as log_file:
+        if ".jsonl" in os.path.basename(path):
+            for row in log_file:
+                record = json.loads(row)
+                yield record["ts"], record["line"]
+            return
+        while True:
+            header = log_file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            stamp, size = RECORD_HEADER.unpack(header)
+            yield stamp, log_file.read(size).decode("UTF-8")
+
+
+def _record_bytes(path: str, compress: bool) -> int:
+    """Record bytes already in a log file, counted decompressed for gzip
+
+    A gzip file cut short by a crash counts what decompressed before the cut.
+    """
+    if not os.path.exists(path):
+        return 0
+    if not compress:
+        return os.path.getsize(path)
+    size = 0
+    try:
+        with gzip.open(path, "rb") as log_file:
+            chunk = log_file.read(SIZE_READ_CHUNK)
+            while chunk:
+                size += len(chunk)
+                chunk = log_file.read(SIZE_READ_CHUNK)
+    except (OSError, EOFError):
+        pass
+    return size
+
+
+class _LogFile:
+    """ One open channel log and the record bytes written to it """
+
+    __slots__ = ["path", "handle", "size"]
+
+    def __init__(self, path: str, compress: bool) -> None:
+        """ Opens path for append """
+        self.path = path
+        self.size = _record_bytes(path, compress)
+        self.handle: IO[bytes] = (
+            gzip.open(path, "ab") if compress else open(path, "ab")  # type: ignore
+        )
+
+    def close(self) -> None:
+        """ Flush and close """
+        self.handle.close()
+
+
+class ChatLogger:
+    """Batched background writer of per-channel chat logs
+
+    log() only timestamps the message and appends it to a deque, so the
+    dispatch thread never waits on disk or on a queue lock. A writer
+    thread woken by an Event drains the deque in batches, encodes each
+    record as a JSON line or as a binary header plus the raw line, and
+    appends it to the channel's file through a buffered handle. Buffers
+    are flushed when the deque runs dry or every FLUSH_INTERVAL seconds.
+    Files past rotate_bytes are rotated to name.1 .. name.N. When the
+    disk falls behind and the queue fills, log() drops the record under
+    the "drop" policy or waits under "block". With no writer running,
+    never started or stopped, a full queue drops under either policy.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        directory: str,
+        fmt: str = FORMAT_JSONL,
+        compress: bool = False,
+        policy: str = POLICY_DROP,
+        queue_size: int = LOG_QUEUE_SIZE,
+        rotate_bytes: int = ROTATE_BYTES,
+        backups: int = ROTATE_BACKUPS,
+    ) -> None:
+        """Create a logger writing under directory, call start() to begin
+
+        Args:
+            fmt: "jsonl" or "bin"
+            compress: Write gzip files
+            policy: Full queue policy, "drop" or "block"
+            queue_size: Records held before the policy applies
+            rotate_bytes: Record bytes written to a file before rotating
+            backups: Rotated files kept per channel
+        """
+        if fmt not in (FORMAT_JSONL, FORMAT_BINARY):
+            raise ValueError(f"Unknown chat log format: {fmt}")
+        if policy not in (POLICY_DROP, POLICY_BLOCK):
+            raise ValueError(f"Unknown chat log policy: {policy}")
+        self.directory = directory
+        self.fmt = fmt
+        self.compress = compress
+        self.policy = policy
+        self.rotate_bytes = rotate_bytes
+        self.backups = backups
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.__pending: Deque[Record] = deque()
+        self.__wake = threading.Event()
+        self.__space = threading.Condition()
+        self.__stopping = False
+        self.__files: OrderedDict[str, _LogFile] = OrderedDict()
+        self.__writer = threading.Thread(target=self.__write_loop, daemon=True)
+
+    def start(self) -> ChatLogger:
+        """ Create the directory and start the writer """
+        os.makedirs(self.directory, exist_ok=True)
+        self.__writer.start()
+        return self
+
+    def stop(self) -> None:
+        """ Write every queued record, then close all files """
+        self.__stopping = True
+        self.__wake.set()
+        self.__writer.join()
+
+    def log(self, channel_name: str, message: Message) -> bool:
+        """ Queue message for channel_name's log, False if dropped """
+        pending = self.__pending
+        if len(pending) >= self.queue_size:
+            if self.policy == POLICY_DROP:
+                self.dropped += 1
+                return False
+            with self.__space:
+                while len(pending) >= self.queue_size:
+                    if not self.__writer.is_alive():
+                        self.dropped += 1
+                        return False
+                    self.__space.wait(FLUSH_INTERVAL)
+        pending.append((time.time(), channel_name, message))
+        if not self.__wake.is_set():
+            self.__wake.set()
+        return True
+
+    def path(self, channel_name: str) -> str:
+        """ Path of a channel's current log file """
+        return os.path.join(
+            self.directory, log_file_name(channel_name, self.fmt, self.compress)
+        )
+
+    def __write_loop(self) -> None:
+        """ Writer thread body: drain and flush until stop() """
+        pending = self.__pending
+        stopping = False
+        while not stopping:
+            self.__wake.wait(FLUSH_INTERVAL)
+            self.__wake.clear()
+            stopping = self.__stopping
+            last_flush = time.monotonic()
+            while pending:
+                for _ in range(min(len(pending), LOG_BATCH_SIZE)):
+                    self.__write(pending.popleft())
+                with self.__space:
+                    self.__space.notify_all()
+                if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                    self.__flush()
+                    last_flush = time.monotonic()
+            self.__flush()
+        for log_file in self.__files.values():
+            log_file.close()
+        self.__files.clear()
+
+    def __flush(self) -> None:
+        """ Push buffered records of every open file to disk """
+        for log_file in self.__files.values():
+            log_file.handle.flush()
+
+    def __write(self, record: Record) -> None:
+        """ Encode one record and append it to its channel's file """
+        stamp, channel_name, message = record
+        if self.fmt == FORMAT_JSONL:
+            data = (
+                json.dumps(
+                    {
+                        "ts": stamp,
+                        "command": message.command,
+                        "nick": message.nick,
+                        "line": message.message,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+            ).encode("UTF-8")
+        else:
+            line = message.message.encode("UTF-8")
+            data = RECORD_HEADER.pack(stamp, len(line)) + line
+        log_file = self.__open(channel_name)
+        try:
+            log_file.handle.write(data)
+        except OSError as err:
+            self.logger.error("Chat log write failed for %s: %s", channel_name, err)
+            return
+        log_file.size += len(data)
+        if log_file.size >= self.rotate_bytes:
+            self.__rotate(channel_name, log_file)
+
+    def __open(self, channel_name: str) -> _LogFile:
+        """ The open file of a channel, opening it and closing the oldest """
+        log_file = self.__files.get(channel_name)
+        if log_file is not None:
+            self.__files.move_to_end(channel_name)
+            return log_file
+        if len(self.__files) >= MAX_OPEN_FILES:
+            _, oldest = self.__files.popitem(last=False)
+            oldest.close()
+        log_file = _LogFile(self.path(channel_name), self.compress)
+        self.__files[channel_name] = log_file
+        return log_file
+
+    def __rotate(self, channel_name: str, log_file: _LogFile) -> None:
+        """ Shift name.N-1 to name.N down to name to name.1 """
+        log_file.close()
+        del self.__files[channel_name]
+        for idx in range(self.backups - 1, 0, -1):
+            older = f"{log_file.path}.{idx}"
+            if os.path.exists(older):
+                os.replace(older, f"{log_file.path}.{idx + 1}")
+        if self.backups:
+            os.replace(log_file.path, f"{log_file.path}.1")
+        else:
+            os.remove(log_file.path)
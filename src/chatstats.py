@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Live per-channel chat statistics from fixed-size sketches
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import math
+import time
+from array import array
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from src.model.message import Message
+from src.ircchannel import normalize_channel_name
+
+# Commands counted as chat
+COUNTED_COMMANDS = frozenset(("PRIVMSG",))
+# Counters per row of a count-min sketch
+CMS_WIDTH = 2_048
+# Rows of a count-min sketch, each with its own hash
+CMS_DEPTH = 4
+# Heavy hitters tracked per sketch
+TOP_K = 10
+# HyperLogLog registers are 2 ** precision, standard error 1.04 / sqrt(2 ** p)
+HLL_PRECISION = 11
+# Seconds covered by rate and unique user windows
+STATS_WINDOW = 60.0
+# Buckets a window is split into, it slides one bucket at a time
+STATS_BUCKETS = 6
+
+# Python's str hash is 64 bit SipHash, salted per process
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+# Count-min counters are unsigned 32 bit
+COUNTER_MAX = (1 << 32) - 1
+
+
+class TopK:
+    """Count-min sketch of item counts plus the k items it ranks highest
+
+    The sketch is depth rows of width 32 bit counters; an item bumps one
+    counter per row, picked by double hashing of hash(item), and its
+    estimate is the smallest of those counters. Estimates never fall
+    short and overshoot by at most e / width of all counts with
+    probability 1 - exp(-depth). The k best estimates are kept in a dict;
+    an item enters only by beating the smallest of them, and a floor that
+    never exceeds that smallest lets most adds skip the search.
+    """
+
+    __slots__ = ["width", "depth", "k", "total", "__rows", "__top", "__floor"]
+
+    def __init__(
+        self, k: int = TOP_K, width: int = CMS_WIDTH, depth: int = CMS_DEPTH
+    ) -> None:
+        """ Empty sketch """
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.__rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+        self.__top: Dict[str, int] = {}
+        self.__floor = 0
+
+    def add(self, item: str, count: int = 1) -> int:
+        """ Count item, returns its new estimate """
+        self.total += count
+        hashed = hash(item) & HASH_MASK
+        step = (hashed >> 32) | 1
+        width = self.width
+        estimate = COUNTER_MAX
+        for row in self.__rows:
+            index = hashed % width
+            value = row[index] + count
+            row[index] = value
+            if value < estimate:
+                estimate = value
+            hashed += step
+        top = self.__top
+        if item in top or len(top) < self.k:
+            top[item] = estimate
+        elif estimate > self.__floor:
+            smallest = min(top, key=top.__getitem__)
+            if estimate > top[smallest]:
+                del top[smallest]
+                top[item] = estimate
+            self.__floor = min(top.values())
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        """ Estimated count of item """
+        hashed = hash(item) & HASH_MASK
+        step = (hashed >> 32) | 1
+        estimate = COUNTER_MAX
+        for row in self.__rows:
+            value = row[hashed % self.width]
+            if value < estimate:
+                estimate = value
+            hashed += step
+        return estimate
+
+    def top(self, count: Optional[int] = None) -> List[Tuple[str, int]]:
+        """ Heaviest items, heaviest first """
+        ranked = sorted(self.__top.items(), key=lambda pair: pair[1], reverse=True)
+        return ranked[:count] if count is not None else ranked
+
+
+class HyperLogLog:
+    """Distinct count estimate in 2 ** precision one byte registers
+
+    Sketches merge with max() per register, so a union of windows costs
+    one pass over the registers.
+    """
+
+    __slots__ = ["precision", "registers"]
+
+    def __init__(self, precision: int = HLL_PRECISION) -> None:
+        """ Empty sketch """
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item: str) -> None:
+        """ Count item once """
+        hashed = hash(item) & HASH_MASK
+        index = hashed & ((1 << self.precision) - 1)
+        rank = HASH_BITS - self.precision - (hashed >> self.precision).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: HyperLogLog) -> None:
+        """ Fold other's items into this sketch """
+        registers = self.registers
+        for index, rank in enumerate(other.registers):
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def clear(self) -> None:
+        """ Forget every item """
+        self.registers[:] = bytes(len(self.registers))
+
+    def count(self) -> int:
+        """ Estimated distinct items added """
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+
+def skipped_slots(current: int, bucket: int, size: int) -> range:
+    """ Ring slots to reset when a clock of size buckets moves to bucket """
+    return range(max(current + 1, bucket - size + 1), bucket + 1)
+
+
+class RateWindow:
+    """Event counts in a ring of time buckets covering the last window
+
+    Buckets are reused as time moves on, so memory is fixed and adding
+    an event is one division and one increment. The window slides one
+    bucket at a time.
+    """
+
+    __slots__ = ["window", "width", "counts", "__current"]
+
+    def __init__(
+        self, window: float = STATS_WINDOW, buckets: int = STATS_BUCKETS
+    ) -> None:
+        """ Empty window of buckets slots """
+        self.window = window
+        self.width = window / buckets
+        self.counts = array("q", bytes(8 * buckets))
+        self.__current = 0
+
+    def add(self, now: float, count: int = 1) -> None:
+        """ Count events at monotonic time now """
+        self.counts[self.__advance(now)] += count
+
+    def rate(self, now: float) -> float:
+        """ Events per second over the window ending now """
+        self.__advance(now)
+        return sum(self.counts) / self.window
+
+    def __advance(self, now: float) -> int:
+        """ Move to the bucket of now, zeroing skipped ones, returns its slot """
+        bucket = int(now / self.width)
+        size = len(self.counts)
+        if bucket > self.__current:
+            for slot in skipped_slots(self.__current, bucket, size):
+                self.counts[slot % size] = 0
+            self.__current = bucket
+        return self.__current % size
+
+
+class UniqueWindow:
+    """ Distinct items in the last window, one HyperLogLog per time bucket """
+
+    __slots__ = ["window", "width", "sketches", "__current"]
+
+    def __init__(
+        self,
+        window: float = STATS_WINDOW,
+        buckets: int = STATS_BUCKETS,
+        precision: int = HLL_PRECISION,
+    ) -> None:
+        """ Empty window """
+        self.window = window
+        self.width = window / buckets
+        self.sketches = [HyperLogLog(precision) for _ in range(buckets)]
+        self.__current = 0
+
+    def add(self, item: str, now: float) -> None:
+        """ Count item at monotonic time now """
+        self.sketches[self.__advance(now)].add(item)
+
+    def count(self, now: float) -> int:
+        """ Estimated distinct items over the window ending now """
+        self.__advance(now)
+        union = HyperLogLog(self.sketches[0].precision)
+        for sketch in self.sketches:
+            union.merge(sketch)
+        return union.count()
+
+    def __advance(self, now: float) -> int:
+        """ Move to the bucket of now, clearing skipped ones, returns its slot """
+        bucket = int(now / self.width)
+        size = len(self.sketches)
+        if bucket > self.__current:
+            for slot in skipped_slots(self.__current, bucket, size):
+                self.sketches[slot % size].clear()
+            self.__current = bucket
+        return self.__current % size
+
+
+class ChannelStats:
+    """ Sketches of one channel, fixed size whatever the traffic """
+
+    __slots__ = ["chatters", "emotes", "messages", "users"]
+
+    def __init__(self, window: float = STATS_WINDOW, top_k: int = TOP_K) -> None:
+        """ Empty stats """
+        self.chatters = TopK(top_k)
+        self.emotes = TopK(top_k)
+        self.messages = RateWindow(window)
+        self.users = UniqueWindow(window)
+
+    def add(self, message: Message, now: float) -> None:
+        """ Count one chat message """
+        self.messages.add(now)
+        nick = message.nick
+        if nick is not None:
+            self.chatters.add(nick)
+            self.users.add(nick, now)
+        emotes = message.emotes
+        if emotes:
+            content = message.content
+            for spans in emotes.values():
+                for start, end in spans:
+                    self.emotes.add(content[start : end + 1])
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        """ Current stats as plain data """
+        return {
+            "messages_per_second": self.messages.rate(now),
+            "unique_users": self.users.count(now),
+            "top_chatters": self.chatters.top(),
+            "top_emotes": self.emotes.top(),
+            "messages": self.chatters.total,
+        }
+
+
+class ChatAnalytics:
+    """Per-channel live stats: top chatters, top emotes, rate, unique users
+
+    Every channel gets a ChannelStats of fixed size: two count-min
+    sketches with their top-k, a ring of message counts, and a ring of
+    HyperLogLogs, so memory grows with channels and not with users or
+    messages. Top chatters and emotes count from creation or the last
+    reset(); rates and unique users cover the last window seconds.
+
+    The analytics are themselves a handler, pass them to
+    IRCClient.dispatch().
+    """
+
+    def __init__(self, window: float = STATS_WINDOW, top_k: int = TOP_K) -> None:
+        """ No channels until their first message """
+        self.window = window
+        self.top_k = top_k
+        self.__channels: Dict[str, ChannelStats] = {}
+
+    def __call__(self, message: Message) -> None:
+        """ Handler interface, same as add() """
+        self.add(message)
+
+    def add(self, message: Message, now: Optional[float] = None) -> None:
+        """ Count a chat message, now defaults to time.monotonic() """
+        if message.command not in COUNTED_COMMANDS:
+            return
+        channel = message.channel
+        if channel is None:
+            return
+        key = normalize_channel_name(channel)
+        stats = self.__channels.get(key)
+        if stats is None:
+            stats = self.__channels[key] = ChannelStats(self.window, self.top_k)
+        stats.add(message, time.monotonic() if now is None else now)
+
+    def channels(self) -> List[str]:
+        """ Channels with stats """
+        return list(self.__channels)
+
+    def snapshot(
+        self, channel_name: str, now: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """ Stats of channel_name, None if it has none """
+        stats = self.__channels.get(normalize_channel_name(channel_name))
+        if stats is None:
+            return None
+        return stats.snapshot(time.monotonic() if now is None else now)
+
+    def reset(self, channel_name: Optional[str] = None) -> None:
+        """ Drop the stats of channel_name, or of every channel """
+        if channel_name is None:
+            self.__channels.clear()
+        else:
+            self.__channels.pop(normalize_channel_name(channel_name), None)
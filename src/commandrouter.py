@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Routes chat commands such as '!start' to registered handlers
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from src.model.message import Message
+from src.decayingcounter import DecayingCounter
+from src.ircchannel import normalize_channel_name
+
+# Channel key of routes registered for every channel
+ANY_CHANNEL = ""
+
+
+class CommandContext(NamedTuple):
+    """ What a command handler is called with """
+
+    message: Message
+    command: str
+    channel: Optional[str]
+    user: Optional[str]
+    args: Tuple[str, ...]
+    text: str
+
+
+CommandHandler = Callable[[CommandContext], None]
+
+
+class Route(NamedTuple):
+    """ One registered command """
+
+    handler: CommandHandler
+    cooldown: Optional[DecayingCounter]
+
+
+class CommandRouter:
+    """Dispatch table of chat commands
+
+    Routes are keyed by (IRC command, channel, first token) so a message
+    is matched with at most two dict lookups, one for its channel and one
+    for routes registered on every channel. Messages whose IRC command
+    has no routes, or whose text does not open with the prefix, are
+    skipped before any splitting. Per-user cooldowns are DecayingCounters
+    allowing one use per user per cooldown seconds.
+
+    The router is itself a handler, pass it to IRCClient.dispatch().
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, prefix: str = "!") -> None:
+        """ prefix opens every command, e.g. '!' for '!start' """
+        self.prefix = prefix
+        self.__routes: Dict[Tuple[str, str, str], Route] = {}
+        self.__irc_commands: Set[str] = set()
+
+    def __len__(self) -> int:
+        """ Number of registered routes """
+        return len(self.__routes)
+
+    def __call__(self, message: Message) -> None:
+        """ Handler interface, same as route() """
+        self.route(message)
+
+    def register(
+        self,
+        name: str,
+        handler: CommandHandler,
+        channel: Optional[str] = None,
+        irc_command: str = "PRIVMSG",
+        cooldown: Optional[int] = None,
+    ) -> None:
+        """Register handler for a command
+
+        Args:
+            name: Command name without the prefix, matched case-insensitively
+            channel: Only route in this channel, None for every channel
+            irc_command: IRC command carrying the chat text
+            cooldown: Seconds a user must wait between uses
+        """
+        key = (
+            irc_command,
+            normalize_channel_name(channel) if channel else ANY_CHANNEL,
+            f"{self.prefix}{name}".lower(),
+        )
+        if key in self.__routes:
+            raise ValueError(f"Command already registered: {key}")
+        self.__routes[key] = Route(
+            handler, DecayingCounter(cooldown, 1) if cooldown else None
+        )
+        self.__irc_commands.add(irc_command)
+
+    def command(
+        self,
+        name: str,
+        channel: Optional[str] = None,
+        irc_command: str = "PRIVMSG",
+        cooldown: Optional[int] = None,
+    ) -> Callable[[CommandHandler], CommandHandler]:
+        """ Decorator form of register() """
+
+        def decorator(handler: CommandHandler) -> CommandHandler:
+            self.register(name, handler, channel, irc_command, cooldown)
+            return handler
+
+        return decorator
+
+    def route(self, message: Message) -> bool:
+        """ Run the matching command handler, True if one ran """
+        if message.command not in self.__irc_commands:
+            return False
+        text = message.trailing
+        if not text or not text.startswith(self.prefix):
+            return False
+        token, _, rest = text.partition(" ")
+        token = token.lower()
+        channel = message.channel
+        route = None
+        if channel is not None:
+            route = self.__routes.get(
+                (message.command, normalize_channel_name(channel), token)
+            )
+        if route is None:
+            route = self.__routes.get((message.command, ANY_CHANNEL, token))
+            if route is None:
+                return False
+
+        user = message.nick
+        if route.cooldown is not None and not route.cooldown.inc_to_max(user or ""):
+            self.logger.debug("Cooldown on %s for %s", token, user)
+            return False
+        route.handler(
+            CommandContext(
+                message=message,
+                command=token[len(self.prefix) :],
+                channel=channel,
+                user=user,
+                args=tuple(rest.split()),
+                text=rest.strip(),
+            )
+        )
+        return True
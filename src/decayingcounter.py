@@ -4,50 +4,171 @@
 
 Author: Preocts <preocts@preocts.com>
 """
+import math
+import time
 import datetime
-from typing import List
 from typing import Dict
+from typing import List
 from typing import Optional
 
+# Float slack when converting GCRA arrival times back into counts
+GCRA_EPSILON = 1e-9
+
+
+class _Window:
+    """ Sliding window of one group, a list of stamps compacted in halves """
+
+    __slots__ = ["head", "stamps"]
+
+    def __init__(self) -> None:
+        """ Empty window """
+        self.head = 0
+        self.stamps: List[float] = []
+
+    def __len__(self) -> int:
+        """ Live stamps in the window """
+        return len(self.stamps) - self.head
+
+    def clean(self, expire: float) -> None:
+        """ Skips stamps older than expire, compacts once half the list is dead """
+        stamps = self.stamps
+        head = self.head
+        end = len(stamps)
+        while head < end and stamps[head] < expire:
+            head += 1
+        if head and head * 2 >= end:
+            del stamps[:head]
+            head = 0
+        self.head = head
+
 
 class DecayingCounter:
-    """ Tracks number of events within a given life_span of seconds """
+    """Tracks number of events within a given life_span of seconds
+
+    Two engines are available, both amortized O(1) per call:
+
+    sliding window (default): each group holds a list of monotonic
+        timestamps, oldest first, with a head index past expired stamps.
+    gcra: each group holds a single float, the theoretical arrival time
+        of the Generic Cell Rate Algorithm. Events are spaced life_span /
+        max_count apart with a burst of max_count. Requires max_count.
 
-    __slots__ = ["life_span", "__groups", "__max"]
+    Groups with nothing left in the window are evicted, either when they
+    are next touched or by a sweep that runs at most once per life_span.
+    """
 
-    def __init__(self, life_span: int, max_count: Optional[int] = None) -> None:
+    __slots__ = [
+        "life_span",
+        "__span",
+        "__max",
+        "__gcra",
+        "__interval",
+        "__windows",
+        "__tats",
+        "__last_sweep",
+    ]
+
+    def __init__(
+        self, life_span: int, max_count: Optional[int] = None, gcra: bool = False
+    ) -> None:
         """ Set life_span to the length of time, in seconds, items live in groups """
+        if gcra and not max_count:
+            raise ValueError("GCRA mode requires a max_count.")
         self.__max = max_count
+        self.__span = float(life_span)
         self.life_span = datetime.timedelta(seconds=life_span)
-        self.__groups: Dict[str, List[datetime.datetime]] = {}
+        self.__gcra = gcra
+        self.__interval = self.__span / max_count if max_count else 0.0
+        self.__windows: Dict[str, _Window] = {}
+        self.__tats: Dict[str, float] = {}
+        self.__last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        """ Number of groups currently held, including any not yet evicted """
+        return len(self.__tats) if self.__gcra else len(self.__windows)
 
     def inc_to_max(self, group_name: str) -> bool:
         """ Increments group by 1 and return true. If max is reached, returns false """
         if self.__max is None:
             raise Exception("Using 'inc_to_max' with no max set.")
-        if self.count(group_name) < self.__max:
-            self.inc(group_name)
+        now = time.monotonic()
+        self.__sweep(now)
+        if self.__count(group_name, now) < self.__max:
+            self.__inc(group_name, now)
             return True
-        else:
-            return False
+        return False
 
     def inc(self, group_name: str) -> int:
         """ Increment a group by 1 (one) returns group size, create group if needed """
-        self.__clean_group(group_name)
-        if group_name not in self.__groups:
-            self.__groups[group_name] = []
-        self.__groups[group_name].insert(0, datetime.datetime.now())
-        return len(self.__groups[group_name])
+        now = time.monotonic()
+        self.__sweep(now)
+        return self.__inc(group_name, now)
 
     def count(self, group_name: str) -> int:
         """ Returns count of group without incrementing it """
-        self.__clean_group(group_name)
-        return len(self.__groups[group_name]) if group_name in self.__groups else 0
-
-    def __clean_group(self, group: str) -> None:
-        """ Removes expired items from group """
-        while self.__groups.get(group, []):
-            if (datetime.datetime.now() - self.__groups[group][-1]) > self.life_span:
-                self.__groups[group].pop()
-            else:
-                break
+        return self.__count(group_name, time.monotonic())
+
+    def wait_time(self, group_name: str) -> float:
+        """ Seconds until inc_to_max would succeed for group, 0.0 if it would now """
+        if self.__max is None:
+            raise Exception("Using 'wait_time' with no max set.")
+        now = time.monotonic()
+        if self.__gcra:
+            tat = self.__tats.get(group_name, now)
+            return max(0.0, tat - now - (self.__span - self.__interval))
+        size = self.__count(group_name, now)
+        if size < self.__max:
+            return 0.0
+        window = self.__windows[group_name]
+        oldest_blocking = window.stamps[window.head + size - self.__max]
+        return max(0.0, oldest_blocking + self.__span - now)
+
+    def __inc(self, group: str, now: float) -> int:
+        """ Add one event at now, returns group size """
+        if self.__gcra:
+            tat = max(self.__tats.get(group, now), now) + self.__interval
+            self.__tats[group] = tat
+            return self.__gcra_count(tat, now)
+        window = self.__windows.get(group)
+        if window is None:
+            window = self.__windows[group] = _Window()
+        else:
+            window.clean(now - self.__span)
+        window.stamps.append(now)
+        return len(window)
+
+    def __count(self, group: str, now: float) -> int:
+        """ Group size at now, evicts the group if empty """
+        if self.__gcra:
+            tat = self.__tats.get(group)
+            if tat is None:
+                return 0
+            if tat <= now:
+                del self.__tats[group]
+                return 0
+            return self.__gcra_count(tat, now)
+        window = self.__windows.get(group)
+        if window is None:
+            return 0
+        window.clean(now - self.__span)
+        if not window:
+            del self.__windows[group]
+        return len(window)
+
+    def __gcra_count(self, tat: float, now: float) -> int:
+        """ Events still inside the window for a theoretical arrival time """
+        return math.ceil((tat - now) / self.__interval - GCRA_EPSILON)
+
+    def __sweep(self, now: float) -> None:
+        """ Evict idle groups, runs at most once per life_span """
+        if now - self.__last_sweep < self.__span:
+            return
+        self.__last_sweep = now
+        if self.__gcra:
+            for group in [g for g, tat in self.__tats.items() if tat <= now]:
+                del self.__tats[group]
+        else:
+            expire = now - self.__span
+            idle = [g for g, win in self.__windows.items() if win.stamps[-1] < expire]
+            for group in idle:
+                del self.__windows[group]
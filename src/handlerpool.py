@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Runs message handlers off the dispatch thread, ordered per channel
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Callable
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from src.ircchannel import normalize_channel_name
+from src.model.message import Message
+
+MODE_THREAD = "thread"
+MODE_PROCESS = "process"
+
+# Messages a lane holds before submit() blocks the dispatcher
+LANE_MAX_SIZE = 1_000
+
+Handler = Callable[[Message], None]
+
+
+class HandlerStats:
+    """ Running latency totals for one handler """
+
+    __slots__ = ["count", "errors", "total", "max"]
+
+    def __init__(self) -> None:
+        """ All zero """
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self) -> float:
+        """ Mean seconds per call """
+        return self.total / self.count if self.count else 0.0
+
+    def copy(self) -> HandlerStats:
+        """ Snapshot of these totals """
+        stats = HandlerStats()
+        stats.count = self.count
+        stats.errors = self.errors
+        stats.total = self.total
+        stats.max = self.max
+        return stats
+
+    def add(self, elapsed: float, failed: bool) -> None:
+        """ Record one call """
+        self.count += 1
+        self.errors += failed
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+def _run_handlers(
+    handlers: Sequence[Handler], message: Message, logger: logging.Logger
+) -> List[Tuple[int, float, bool]]:
+    """ Call every handler with message, returns (index, seconds, failed) each """
+    results = []
+    for idx, handler in enumerate(handlers):
+        tic = time.perf_counter()
+        failed = False
+        try:
+            handler(message)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Handler %s failed on '%s'", handler, message.message)
+            failed = True
+        results.append((idx, time.perf_counter() - tic, failed))
+    return results
+
+
+def _process_lane(
+    handlers: Sequence[Handler],
+    inbox: "multiprocessing.Queue[Optional[Message]]",
+    timings: "multiprocessing.Queue[List[Tuple[int, float, bool]]]",
+) -> None:
+    """ Worker process body: runs handlers on each message until a None arrives """
+    logger = logging.getLogger(__name__)
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        timings.put(_run_handlers(handlers, message, logger))
+
+
+class HandlerPool:
+    """Executes handlers on worker lanes with per-channel ordering
+
+    Each message is assigned a lane by its channel, so messages of one
+    channel are handled in arrival order while channels on other lanes
+    run in parallel. Lanes are bounded; a full lane blocks submit(),
+    pushing back on the dispatch loop, or drops the message when block
+    is False. Lanes are threads, or worker processes in process mode
+    where handlers must be picklable. The pool is itself a handler, pass
+    it to IRCClient.dispatch().
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        handlers: Sequence[Handler],
+        workers: int = 4,
+        mode: str = MODE_THREAD,
+        lane_size: int = LANE_MAX_SIZE,
+        block: bool = True,
+    ) -> None:
+        """Create a pool, call start() before submitting
+
+        Args:
+            handlers: Callables taking a Message, run in the given order
+            workers: Number of lanes
+            mode: "thread" or "process"
+            lane_size: Messages a lane holds before submit blocks or drops
+            block: Block the submitter on a full lane, otherwise drop
+        """
+        if mode not in (MODE_THREAD, MODE_PROCESS):
+            raise ValueError(f"Unknown handler pool mode: {mode}")
+        self.handlers = list(handlers)
+        self.workers = workers
+        self.mode = mode
+        self.block = block
+        self.dropped = 0
+        self.__stats = [HandlerStats() for _ in self.handlers]
+        self.__stats_lock = threading.Lock()
+        self.__lanes: List[Any] = []
+        self.__runners: List[Any] = []
+        self.__timings: Optional["multiprocessing.Queue[Any]"] = None
+        self.__collector: Optional[threading.Thread] = None
+        self.__lane_size = lane_size
+
+    def __call__(self, message: Message) -> None:
+        """ Handler interface, same as submit() """
+        self.submit(message)
+
+    def start(self) -> HandlerPool:
+        """ Start the lanes """
+        if self.mode == MODE_PROCESS:
+            self.__timings = multiprocessing.Queue()
+            for _ in range(self.workers):
+                lane: Any = multiprocessing.Queue(maxsize=self.__lane_size)
+                runner: Any = multiprocessing.Process(
+                    target=_process_lane,
+                    args=(self.handlers, lane, self.__timings),
+                    daemon=True,
+                )
+                self.__lanes.append(lane)
+                self.__runners.append(runner)
+            self.__collector = threading.Thread(target=self.__collect, daemon=True)
+            self.__collector.start()
+        else:
+            for _ in range(self.workers):
+                lane = queue.Queue(maxsize=self.__lane_size)
+                runner = threading.Thread(
+                    target=self.__thread_lane, args=(lane,), daemon=True
+                )
+                self.__lanes.append(lane)
+                self.__runners.append(runner)
+        for runner in self.__runners:
+            runner.start()
+        return self
+
+    def stop(self) -> None:
+        """ Finish every queued message, then stop the lanes """
+        for lane in self.__lanes:
+            lane.put(None)
+        for runner in self.__runners:
+            runner.join()
+        if self.__timings is not None and self.__collector is not None:
+            self.__timings.put(None)
+            self.__collector.join()
+        self.__lanes.clear()
+        self.__runners.clear()
+
+    def submit(self, message: Message) -> bool:
+        """ Queue message on its channel's lane, False if dropped """
+        channel = normalize_channel_name(message.channel or "")
+        lane = self.__lanes[hash(channel) % self.workers]
+        try:
+            lane.put(message, block=self.block)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def depth(self) -> int:
+        """ Messages waiting across all lanes, approximate in process mode """
+        try:
+            return sum(lane.qsize() for lane in self.__lanes)
+        except NotImplementedError:
+            return -1
+
+    def metrics(self) -> Dict[str, HandlerStats]:
+        """ Copies of the latency totals by handler name """
+        with self.__stats_lock:
+            return {
+                getattr(handler, "__qualname__", repr(handler)): stats.copy()
+                for handler, stats in zip(self.handlers, self.__stats)
+            }
+
+    def __record(self, results: List[Tuple[int, float, bool]]) -> None:
+        """ Fold one message's handler timings into the stats """
+        with self.__stats_lock:
+            for idx, elapsed, failed in results:
+                self.__stats[idx].add(elapsed, failed)
+
+    def __thread_lane(self, lane: "queue.Queue[Optional[Message]]") -> None:
+        """ Lane thread body: runs handlers on each message until a None arrives """
+        while True:
+            message = lane.get()
+            if message is None:
+                break
+            self.__record(_run_handlers(self.handlers, message, self.logger))
+
+    def __collect(self) -> None:
+        """ Folds timings sent back by worker processes into the stats """
+        assert self.__timings is not None
+        while True:
+            results = self.__timings.get()
+            if results is None:
+                break
+            self.__record(results)
+
+    def __enter__(self) -> HandlerPool:
+        """ Start on context entry """
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        """ Drain and stop on context exit """
+        self.stop()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Embedded chat history with indexed lookups, written off the dispatch thread
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from typing import Deque
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from src.ircchannel import normalize_channel_name
+from src.model.message import Message
+
+# Commands carrying chat worth keeping
+STORED_COMMANDS = frozenset(("PRIVMSG", "USERNOTICE", "NOTICE"))
+# Rows waiting for the writer before add() drops them
+HISTORY_QUEUE_SIZE = 100_000
+# Most rows inserted per transaction
+HISTORY_BATCH_SIZE = 2_000
+# Writer commits pending rows at least this often, in seconds
+HISTORY_FLUSH_INTERVAL = 0.5
+# Rows older than this many seconds are deleted, default one week
+HISTORY_RETENTION = 7 * 24 * 3600
+# Seconds between retention sweeps
+RETENTION_INTERVAL = 60.0
+# Window of search() when none is given, in seconds
+SEARCH_WINDOW = 600
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS history ("
+    " id INTEGER PRIMARY KEY,"
+    " ts REAL NOT NULL,"
+    " channel TEXT NOT NULL,"
+    " nick TEXT,"
+    " command TEXT NOT NULL,"
+    " content TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS history_channel_nick_ts"
+    " ON history (channel, nick, ts)",
+    "CREATE INDEX IF NOT EXISTS history_channel_ts ON history (channel, ts)",
+    "CREATE INDEX IF NOT EXISTS history_ts ON history (ts)",
+)
+
+Row = Tuple[float, str, Optional[str], str, str]
+
+
+class HistoryRow(NamedTuple):
+    """ One stored message """
+
+    ts: float
+    channel: str
+    nick: Optional[str]
+    command: str
+    content: str
+
+
+class HistoryStore:
+    """SQLite history of channel chat in WAL mode
+
+    add() turns the message into a row and appends it to a deque, so the
+    dispatch thread never waits on SQLite. A writer thread inserts the
+    rows in batches, one transaction per batch, and deletes rows older
+    than retention once per RETENTION_INTERVAL. Queries run on a
+    connection per calling thread; WAL lets them read while the writer
+    commits. Times are seconds since the epoch at which add() was called.
+
+    The store is itself a handler, pass it to IRCClient.dispatch().
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        path: str,
+        retention: float = HISTORY_RETENTION,
+        max_rows: Optional[int] = None,
+        queue_size: int = HISTORY_QUEUE_SIZE,
+    ) -> None:
+        """Open or create the database at path, call start() to begin writing
+
+        Args:
+            retention: Seconds rows are kept
+            max_rows: Also keep at most this many of the newest rows
+            queue_size: Rows waiting for the writer before add() drops
+        """
+        self.path = path
+        self.retention = retention
+        self.max_rows = max_rows
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.__pending: Deque[Row] = deque()
+        self.__added = 0
+        self.__written = 0
+        self.__wake = threading.Event()
+        self.__progress = threading.Condition()
+        self.__stopping = False
+        self.__local = threading.local()
+        self.__writer = threading.Thread(target=self.__write_loop, daemon=True)
+        with self.__connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+        connection.close()
+
+    def __call__(self, message: Message) -> None:
+        """ Handler interface, same as add() """
+        self.add(message)
+
+    def start(self) -> HistoryStore:
+        """ Start the writer """
+        self.__writer.start()
+        return self
+
+    def stop(self) -> None:
+        """ Write every pending row, then stop the writer """
+        self.__stopping = True
+        self.__wake.set()
+        self.__writer.join()
+
+    def add(self, message: Message) -> bool:
+        """ Queue a channel chat message, False if skipped or dropped """
+        if message.command not in STORED_COMMANDS:
+            return False
+        channel = message.channel
+        if channel is None:
+            return False
+        if len(self.__pending) >= self.queue_size:
+            self.dropped += 1
+            return False
+        self.__pending.append(
+            (
+                time.time(),
+                normalize_channel_name(channel),
+                message.nick,
+                message.command,
+                message.content,
+            )
+        )
+        self.__added += 1
+        if not self.__wake.is_set():
+            self.__wake.set()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """ Block until every row added so far is committed """
+        target = self.__added
+        self.__wake.set()
+        with self.__progress:
+            return self.__progress.wait_for(lambda: self.__written >= target, timeout)
+
+    def last_by_user(
+        self, channel_name: str, nick: str, limit: int = 20
+    ) -> List[HistoryRow]:
+        """ Newest limit messages of nick in channel, newest first """
+        return self.__query(
+            "SELECT ts, channel, nick, command, content FROM history"
+            " WHERE channel = ? AND nick = ? ORDER BY ts DESC LIMIT ?",
+            (normalize_channel_name(channel_name), nick, limit),
+        )
+
+    def last_in_channel(self, channel_name: str, limit: int = 20) -> List[HistoryRow]:
+        """ Newest limit messages of channel, newest first """
+        return self.__query(
+            "SELECT ts, channel, nick, command, content FROM history"
+            " WHERE channel = ? ORDER BY ts DESC LIMIT ?",
+            (normalize_channel_name(channel_name), limit),
+        )
+
+    def search(
+        self,
+        term: str,
+        window: float = SEARCH_WINDOW,
+        channel_name: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[HistoryRow]:
+        """Messages containing term from the last window seconds, newest first
+
+        The time index bounds the scan to the window; term is matched
+        case-insensitively for ASCII.
+        """
+        since = time.time() - window
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        if channel_name is None:
+            return self.__query(
+                "SELECT ts, channel, nick, command, content FROM history"
+                " WHERE ts >= ? AND content LIKE ? ESCAPE '\\'"
+                " ORDER BY ts DESC LIMIT ?",
+                (since, pattern, limit),
+            )
+        return self.__query(
+            "SELECT ts, channel, nick, command, content FROM history"
+            " WHERE channel = ? AND ts >= ? AND content LIKE ? ESCAPE '\\'"
+            " ORDER BY ts DESC LIMIT ?",
+            (normalize_channel_name(channel_name), since, pattern, limit),
+        )
+
+    def prune(self) -> None:
+        """ Sweep now rather than waiting for the writer's next sweep """
+        self.__sweep(self.__reader())
+
+    def count(self) -> int:
+        """ Rows stored """
+        cursor = self.__reader().execute("SELECT COUNT(*) FROM history")
+        return int(cursor.fetchone()[0])
+
+    def __connect(self) -> sqlite3.Connection:
+        """ New connection to the database """
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def __reader(self) -> sqlite3.Connection:
+        """ The calling thread's query connection """
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            connection = self.__local.connection = self.__connect()
+        return connection
+
+    def __query(self, sql: str, args: Tuple[object, ...]) -> List[HistoryRow]:
+        """ Run a SELECT of history columns """
+        return [HistoryRow(*row) for row in self.__reader().execute(sql, args)]
+
+    def __write_loop(self) -> None:
+        """ Writer thread body: insert batches and sweep until stop() """
+        connection = self.__connect()
+        pending = self.__pending
+        next_sweep = time.monotonic()
+        stopping = False
+        while not stopping:
+            self.__wake.wait(HISTORY_FLUSH_INTERVAL)
+            self.__wake.clear()
+            stopping = self.__stopping
+            while pending:
+                batch = [
+                    pending.popleft()
+                    for _ in range(min(len(pending), HISTORY_BATCH_SIZE))
+                ]
+                self.__insert(connection, batch)
+            if time.monotonic() >= next_sweep:
+                self.__sweep(connection)
+                next_sweep = time.monotonic() + RETENTION_INTERVAL
+        connection.close()
+
+    def __insert(self, connection: sqlite3.Connection, batch: List[Row]) -> None:
+        """ Insert rows in one transaction """
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT INTO history (ts, channel, nick, command, content)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    batch,
+                )
+        except sqlite3.Error as err:
+            self.logger.error("History insert of %s rows failed: %s", len(batch), err)
+        with self.__progress:
+            self.__written += len(batch)
+            self.__progress.notify_all()
+
+    def __sweep(self, connection: sqlite3.Connection) -> None:
+        """ Delete rows past retention, and past max_rows when set """
+        try:
+            with connection:
+                connection.execute(
+                    "DELETE FROM history WHERE ts < ?", (time.time() - self.retention,)
+                )
+                if self.max_rows is not None:
+                    connection.execute(
+                        "DELETE FROM history WHERE id <= ("
+                        " SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (self.max_rows,),
+                    )
+        except sqlite3.Error as err:
+            self.logger.error("History retention sweep failed: %s", err)
@@ -6,11 +6,30 @@ Author: Preocts <preocts@preocts.com>
 """
 from __future__ import annotations
 
-import queue
 import logging
+from collections import deque
+from typing import TYPE_CHECKING
+from typing import Deque
+from typing import Optional
 
 from src.model.message import Message
 from src.decayingcounter import DecayingCounter
+from src.writescheduler import WriteScheduler
+from src.writescheduler import OVERFLOW_POLICIES
+from src.writescheduler import OVERFLOW_DROP_OLDEST
+
+if TYPE_CHECKING:
+    from src.chatlog import ChatLogger
+
+# Defaults used when a channel is created without a scheduler
+DEFAULT_QUEUE_SIZE = 1_000
+DEFAULT_GLOBAL_COUNT = 100
+DEFAULT_GLOBAL_SPAN = 30
+
+
+def normalize_channel_name(channel_name: str) -> str:
+    """ Registry key for a channel name, IRC channel names are case-insensitive """
+    return channel_name.strip().lower()
 
 
 class IRCChannel:
@@ -24,26 +43,50 @@ class IRCChannel:
         throttle_count: int,
         throttle_time: int,
         join_override: bool = False,
+        scheduler: Optional[WriteScheduler] = None,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        global_budget: bool = True,
+        chat_log: Optional[ChatLogger] = None,
     ) -> None:
-        """ Provide the name of the channel """
+        """Provide the name of the channel
+
+        Args:
+            scheduler: Paces this channel's write queue out to the writer,
+                shared by every channel of a connection. A private one is
+                created if None.
+            max_queue: Most messages held in the write queue
+            overflow: Policy when the write queue is full, one of
+                "drop-oldest", "drop-newest", or "coalesce"
+            global_budget: Sends also count toward the scheduler's global
+                per-connection throttle
+            chat_log: Background writer receiving every incoming message,
+                logged at debug level if None
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
         self.name = channel_name
-        self.write_queue: queue.Queue[Message] = queue.Queue()
+        self.scheduler = (
+            scheduler
+            if scheduler
+            else WriteScheduler(DEFAULT_GLOBAL_COUNT, DEFAULT_GLOBAL_SPAN)
+        )
+        self.write_queue: Deque[Message] = deque()
         self.throttle: DecayingCounter = DecayingCounter(throttle_time, throttle_count)
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.global_budget = global_budget
+        self.scheduled = False
+        self.chat_log = chat_log
 
         self.__namreply: bool = join_override
         self.__endofnames: bool = join_override
 
     def send(self, message: Message) -> None:
-        """ Add a message to the write queue """
+        """ Add a message to the write queue, released when the throttle allows """
         if not self.__joined:
             return
-        if self.throttle.inc_to_max(self.name):
-            # TODO (preocts) Handle full queue
-            self.write_queue.put_nowait(message)
-        else:
-            self.logger.warning(
-                "Flood control on %s, dropping '%s'", self.name, message
-            )
+        self.scheduler.submit(self, message)
 
     def handle_message(self, message: Message) -> None:
         """Handles incoming message directed toward channel
@@ -57,8 +100,10 @@ class IRCChannel:
         if message.command == "366":
             self.__endofnames = True
 
-        # TODO (preocts) Log/write message by channel name
-        print(f"{self.name}>>> {message.message}")
+        if self.chat_log is not None:
+            self.chat_log.log(self.name, message)
+        else:
+            self.logger.debug("%s>>> %s", self.name, message.message)
 
     def __joined(self) -> bool:
         """ Returns true if joined to channel """
@@ -7,23 +7,47 @@ Author: Preocts <preocts@preocts.com>
 from __future__ import annotations
 
 import time
+import random
 import socket
 import select
 import logging
 import threading
-from queue import Queue
-from queue import Empty
+from collections import deque
+from typing import Deque
+from typing import Dict
 from typing import List
+from typing import Callable
 from typing import Optional
 from typing import NamedTuple
 
 from src.model.message import Message
 from src.ircchannel import IRCChannel
+from src.ircchannel import normalize_channel_name
+from src.linebuffer import LineBuffer
+from src.metrics import ClientMetrics
+from src.chatlog import ChatLogger
+from src.decayingcounter import DecayingCounter
+from src.recorder import TrafficRecorder
+from src.readqueue import READ_DROP_OLDEST
+from src.readqueue import ReadQueue
+from src.linebuffer import READ_SIZE
+from src.writescheduler import WriteScheduler
+from src.writescheduler import OVERFLOW_DROP_OLDEST
 
 # TODO (preocts): Config layer for these settings
 READ_QUEUE_MAX_SIZE = 1_000
 WRITE_QUEUE_MAX_SIZE = 1_000
 
+# Dispatch blocks this long on an empty read queue before checking connection
+READ_QUEUE_TIMEOUT = 0.25
+# Most messages pulled from the read queue per dispatch pass
+DISPATCH_BATCH_SIZE = 100
+
+# Most bytes of queued lines gathered into one socket send
+WRITE_BATCH_BYTES = 16_384
+# Writer waits this long for a full socket buffer to become writable
+WRITE_BLOCK_TIMEOUT = 1.0
+
 # 500 character max including message tags
 MAX_SEND_CHAR_SIZE = 500
 
@@ -31,6 +55,34 @@ MAX_SEND_CHAR_SIZE = 500
 WRITE_THROTTLE_MSG_COUNT = 20
 WRITE_THROTTLE_SEC_SPAN = 30
 
+# Max 100 messages in 30 seconds across all channels of a connection
+GLOBAL_THROTTLE_MSG_COUNT = 100
+GLOBAL_THROTTLE_SEC_SPAN = 30
+
+# Twitch allows 20 JOINs per 10 seconds per account
+JOIN_RATE_COUNT = 20
+JOIN_RATE_SEC_SPAN = 10
+
+# First reconnect is immediate, later ones back off from min doubling to max
+RECONNECT_DELAY_MIN = 0.5
+RECONNECT_DELAY_MAX = 60.0
+# Send a PING after this many seconds without reading from the server
+KEEPALIVE_INTERVAL = 60.0
+# Drop the link if nothing is read this many seconds after that PING
+PONG_TIMEOUT = 10.0
+# Seconds a connect may take before the attempt fails, so a stopped client
+# is never stuck reconnecting to an unreachable host
+CONNECT_TIMEOUT = 10.0
+# Reader wakes this often to notice a stopped client, disconnect() wakes it sooner
+SELECT_TIMEOUT = 15.0
+
+# Protocol commands written ahead of chat, never throttled or held
+PRIORITY_COMMANDS = frozenset(("PONG", "PING", "PASS", "NICK", "USER", "CAP"))
+
+# Numerics ending the welcome burst, channel sends are held until one arrives
+RPL_ENDOFMOTD = "376"
+ERR_NOMOTD = "422"
+
 
 class IRCClient:
     """ Connection layer to IRC """
@@ -43,6 +95,12 @@ class IRCClient:
         url: str
         port: int
         wait_for_motd: bool
+        overflow_policy: str
+        read_size: int
+        reconnect: bool
+        keepalive: float
+        pong_timeout: float
+        read_policy: str
 
     logger = logging.getLogger(__name__)
 
@@ -53,6 +111,19 @@ class IRCClient:
         server_url: str,
         port: int,
         wait_for_motd: bool = True,
+        overflow_policy: str = OVERFLOW_DROP_OLDEST,
+        global_throttle_count: int = GLOBAL_THROTTLE_MSG_COUNT,
+        read_size: int = READ_SIZE,
+        metrics: bool = True,
+        chat_log: Optional[ChatLogger] = None,
+        reconnect: bool = True,
+        keepalive: float = KEEPALIVE_INTERVAL,
+        pong_timeout: float = PONG_TIMEOUT,
+        recorder: Optional[TrafficRecorder] = None,
+        read_policy: str = READ_DROP_OLDEST,
+        read_queue_size: int = READ_QUEUE_MAX_SIZE,
+        join_rate_count: int = JOIN_RATE_COUNT,
+        join_rate_span: int = JOIN_RATE_SEC_SPAN,
     ) -> None:
         """Create an IRC Client object
 
@@ -61,43 +132,122 @@ class IRCClient:
             pasasword: Password if used, set None to bypass
             server_url: IRC host server url
             port: Host port
-            wait_for_motd: Defaulted True.
+            wait_for_motd: Hold channel sends after each connect until
+                the server's end of MOTD. Defaulted True.
+            overflow_policy: Full channel write queue policy, "drop-oldest",
+                "drop-newest", or "coalesce"
+            global_throttle_count: Messages per GLOBAL_THROTTLE_SEC_SPAN
+                allowed across all joined channels
+            read_size: Most bytes read from the socket per recv
+            metrics: Collect runtime metrics into self.metrics
+            chat_log: Started ChatLogger receiving every channel's messages
+            reconnect: Reconnect with backoff when the link drops, replaying
+                authentication and re-joining every channel
+            keepalive: Seconds of silence before a client PING
+            pong_timeout: Seconds of silence after that PING before the
+                link is dropped
+            recorder: Receives every chunk read from the socket, raw
+            read_policy: Full inbound chat queue policy, "drop-oldest",
+                "drop-newest", "sample", or "block". Protocol and system
+                messages bypass it in a priority lane. "block" loses no
+                chat but stalls the reader, and PONGs with it, while the
+                queue is full.
+            read_queue_size: Most chat messages waiting for dispatch
+            join_rate_count: Channels JOINed per join_rate_span seconds,
+                first joins and re-joins alike
         """
-        self.__channels: List[IRCChannel] = []
-        self.__read_queue: Queue[Message] = Queue(maxsize=READ_QUEUE_MAX_SIZE)
+        self.metrics: Optional[ClientMetrics] = ClientMetrics() if metrics else None
+        self.__channels: Dict[str, IRCChannel] = {}
+        self.__read_queue = ReadQueue(
+            read_queue_size, read_policy, metrics=self.metrics
+        )
+        self.__scheduler = WriteScheduler(
+            global_throttle_count, GLOBAL_THROTTLE_SEC_SPAN, self.metrics
+        )
+        self.__system = IRCChannel(
+            "SYSTEM",
+            WRITE_THROTTLE_MSG_COUNT,
+            WRITE_THROTTLE_SEC_SPAN,
+            True,
+            self.__scheduler,
+            WRITE_QUEUE_MAX_SIZE,
+            global_budget=False,
+            chat_log=chat_log,
+        )
+        self.__chat_log = chat_log
+        self.__recorder = recorder
         self.__socket_reader = threading.Thread(target=self.__socket_read_loop)
         self.__socket_writer = threading.Thread(target=self.__socket_write_loop)
+        self.__keepalive = threading.Thread(target=self.__keepalive_loop)
         self.__socket_open = False
+        self.__running = False
+        self.__link_up = threading.Event()
+        self.__lifecycle = threading.Condition()
+        self.__wake_reader, self.__wake_writer = socket.socketpair()
+        self.__last_read = 0.0
+        self.__ping_sent: Optional[float] = None
+        self.__welcomed = False
+        self.__joins: Deque[str] = deque()
+        self.__join_rate = DecayingCounter(join_rate_span, join_rate_count)
         self.__cfg = self.ClientConfig(
-            nickname, password, server_url, port, wait_for_motd
+            nickname,
+            password,
+            server_url,
+            port,
+            wait_for_motd,
+            overflow_policy,
+            read_size,
+            reconnect,
+            keepalive,
+            pong_timeout,
+            read_policy,
         )
         self.irc_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if self.metrics is not None:
+            self.metrics.gauge("read_queue_depth", self.__read_queue.qsize)
+            self.metrics.gauge("read_drops_by_channel", self.read_drops)
+            self.metrics.gauge("write_queue_depth", self.__write_queue_depths)
 
     @property
     def connected(self) -> bool:
         """ Returns True if IRC socket is open """
         return self.__socket_open
 
+    def read_drops(self) -> Dict[str, int]:
+        """ Inbound chat dropped by the read policy, by channel """
+        return dict(self.__read_queue.drops)
+
+    @property
+    def running(self) -> bool:
+        """True from connect() until disconnect(), or until the link drops
+        for good when reconnect is off
+        """
+        return self.__running
+
     def connect(self) -> None:
         """ Connects to IRC and starts read/write threads. Does not hold event loop """
         self.__create_socket()
-        self.__channels.append(
-            IRCChannel(
-                "SYSTEM", WRITE_THROTTLE_MSG_COUNT, WRITE_THROTTLE_SEC_SPAN, True
-            )
-        )
-        if self.connected:
-            self.__socket_reader.start()
-            self.__socket_writer.start()
+        self.__running = True
         self.__authenticate()
+        self.__link_up.set()
+        self.__socket_reader.start()
+        self.__socket_writer.start()
+        self.__keepalive.start()
 
     def __create_socket(self) -> None:
         """ Connect socket """
         self.logger.info("Connecting to IRC server...")
+        self.irc_client.settimeout(CONNECT_TIMEOUT)
         self.irc_client.connect((self.__cfg.url, self.__cfg.port))
+        self.irc_client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.irc_client.setblocking(False)
         self.logger.info("Connection established.")
+        self.__last_read = time.monotonic()
+        self.__ping_sent = None
+        self.__welcomed = not self.__cfg.wait_for_motd
         self.__socket_open = True
+        if self.__cfg.wait_for_motd:
+            self.__scheduler.hold(True)
 
     def __authenticate(self) -> None:
         """ Queue authentication commands """
@@ -110,128 +260,403 @@ class IRCClient:
 
     def disconnect(self) -> None:
         """ Closes connection and stops threads. Blocking until threads stop """
+        with self.__lifecycle:
+            self.__running = False
+            self.__lifecycle.notify_all()
+        try:
+            self.__wake_writer.send(b"\0")
+        except OSError:
+            pass
+        self.__scheduler.close()
+        self.__read_queue.close()
+        self.__link_up.set()
         try:
             self.irc_client.shutdown(socket.SHUT_RDWR)
-            self.irc_client.close()
         except OSError as err:
             self.logger.error(err)
         finally:
-            self.logger.info("Waiting for threads to close, ~15 seconds...")
+            self.logger.info("Waiting for threads to close...")
+            threads = (self.__socket_reader, self.__socket_writer, self.__keepalive)
+            for thread in threads:
+                if thread.is_alive():
+                    thread.join()
             self.__socket_open = False
-            self.__socket_reader.join()
-            self.__socket_writer.join()
+            self.irc_client.close()
+            self.__wake_reader.close()
+            self.__wake_writer.close()
+
+    def __drop_link(self, reason: str) -> None:
+        """ Shut the socket down, the reader closes it and reconnects """
+        if not self.__socket_open:
+            return
+        self.logger.warning("Dropping link: %s", reason)
+        self.__socket_open = False
+        self.__link_up.clear()
+        try:
+            self.irc_client.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def __reconnect(self) -> bool:
+        """Reconnect with backoff until connected or stopped, True if connected
+
+        Pending SYSTEM lines of the dead session are discarded, along with
+        any batch the writer holds from it, then the login is replayed and
+        every channel is queued for a paced re-JOIN.
+        """
+        lost = time.monotonic()
+        self.irc_client.close()
+        attempt = 0
+        while self.__running:
+            if attempt:
+                delay = min(
+                    RECONNECT_DELAY_MIN * 2 ** (attempt - 1), RECONNECT_DELAY_MAX
+                )
+                with self.__lifecycle:
+                    self.__lifecycle.wait(delay * random.uniform(0.5, 1.0))
+                if not self.__running:
+                    break
+            attempt += 1
+            self.irc_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                self.__create_socket()
+            except OSError as err:
+                self.logger.error("Reconnect attempt %s failed: %s", attempt, err)
+                self.irc_client.close()
+                continue
+            self.__scheduler.discard(self.__system)
+            self.__scheduler.discard_priority()
+            self.__scheduler.new_generation()
+            self.__authenticate()
+            with self.__lifecycle:
+                self.__joins = deque(self.channels)
+                self.__lifecycle.notify_all()
+            self.__link_up.set()
+            downtime = time.monotonic() - lost
+            self.logger.info("Reconnected after %.0f ms", downtime * 1000)
+            if self.metrics is not None:
+                self.metrics.reconnects += 1
+                self.metrics.reconnect_downtime.observe(downtime)
+            return True
+        return False
+
+    @property
+    def channels(self) -> List[str]:
+        """ Names of joined channels """
+        return [channel.name for channel in list(self.__channels.values())]
+
+    def __write_queue_depths(self) -> Dict[str, int]:
+        """ Pending messages by channel name, SYSTEM included """
+        depths = {self.__system.name: len(self.__system.write_queue)}
+        for channel in list(self.__channels.values()):
+            depths[channel.name] = len(channel.write_queue)
+        return depths
+
+    def ping(self) -> None:
+        """ Send a PING, its PONG is recorded in metrics.ping_rtt """
+        self.send_to_server(f"PING :{time.perf_counter_ns()}")
 
     def send_to_server(self, message: str) -> None:
-        """ Sends a message to the server, returns queued message """
-        # Adds message to write SYS write queue, always active
-        for channel in self.__channels:
-            if channel.name == "SYSTEM":
-                channel.send(Message.from_string(message))
+        """Sends a message to the server through the SYSTEM queue, always active
+
+        Commands in PRIORITY_COMMANDS bypass the queue and its throttle and
+        are written ahead of any queued chat.
+        """
+        msg = Message.from_string(message)
+        if msg.command in PRIORITY_COMMANDS:
+            self.__scheduler.submit_priority(msg)
+        else:
+            self.__system.send(msg)
 
     def send_to_channel(self, channel_name: str, message: str) -> None:
         """ Sends a message to the specific channel queue """
-        for channel in self.__channels:
-            if channel.name == channel_name:
-                channel.send(Message.from_string(message))
-                return
-        self.logger.error("Not in channel: %s", channel)
+        channel = self.__channels.get(normalize_channel_name(channel_name))
+        if channel is None:
+            self.logger.error("Not in channel: %s", channel_name)
+            return
+        channel.send(Message.from_string(message))
 
     def join_channel(self, channel_name: str) -> None:
         """ Join channel """
-        channels = [ch.name for ch in self.__channels]
-        if channel_name in channels:
-            self.logger.error("Already in channel: %s", channel_name)
-        else:
-            self.__channels.append(
-                IRCChannel(
-                    channel_name, WRITE_THROTTLE_MSG_COUNT, WRITE_THROTTLE_SEC_SPAN
-                )
+        self.join_channels([channel_name])
+
+    def join_channels(self, channel_names: List[str]) -> None:
+        """Join several channels with as few comma separated JOIN lines as fit
+
+        JOINs go out at the join rate once the server has welcomed the
+        session, queued behind any re-JOINs still waiting.
+        """
+        joining: List[str] = []
+        for channel_name in channel_names:
+            key = normalize_channel_name(channel_name)
+            if key in self.__channels:
+                self.logger.error("Already in channel: %s", channel_name)
+                continue
+            self.__channels[key] = IRCChannel(
+                channel_name,
+                WRITE_THROTTLE_MSG_COUNT,
+                WRITE_THROTTLE_SEC_SPAN,
+                scheduler=self.__scheduler,
+                max_queue=WRITE_QUEUE_MAX_SIZE,
+                overflow=self.__cfg.overflow_policy,
+                chat_log=self.__chat_log,
             )
-            self.send_to_server(f"JOIN {channel_name}")
-
-    def __socket_read_loop(self, read_size: int = 512) -> None:
-        """ Reads open socket, drops messages in queue, exits on socket close """
-        self.logger.debug("Enter socket read loop. read_size: %s", read_size)
-        remaining_seg = b""
-        while self.__socket_open:
-            read_list, _, _ = select.select([self.irc_client], [], [], 15)
-            if not read_list:
+            joining.append(channel_name)
+        with self.__lifecycle:
+            self.__joins.extend(joining)
+            self.__lifecycle.notify_all()
+
+    def __send_joins(self, channel_names: List[str]) -> None:
+        """ Send JOINs as comma separated lines within MAX_SEND_CHAR_SIZE """
+        joining: List[str] = []
+        for channel_name in channel_names:
+            if joining and len(",".join(joining)) + len(channel_name) + 6 > (
+                MAX_SEND_CHAR_SIZE
+            ):
+                self.send_to_server(f"JOIN {','.join(joining)}")
+                joining = []
+            joining.append(channel_name)
+        if joining:
+            self.send_to_server(f"JOIN {','.join(joining)}")
+
+    def part_channel(self, channel_name: str) -> None:
+        """ Leave channel, unsent messages for the channel are discarded """
+        channel = self.__channels.pop(normalize_channel_name(channel_name), None)
+        if channel is None:
+            self.logger.error("Not in channel: %s", channel_name)
+            return
+        self.__scheduler.discard(channel)
+        self.send_to_server(f"PART {channel.name}")
+
+    def __socket_read_loop(self) -> None:
+        """Reads open socket, drops messages in queue, exits on disconnect
+
+        A dropped link is reconnected from here when reconnect is on,
+        otherwise the client stops running.
+        """
+        buffer = LineBuffer(self.__cfg.read_size)
+        self.logger.debug("Enter socket read loop. read_size: %s", buffer.read_size)
+        while self.__running:
+            if not self.__socket_open:
+                if not self.__cfg.reconnect or not self.__reconnect():
+                    break
+                buffer = LineBuffer(self.__cfg.read_size)
+
+            read_list, _, _ = select.select(
+                [self.irc_client, self.__wake_reader], [], [], SELECT_TIMEOUT
+            )
+            if self.irc_client not in read_list:
                 continue
 
             try:
-                read_segment = self.irc_client.recv(read_size)
-                self.logger.debug("Read %s bytes", len(read_segment))
+                read_size = buffer.recv_into(self.irc_client)
+                self.logger.debug("Read %s bytes", read_size)
+            except BlockingIOError:
+                continue
             except (ConnectionResetError, OSError) as err:
-                self.logger.error("Send failed: %s", err)
-                self.__socket_open = False
-                break
+                self.logger.error("Read failed: %s", err)
+                self.__drop_link("read failed")
+                continue
 
-            if read_segment:
-                read_segment = remaining_seg + read_segment
-                remaining_seg = self.__parse_read_segment(read_segment)
+            if read_size:
+                self.__last_read = time.monotonic()
+                if self.__recorder is not None:
+                    self.__recorder.record(buffer.tail(read_size))
+                lines = buffer.lines()
+                metrics = self.metrics
+                sample = 0
+                if metrics is not None:
+                    metrics.bytes_read += read_size
+                    metrics.lines_read += len(lines)
+                    sample = metrics.sample_every
+                for idx, line in enumerate(lines):
+                    if line:
+                        timed = sample and not idx % sample
+                        self.__handle_line(line, metrics if timed else None)
             else:
                 self.logger.warning("Read: Socket is closed!")
-                self.__socket_open = False
+                self.__drop_link("socket closed")
+        with self.__lifecycle:
+            self.__running = False
+            self.__lifecycle.notify_all()
+        self.__scheduler.close()
         self.logger.debug("Exit socket read loop.")
 
-    def __parse_read_segment(self, read_segment: bytes) -> bytes:
-        """ Routes system commands and add lines to read queue, returns overflow """
-        message_lines = read_segment.decode("UTF-8").split("\r\n")
-        overflow = message_lines.pop() if not message_lines[-1].endswith("\r\n") else ""
+    def __handle_line(
+        self, line: bytes, metrics: Optional[ClientMetrics] = None
+    ) -> None:
+        """Routes system commands and adds the parsed line to read queue
+
+        With metrics given, the parse is timed into metrics.parse_time.
+        """
+        if metrics is None:
+            msg = Message.from_bytes(line)
+        else:
+            tic = time.perf_counter()
+            msg = Message.from_bytes(line)
+            metrics.parse_time.observe(time.perf_counter() - tic)
+        if msg.command == "PING":
+            self.logger.info("PING? PONG!")
+            self.send_to_server(f"PONG :{msg.content}")
+        elif msg.command == "PONG" and self.metrics is not None:
+            self.__record_pong(msg, self.metrics)
+        elif msg.command in (RPL_ENDOFMOTD, ERR_NOMOTD):
+            self.__scheduler.hold(False)
+            with self.__lifecycle:
+                self.__welcomed = True
+                self.__lifecycle.notify_all()
+        self.__read_queue.put(msg)
+
+    def __record_pong(self, msg: Message, metrics: ClientMetrics) -> None:
+        """ Records the round trip of a PONG answering ping() """
+        try:
+            sent = int(msg.content)
+        except ValueError:
+            return
+        metrics.ping_rtt.observe((time.perf_counter_ns() - sent) / 1e9)
+
+    def __keepalive_loop(self) -> None:
+        """Watches the link and paces re-JOINs until the client stops
+
+        A PING is sent after keepalive seconds without a read. If nothing
+        is read within pong_timeout of it, the link is dropped and the
+        reader reconnects. Channels queued for JOIN, by join_channels() or
+        by a reconnect, are joined once the server has welcomed the session
+        at the join rate.
+        """
+        with self.__lifecycle:
+            while self.__running:
+                timeout = self.__check_link()
+                wait = self.__release_joins()
+                if wait is not None:
+                    timeout = min(timeout, wait)
+                self.__lifecycle.wait(max(timeout, 0.0))
+
+    def __check_link(self) -> float:
+        """ Ping a quiet link or drop an unanswered one, returns seconds to recheck """
+        if not self.__socket_open:
+            return self.__cfg.keepalive
+        now = time.monotonic()
+        if self.__ping_sent is not None:
+            if self.__last_read > self.__ping_sent:
+                self.__ping_sent = None
+            elif now - self.__ping_sent >= self.__cfg.pong_timeout:
+                self.__ping_sent = None
+                self.__drop_link("PING timeout")
+                return self.__cfg.keepalive
+            else:
+                return self.__ping_sent + self.__cfg.pong_timeout - now
+        idle = now - self.__last_read
+        if idle >= self.__cfg.keepalive:
+            self.ping()
+            self.__ping_sent = now
+            return self.__cfg.pong_timeout
+        return self.__cfg.keepalive - idle
 
-        for line in message_lines:
-            if line:
-                msg = Message.from_string(line)
-                if msg.command == "PING":
-                    self.logger.info("PING? PONG!")
-                    self.send_to_server(f"PONG :{msg.content}")
-                self.__read_queue.put(msg)
-        return overflow.encode("UTF-8")
+    def __release_joins(self) -> Optional[float]:
+        """ JOIN what the join rate allows now, returns seconds until more may go """
+        if not (self.__joins and self.__welcomed and self.__socket_open):
+            return None
+        joining: List[str] = []
+        wait = None
+        while self.__joins:
+            if normalize_channel_name(self.__joins[0]) not in self.__channels:
+                self.__joins.popleft()
+                continue
+            if not self.__join_rate.inc_to_max("JOIN"):
+                wait = self.__join_rate.wait_time("JOIN")
+                break
+            joining.append(self.__joins.popleft())
+        self.__send_joins(joining)
+        return wait
 
     def __socket_write_loop(self) -> None:
-        """ Writes queue'ed messages to open socket, exits on socket close """
+        """Writes queue'ed messages to open socket, exits on socket close
+
+        Blocks on the write scheduler, which hands out every channel message
+        the channel and global throttles allow right now. The batch is
+        written with a single send where the socket buffer has room. A
+        batch still in hand when a reconnect starts a new generation
+        belongs to the dead session and is dropped, so nothing is written
+        ahead of the new login.
+        """
         self.logger.debug("Enter socket write loop.")
-        while self.__socket_open:
-            for channel in self.__channels:
-                try:
-                    message = channel.write_queue.get_nowait()
-                except Empty:
-                    continue
-                self.__send(message.message)
+        while self.__running:
+            generation = self.__scheduler.generation
+            batch = self.__scheduler.next_batch(WRITE_BATCH_BYTES, generation)
+            if not batch:
+                continue
+            self.__link_up.wait()
+            if generation != self.__scheduler.generation:
+                self.logger.warning("Dropping %s lines of a lost link", len(batch))
+                continue
+            self.__send([message.message for message in batch])
         self.logger.debug("Exit socket write loop")
 
-    def __send(self, message: str) -> None:
-        """ Sends raw bytes, retries if blocked """
-        self.logger.debug(
-            "Send message: %s", message if "PASS" not in message else "PASS ***"
-        )
-        send_msg = f"{message}\r\n".encode("UTF-8")
+    def __send(self, messages: List[str]) -> None:
+        """ Sends lines as one buffer, waits for writability if blocked """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            for message in messages:
+                self.logger.debug(
+                    "Send message: %s", message if "PASS" not in message else "PASS ***"
+                )
+        send_msg = "".join(f"{message}\r\n" for message in messages).encode("UTF-8")
         total_sent = 0
-        while total_sent < len(send_msg) and self.__socket_open:
-            try:
-                sent_size = self.irc_client.send(send_msg[total_sent:])
-                if not sent_size:
-                    self.logger.warning("Write: Socket is closed!")
-                    self.__socket_open = False
-                total_sent += sent_size
-            except BlockingIOError:
-                self.logger.debug("Send blocked, retry...")
-            except (ConnectionResetError, OSError) as err:
-                self.logger.error("Send failed: %s", err)
-                self.__socket_open = False
-        self.logger.debug("Sent %s bytes.", len(message))
+        with memoryview(send_msg) as view:
+            while total_sent < len(send_msg) and self.__socket_open:
+                try:
+                    sent_size = self.irc_client.send(view[total_sent:])
+                    if not sent_size:
+                        self.logger.warning("Write: Socket is closed!")
+                        self.__drop_link("socket closed")
+                    total_sent += sent_size
+                except BlockingIOError:
+                    self.logger.debug("Send blocked, waiting for socket...")
+                    select.select([], [self.irc_client], [], WRITE_BLOCK_TIMEOUT)
+                except (ConnectionResetError, OSError) as err:
+                    self.logger.error("Send failed: %s", err)
+                    self.__drop_link("send failed")
+        self.logger.debug("Sent %s bytes.", total_sent)
+        if self.metrics is not None:
+            self.metrics.bytes_written += total_sent
+            if total_sent == len(send_msg):
+                self.metrics.lines_written += len(messages)
 
-    def start(self, *args) -> None:
-        """ Main process loop? """
+    def start(self, *args: Callable[[Message], None]) -> None:
+        """ Connect, join the default channel, and dispatch until disconnected """
         self.connect()
         time.sleep(4)
         self.join_channel("#travelcast_bot")
-        while self.connected:
-            try:
-                message = self.__read_queue.get_nowait()
-            except Empty:
-                continue
-            for channel in self.__channels:
-                channel.handle_message(message)
-            for arg in args:
-                arg(message)
+        self.dispatch(*args)
+
+    def dispatch(self, *args: Callable[[Message], None]) -> None:
+        """Blocking dispatch loop, returns once the client stops running
+
+        Blocks on the read queue for up to READ_QUEUE_TIMEOUT seconds then
+        drains up to DISPATCH_BATCH_SIZE messages, priority lane first,
+        handing each to its channel and then to every handler callable in
+        args. Messages read before the client stopped are still dispatched.
+        """
+        metrics = self.metrics
+        sample = metrics.sample_every if metrics is not None else 0
+        while self.__running or not self.__read_queue.empty():
+            batch = self.__read_queue.get_batch(DISPATCH_BATCH_SIZE, READ_QUEUE_TIMEOUT)
+            for idx, message in enumerate(batch):
+                self.__route(message)
+                if sample and not idx % sample:
+                    tic = time.perf_counter()
+                    for arg in args:
+                        arg(message)
+                    metrics.handler_latency.observe(  # type: ignore
+                        time.perf_counter() - tic
+                    )
+                    continue
+                for arg in args:
+                    arg(message)
+
+    def __route(self, message: Message) -> None:
+        """ Hands message to its target channel, or SYSTEM if not addressed """
+        channel = None
+        if message.channel is not None:
+            channel = self.__channels.get(normalize_channel_name(message.channel))
+        (channel if channel is not None else self.__system).handle_message(message)
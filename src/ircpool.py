@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Spreads channels across several IRC connections behind one dispatch point
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from multiprocessing.synchronize import Event
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Callable
+from typing import Optional
+from typing import NamedTuple
+from typing import Set
+from typing import Union
+
+from src.ircclient import IRCClient
+from src.ircclient import JOIN_RATE_COUNT
+from src.ircclient import JOIN_RATE_SEC_SPAN
+from src.ircclient import RECONNECT_DELAY_MAX
+from src.ircclient import RECONNECT_DELAY_MIN
+from src.ircchannel import normalize_channel_name
+from src.readqueue import READ_DROP_OLDEST
+from src.model.message import Message
+from src.decayingcounter import DecayingCounter
+
+# Seconds between connection health checks
+HEALTH_CHECK_INTERVAL = 1.0
+# Merged dispatch blocks this long before checking the pool is still open
+MERGED_QUEUE_TIMEOUT = 0.25
+# A starting worker process is checked this often until it has connected
+WORKER_START_POLL = 0.05
+
+MergedQueue = Union["queue.Queue[Message]", "multiprocessing.Queue[Message]"]
+
+
+class PoolConfig(NamedTuple):
+    """ Settings every connection of a pool is created from """
+
+    nickname: str
+    password: Optional[str]
+    url: str
+    port: int
+    join_rate_count: int
+    join_rate_span: int
+    read_policy: str
+
+
+class _Shard:
+    """ One IRCClient in this process, forwarding messages to the merged queue """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, config: PoolConfig, merged: MergedQueue) -> None:
+        """ No I/O until start() """
+        self.channels: Dict[str, str] = {}
+        self.__merged = merged
+        self.__client = IRCClient(
+            config.nickname,
+            config.password,
+            config.url,
+            config.port,
+            reconnect=False,
+            join_rate_count=config.join_rate_count,
+            join_rate_span=config.join_rate_span,
+            read_policy=config.read_policy,
+        )
+        self.__dispatcher = threading.Thread(
+            target=self.__client.dispatch, args=(self.__merged.put,), daemon=True
+        )
+
+    @property
+    def alive(self) -> bool:
+        """ True while the connection is open, the pool replaces dead ones """
+        return self.__client.connected
+
+    def start(self) -> None:
+        """ Connect and start forwarding messages """
+        self.__client.connect()
+        self.__dispatcher.start()
+
+    def stop(self) -> None:
+        """ Disconnect, blocking until the client threads stop """
+        self.__client.disconnect()
+
+    def join(self, channel_names: List[str]) -> None:
+        """ Join channels on this connection """
+        for name in channel_names:
+            self.channels[normalize_channel_name(name)] = name
+        self.__client.join_channels(channel_names)
+
+    def part(self, channel_name: str) -> None:
+        """ Leave channel on this connection """
+        self.channels.pop(normalize_channel_name(channel_name), None)
+        self.__client.part_channel(channel_name)
+
+    def send(self, channel_name: str, message: str) -> None:
+        """ Queue message to a channel of this connection """
+        self.__client.send_to_channel(channel_name, message)
+
+
+def _shard_worker(
+    config: PoolConfig,
+    commands: "multiprocessing.Queue[Any]",
+    merged: "multiprocessing.Queue[Message]",
+    connected: Event,
+) -> None:
+    """Child process body: runs one _Shard driven by commands from the parent
+
+    Sets connected once the connection is open, exits without it if the
+    connect fails.
+    """
+    shard = _Shard(config, merged)
+    try:
+        shard.start()
+    except OSError:
+        return
+    connected.set()
+    while shard.alive:
+        try:
+            command, *args = commands.get(timeout=HEALTH_CHECK_INTERVAL)
+        except queue.Empty:
+            continue
+        if command == "stop":
+            break
+        getattr(shard, command)(*args)
+    shard.stop()
+
+
+class _ProcessShard:
+    """ One IRCClient hosted in a worker process """
+
+    def __init__(
+        self, config: PoolConfig, merged: "multiprocessing.Queue[Message]"
+    ) -> None:
+        """ No I/O until start() """
+        self.channels: Dict[str, str] = {}
+        self.__commands: "multiprocessing.Queue[Any]" = multiprocessing.Queue()
+        self.__connected = multiprocessing.Event()
+        self.__process = multiprocessing.Process(
+            target=_shard_worker,
+            args=(config, self.__commands, merged, self.__connected),
+            daemon=True,
+        )
+
+    @property
+    def alive(self) -> bool:
+        """ True while the worker process runs """
+        return self.__process.is_alive()
+
+    def start(self) -> None:
+        """ Start the worker process, raises OSError if it cannot connect """
+        self.__process.start()
+        while not self.__connected.wait(WORKER_START_POLL):
+            if not self.__process.is_alive():
+                raise OSError("Worker process could not connect")
+
+    def stop(self) -> None:
+        """ Ask the worker to disconnect and wait for it """
+        if self.__process.is_alive():
+            self.__commands.put(("stop",))
+            self.__process.join(timeout=30)
+
+    def join(self, channel_names: List[str]) -> None:
+        """ Join channels in the worker """
+        for name in channel_names:
+            self.channels[normalize_channel_name(name)] = name
+        self.__commands.put(("join", channel_names))
+
+    def part(self, channel_name: str) -> None:
+        """ Leave channel in the worker """
+        self.channels.pop(normalize_channel_name(channel_name), None)
+        self.__commands.put(("part", channel_name))
+
+    def send(self, channel_name: str, message: str) -> None:
+        """ Queue message to a channel in the worker """
+        self.__commands.put(("send", channel_name, message))
+
+
+Shard = Union[_Shard, _ProcessShard]
+
+
+class IRCClientPool:
+    """Shards channels across several IRCClient connections
+
+    Channels are assigned to the live connection holding the fewest
+    channels when their JOIN is released. JOINs are paced by one
+    account-wide DecayingCounter and sent as comma separated lines. A
+    supervisor thread replaces connections that die and re-joins their
+    channels on the least loaded connections. Every connection forwards
+    its messages to one merged queue read by dispatch().
+
+    With workers set, each connection runs in its own process and
+    messages cross back to this process through a multiprocessing queue.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        nickname: str,
+        password: Optional[str],
+        server_url: str,
+        port: int,
+        connections: int,
+        workers: bool = False,
+        join_rate_count: int = JOIN_RATE_COUNT,
+        join_rate_span: int = JOIN_RATE_SEC_SPAN,
+        read_policy: str = READ_DROP_OLDEST,
+    ) -> None:
+        """Create a pool, no I/O until connect()
+
+        Args:
+            connections: Number of IRC connections to spread channels over
+            workers: Host each connection in its own worker process
+            join_rate_count: JOINs allowed per join_rate_span seconds
+            read_policy: Full inbound chat queue policy of every connection,
+                as IRCClient's read_policy
+        """
+        self.__cfg = PoolConfig(
+            nickname,
+            password,
+            server_url,
+            port,
+            join_rate_count,
+            join_rate_span,
+            read_policy,
+        )
+        self.__size = connections
+        self.__workers = workers
+        self.__merged: MergedQueue = (
+            multiprocessing.Queue() if workers else queue.Queue()
+        )
+        self.__join_rate = DecayingCounter(join_rate_span, join_rate_count)
+        self.__shards: List[Shard] = []
+        self.__owner: Dict[str, Shard] = {}
+        self.__pending: Deque[str] = deque()
+        self.__pending_keys: Set[str] = set()
+        self.__condition = threading.Condition()
+        self.__supervisor = threading.Thread(target=self.__supervise, daemon=True)
+        self.__open = False
+
+    @property
+    def connected(self) -> bool:
+        """ True between connect() and disconnect() """
+        return self.__open
+
+    @property
+    def channels(self) -> List[str]:
+        """ Names of channels joined or waiting to join """
+        with self.__condition:
+            names = [name for sh in self.__shards for name in sh.channels.values()]
+            return names + list(self.__pending)
+
+    def connections(self) -> Dict[int, int]:
+        """ Channel count held by each connection, by connection index """
+        with self.__condition:
+            return {idx: len(shard.channels) for idx, shard in enumerate(self.__shards)}
+
+    def connect(self) -> None:
+        """ Open every connection and start the supervisor """
+        self.__open = True
+        for _ in range(self.__size):
+            shard = self.__start_shard()
+            if shard is not None:
+                self.__shards.append(shard)
+        self.__supervisor.start()
+
+    def disconnect(self) -> None:
+        """ Close every connection, blocking until they stop """
+        with self.__condition:
+            self.__open = False
+            self.__condition.notify_all()
+        if self.__supervisor.is_alive():
+            self.__supervisor.join()
+        for shard in self.__shards:
+            shard.stop()
+
+    def join_channel(self, channel_name: str) -> None:
+        """ Queue a channel to be joined when the join rate allows """
+        key = normalize_channel_name(channel_name)
+        with self.__condition:
+            if key in self.__owner or key in self.__pending_keys:
+                self.logger.error("Already in channel: %s", channel_name)
+                return
+            self.__pending.append(channel_name)
+            self.__pending_keys.add(key)
+            self.__condition.notify_all()
+
+    def part_channel(self, channel_name: str) -> None:
+        """ Leave channel on whichever connection holds it """
+        key = normalize_channel_name(channel_name)
+        with self.__condition:
+            shard = self.__owner.pop(key, None)
+            if shard is not None:
+                shard.part(channel_name)
+                return
+            if key not in self.__pending_keys:
+                self.logger.error("Not in channel: %s", channel_name)
+                return
+            self.__pending_keys.remove(key)
+            self.__pending = deque(
+                name for name in self.__pending if normalize_channel_name(name) != key
+            )
+
+    def send_to_channel(self, channel_name: str, message: str) -> None:
+        """ Sends a message through the connection that holds the channel """
+        shard = self.__owner.get(normalize_channel_name(channel_name))
+        if shard is None:
+            self.logger.error("Not in channel: %s", channel_name)
+            return
+        shard.send(channel_name, message)
+
+    def dispatch(self, *args: Callable[[Message], None]) -> None:
+        """ Blocking, hands every connection's messages to args until disconnect """
+        while self.__open:
+            try:
+                message = self.__merged.get(timeout=MERGED_QUEUE_TIMEOUT)
+            except queue.Empty:
+                continue
+            for arg in args:
+                arg(message)
+
+    def __start_shard(self) -> Optional[Shard]:
+        """ Start a new connection, None if it could not connect """
+        shard: Shard = (
+            _ProcessShard(self.__cfg, self.__merged)  # type: ignore
+            if self.__workers
+            else _Shard(self.__cfg, self.__merged)
+        )
+        try:
+            shard.start()
+        except OSError as err:
+            self.logger.error("Connection failed: %s", err)
+            shard.stop()
+            return None
+        return shard
+
+    def __supervise(self) -> None:
+        """Release paced JOINs and replace dead connections until disconnect
+
+        Connections are stopped and started with the lock released, so a
+        slow connect never stalls senders. Missing connections, dead or
+        never started, are retried with backoff from RECONNECT_DELAY_MIN
+        doubling to RECONNECT_DELAY_MAX while connects keep failing.
+        """
+        next_check = time.monotonic()
+        failures = 0
+        with self.__condition:
+            while self.__open:
+                now = time.monotonic()
+                if now >= next_check:
+                    if self.__replace_dead():
+                        failures = 0
+                        next_check = now + HEALTH_CHECK_INTERVAL
+                    else:
+                        failures += 1
+                        next_check = now + min(
+                            RECONNECT_DELAY_MIN * 2 ** (failures - 1),
+                            RECONNECT_DELAY_MAX,
+                        )
+                wait = self.__release_joins()
+                timeout = next_check - time.monotonic()
+                if wait is not None:
+                    timeout = min(timeout, wait)
+                self.__condition.wait(max(timeout, 0.0))
+
+    def __release_joins(self) -> Optional[float]:
+        """ JOIN what the rate allows now, returns seconds until more may go """
+        live = [shard for shard in self.__shards if shard.alive]
+        if not live:
+            return None
+        batches: Dict[int, List[str]] = {}
+        wait = None
+        while self.__pending:
+            if not self.__join_rate.inc_to_max("JOIN"):
+                wait = self.__join_rate.wait_time("JOIN")
+                break
+            channel_name = self.__pending.popleft()
+            key = normalize_channel_name(channel_name)
+            self.__pending_keys.discard(key)
+            shard = min(
+                live, key=lambda sh: len(sh.channels) + len(batches.get(id(sh), []))
+            )
+            batches.setdefault(id(shard), []).append(channel_name)
+            self.__owner[key] = shard
+        for shard in live:
+            if id(shard) in batches:
+                shard.join(batches[id(shard)])
+        return wait
+
+    def __replace_dead(self) -> bool:
+        """Swap out dead connections, their channels go back to pending
+
+        Called with the lock held, released while connecting. False if
+        the pool is still short of connections afterwards.
+        """
+        dead = [shard for shard in self.__shards if not shard.alive]
+        for shard in dead:
+            self.logger.warning(
+                "Connection lost, rebalancing %s channels", len(shard.channels)
+            )
+            self.__shards.remove(shard)
+            for key, name in shard.channels.items():
+                if self.__owner.get(key) is shard:
+                    del self.__owner[key]
+                    self.__pending.appendleft(name)
+                    self.__pending_keys.add(key)
+        missing = self.__size - len(self.__shards)
+        if not dead and not missing:
+            return True
+        self.__condition.release()
+        try:
+            for shard in dead:
+                shard.stop()
+            started = [self.__start_shard() for _ in range(missing)]
+        finally:
+            self.__condition.acquire()
+        self.__shards.extend(shard for shard in started if shard is not None)
+        return len(self.__shards) == self.__size
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Reusable receive buffer that frames a byte stream into CRLF lines
+
+Author: Preocts <preocts@preocts.com>
+"""
+import socket
+import logging
+from typing import List
+from typing import Union
+
+# Default bytes requested per recv_into
+READ_SIZE = 65_536
+# Partial lines longer than this are discarded, guards against a runaway peer
+MAX_LINE_SIZE = 1_048_576
+# Carriage return, a partial line ending in one may be completed by the next read
+CR = ord("\r")
+
+
+class LineBuffer:
+    """Frames a stream of bytes into lines without re-copying the backlog
+
+    Bytes are received straight into one bytearray. The last CRLF is found
+    with rfind over only the bytes not yet scanned, then every complete
+    line is copied out once and split in a single call. Only the trailing
+    partial line is ever moved, and only when the free tail is smaller
+    than read_size. Nothing is decoded here so a multibyte character split
+    across two reads is never cut. A partial line past max_line is dropped
+    along with the rest of it, up to and including its CRLF.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    __slots__ = [
+        "read_size",
+        "max_line",
+        "__buffer",
+        "__start",
+        "__scan",
+        "__end",
+        "__discarding",
+    ]
+
+    def __init__(self, read_size: int = READ_SIZE, max_line: int = MAX_LINE_SIZE):
+        """ read_size is the most bytes asked of the socket per read """
+        self.read_size = read_size
+        self.max_line = max_line
+        self.__buffer = bytearray(read_size * 2)
+        self.__start = 0
+        self.__scan = 0
+        self.__end = 0
+        self.__discarding = False
+
+    def __len__(self) -> int:
+        """ Bytes held that are not yet part of a returned line """
+        return self.__end - self.__start
+
+    def recv_into(self, sock: socket.socket) -> int:
+        """ One recv_into from sock, returns bytes read, 0 on a closed socket """
+        self.__reserve(self.read_size)
+        with memoryview(self.__buffer) as view:
+            size = sock.recv_into(view[self.__end : self.__end + self.read_size])
+        self.__end += size
+        return size
+
+    def tail(self, size: int) -> bytes:
+        """ Copy of the last size bytes received, valid until lines() is called """
+        return bytes(self.__buffer[self.__end - size : self.__end])
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """ Append bytes that arrived from somewhere other than a socket """
+        self.__reserve(len(data))
+        self.__buffer[self.__end : self.__end + len(data)] = data
+        self.__end += len(data)
+
+    def lines(self) -> List[bytes]:
+        """ Every complete line, without the CRLF, in arrival order """
+        last = self.__buffer.rfind(b"\r\n", self.__scan, self.__end)
+        if last == -1:
+            self.__scan = max(self.__start, self.__end - 1)
+            if self.__discarding:
+                self.__drop_partial()
+            elif self.__end - self.__start > self.max_line:
+                self.logger.warning("Dropping %s byte partial line", len(self))
+                self.__discarding = True
+                self.__drop_partial()
+            return []
+        with memoryview(self.__buffer) as view:
+            complete = bytes(view[self.__start : last])
+        if last + 2 == self.__end:
+            self.__start = self.__scan = self.__end = 0
+        else:
+            self.__start = self.__scan = last + 2
+        lines = complete.split(b"\r\n")
+        if self.__discarding:
+            self.__discarding = False
+            del lines[0]
+        return lines
+
+    def __drop_partial(self) -> None:
+        """ Forget the partial line, keeping a last CR that may begin its CRLF """
+        held_cr = self.__end > self.__start and self.__buffer[self.__end - 1] == CR
+        self.__start = self.__scan = self.__end = 0
+        if held_cr:
+            self.__buffer[0] = CR
+            self.__end = 1
+
+    def __reserve(self, size: int) -> None:
+        """ Ensure size free bytes after end, compacting then growing """
+        if len(self.__buffer) - self.__end >= size:
+            return
+        pending = self.__end - self.__start
+        if self.__start:
+            self.__buffer[:pending] = self.__buffer[self.__start : self.__end]
+            self.__scan -= self.__start
+            self.__start, self.__end = 0, pending
+        if len(self.__buffer) - self.__end < size:
+            self.__buffer.extend(bytes(pending + size - len(self.__buffer)))
@@ -4,11 +4,18 @@
 
 Author: Preocts <preocts@preocts.com>
 """
+import os
 import logging
 
 from src.loadenv import LoadEnv
 from src.ircclient import IRCClient
-from src.model.message import Message
+from src.chatlog import ChatLogger
+from src.chatstats import ChatAnalytics
+from src.historystore import HistoryStore
+from src.membership import MembershipIndex
+from src.modfilter import ModerationFilter
+from src.commandrouter import CommandContext
+from src.commandrouter import CommandRouter
 
 
 class IRCBot:
@@ -19,27 +26,46 @@ class IRCBot:
     def __init__(self) -> None:
         """ INIT """
         self.keyring.load()
+        self.chat_log = ChatLogger("chatlogs")
+        self.history = HistoryStore("history.db")
         self.irc_client = IRCClient(
             self.keyring.get("BOT_NAME"),
             self.keyring.get("BOT_OAUTH_TWITCH"),
             self.keyring.get("SERVER"),
             int(self.keyring.get("PORT")),
+            chat_log=self.chat_log,
         )
+        self.moderation = ModerationFilter(
+            self.irc_client.send_to_channel,
+            path="modrules.json" if os.path.exists("modrules.json") else None,
+        )
+        self.stats = ChatAnalytics()
+        self.members = MembershipIndex(self.keyring.get("BOT_NAME"))
+        self.router = CommandRouter()
+        self.router.register("start", self.start_command, "#travelcast_bot")
+        self.router.register("exit", self.exit_command, "#travelcast_bot")
 
     def run_bot(self) -> None:
         """ This starts a bot, is blocking """
-        self.irc_client.start(self.message_handler)
+        self.chat_log.start()
+        self.history.start()
+        self.moderation.start()
+        self.irc_client.start(
+            self.moderation, self.router, self.history, self.stats, self.members
+        )
         self.irc_client.disconnect()
+        self.moderation.stop()
+        self.history.stop()
+        self.chat_log.stop()
 
-    def message_handler(self, message: Message) -> None:
-        """ Handle messages as they happen in IRC """
-        # print(f">>> {message.message}")
-        if message.command == "PRIVMSG" and "travelcast_bot" in message.params:
-            if message.content == "!start":
-                self.irc_client.send_to_channel("#travelcast_bot", "Starting now!")
-            if message.content == "!exit":
-                print("Shutdown!")
-                self.irc_client.disconnect()
+    def start_command(self, context: CommandContext) -> None:
+        """ !start in #travelcast_bot """
+        self.irc_client.send_to_channel(context.channel or "", "Starting now!")
+
+    def exit_command(self, context: CommandContext) -> None:
+        """ !exit in #travelcast_bot """
+        print("Shutdown!")
+        self.irc_client.disconnect()
 
 
 def main() -> None:
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Who is in which channel, kept current from NAMES, JOIN, PART and QUIT
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from src.model.message import Message
+from src.ircchannel import normalize_channel_name
+
+# NAMES reply listing some of a channel's members
+RPL_NAMREPLY = "353"
+# Mode prefixes a NAMES reply may put in front of a nick
+NICK_PREFIXES = "@+%~&"
+# Members a MemberSet keeps in a sorted array before switching to a bitmap
+ARRAY_LIMIT = 4_096
+# Reverse index entry of a nick id in no channel
+NO_CHANNEL = -1
+
+
+class MemberSet:
+    """Set of nick ids: a sorted array while small, a bitmap once large
+
+    A sorted array('I') costs 4 bytes a member and answers lookups by
+    bisection; past ARRAY_LIMIT members it becomes a bitmap of one bit
+    per nick id in use, so a 100k viewer channel among 300k users takes
+    about 37 KiB. It drops back to an array below half the limit.
+    """
+
+    __slots__ = ["ids", "bits", "size"]
+
+    def __init__(self) -> None:
+        """ Empty set """
+        self.ids = array("I")
+        self.bits: Optional[bytearray] = None
+        self.size = 0
+
+    def __len__(self) -> int:
+        """ Members held """
+        return self.size
+
+    def __contains__(self, uid: int) -> bool:
+        """ True if uid is a member """
+        bits = self.bits
+        if bits is not None:
+            byte = uid >> 3
+            return byte < len(bits) and bool(bits[byte] >> (uid & 7) & 1)
+        ids = self.ids
+        index = bisect_left(ids, uid)
+        return index < len(ids) and ids[index] == uid
+
+    def __iter__(self) -> Iterator[int]:
+        """ Member ids, ascending """
+        bits = self.bits
+        if bits is None:
+            yield from self.ids
+            return
+        for byte, value in enumerate(bits):
+            if value:
+                for bit in range(8):
+                    if value >> bit & 1:
+                        yield byte << 3 | bit
+
+    def add(self, uid: int) -> bool:
+        """ Add uid, False if already a member """
+        bits = self.bits
+        if bits is not None:
+            byte = uid >> 3
+            if byte >= len(bits):
+                bits.extend(bytes(max(byte + 1 - len(bits), len(bits) // 2)))
+            if bits[byte] >> (uid & 7) & 1:
+                return False
+            bits[byte] |= 1 << (uid & 7)
+            self.size += 1
+            return True
+        ids = self.ids
+        index = bisect_left(ids, uid)
+        if index < len(ids) and ids[index] == uid:
+            return False
+        ids.insert(index, uid)
+        self.size += 1
+        if self.size > ARRAY_LIMIT:
+            self.bits = bytearray((max(ids) >> 3) + 1)
+            for member in ids:
+                self.bits[member >> 3] |= 1 << (member & 7)
+            self.ids = array("I")
+        return True
+
+    def discard(self, uid: int) -> bool:
+        """ Remove uid, False if not a member """
+        bits = self.bits
+        if bits is not None:
+            byte = uid >> 3
+            if byte >= len(bits) or not bits[byte] >> (uid & 7) & 1:
+                return False
+            bits[byte] &= ~(1 << (uid & 7)) & 0xFF
+            self.size -= 1
+            if self.size < ARRAY_LIMIT // 2:
+                self.ids = array("I", iter(self))
+                self.bits = None
+            return True
+        ids = self.ids
+        index = bisect_left(ids, uid)
+        if index == len(ids) or ids[index] != uid:
+            return False
+        del ids[index]
+        self.size -= 1
+        return True
+
+
+class MembershipIndex:
+    """Members of every channel plus, per user, the channels they are in
+
+    Nicks are interned into a table of their own that hands each one a
+    small integer id, and gives the id back for reuse once the nick is
+    in no channel, so the strings parsed out of NAMES and JOIN lines
+    collapse into one object per user. Channels hold ids in MemberSets.
+    The reverse index is an array of each nick id's first channel id
+    plus a dict of tuples for the few users in more than one channel,
+    so "which channels is this user in" is one dict lookup and one
+    array read. Channel names are normalized, nicks lowercased.
+
+    When own_nick PARTs a channel the whole channel is forgotten. Twitch
+    only sends other users' JOIN, PART and NAMES to clients that request
+    the twitch.tv/membership capability.
+
+    The index is itself a handler, pass it to IRCClient.dispatch().
+    """
+
+    def __init__(self, own_nick: Optional[str] = None) -> None:
+        """ Empty index, own_nick is the client's nick if known """
+        self.own_nick = own_nick.lower() if own_nick else None
+        self.__nick_ids: Dict[str, int] = {}
+        self.__nicks: List[str] = []
+        self.__free: List[int] = []
+        self.__first = array("i")
+        self.__more: Dict[int, Tuple[int, ...]] = {}
+        self.__channel_ids: Dict[str, int] = {}
+        self.__channel_names: List[str] = []
+        self.__members: List[MemberSet] = []
+
+    def __len__(self) -> int:
+        """ Distinct users in any channel """
+        return len(self.__nick_ids)
+
+    def __call__(self, message: Message) -> None:
+        """ Handler interface, same as handle() """
+        self.handle(message)
+
+    def handle(self, message: Message) -> None:
+        """ Apply a NAMES reply, JOIN, PART or QUIT """
+        command = message.command
+        if command == RPL_NAMREPLY:
+            if message.channel is not None:
+                self.add_names(message.channel, message.content.split())
+        elif command == "JOIN":
+            if message.channel is not None and message.nick is not None:
+                for channel_name in message.channel.split(","):
+                    self.add(channel_name, message.nick)
+        elif command == "PART":
+            if message.channel is not None and message.nick is not None:
+                for channel_name in message.channel.split(","):
+                    if message.nick.lower() == self.own_nick:
+                        self.forget_channel(channel_name)
+                    else:
+                        self.remove(channel_name, message.nick)
+        elif command == "QUIT":
+            if message.nick is not None:
+                self.forget_user(message.nick)
+
+    def add_names(self, channel_name: str, names: Iterable[str]) -> None:
+        """ Add every nick of a NAMES reply, dropping mode prefixes """
+        cid = self.__channel_id(channel_name)
+        members = self.__members[cid]
+        for name in names:
+            nick = name.lstrip(NICK_PREFIXES).lower()
+            if nick:
+                uid = self.__nick_id(nick)
+                if members.add(uid):
+                    self.__link(uid, cid)
+
+    def add(self, channel_name: str, nick: str) -> None:
+        """ nick joined channel_name """
+        cid = self.__channel_id(channel_name)
+        uid = self.__nick_id(nick.lower())
+        if self.__members[cid].add(uid):
+            self.__link(uid, cid)
+
+    def remove(self, channel_name: str, nick: str) -> None:
+        """ nick left channel_name """
+        cid = self.__channel_ids.get(normalize_channel_name(channel_name))
+        uid = self.__nick_ids.get(nick.lower())
+        if cid is None or uid is None:
+            return
+        if self.__members[cid].discard(uid):
+            self.__unlink(uid, cid)
+
+    def forget_channel(self, channel_name: str) -> None:
+        """ Drop every membership of a channel """
+        cid = self.__channel_ids.get(normalize_channel_name(channel_name))
+        if cid is None:
+            return
+        members = self.__members[cid]
+        self.__members[cid] = MemberSet()
+        for uid in members:
+            self.__unlink(uid, cid)
+
+    def forget_user(self, nick: str) -> None:
+        """ Drop nick from every channel """
+        uid = self.__nick_ids.get(nick.lower())
+        if uid is None:
+            return
+        for cid in self.__channel_ids_of(uid):
+            self.__members[cid].discard(uid)
+            self.__unlink(uid, cid)
+
+    def members(self, channel_name: str) -> FrozenSet[str]:
+        """ Nicks in a channel """
+        cid = self.__channel_ids.get(normalize_channel_name(channel_name))
+        if cid is None:
+            return frozenset()
+        nicks = self.__nicks
+        return frozenset(nicks[uid] for uid in self.__members[cid])
+
+    def member_count(self, channel_name: str) -> int:
+        """ Members of a channel """
+        cid = self.__channel_ids.get(normalize_channel_name(channel_name))
+        return 0 if cid is None else len(self.__members[cid])
+
+    def is_member(self, channel_name: str, nick: str) -> bool:
+        """ True if nick is in channel_name """
+        cid = self.__channel_ids.get(normalize_channel_name(channel_name))
+        uid = self.__nick_ids.get(nick.lower())
+        return cid is not None and uid is not None and uid in self.__members[cid]
+
+    def channels_of(self, nick: str) -> FrozenSet[str]:
+        """ Channels nick is in """
+        uid = self.__nick_ids.get(nick.lower())
+        if uid is None:
+            return frozenset()
+        names = self.__channel_names
+        more = self.__more.get(uid)
+        if more is None:
+            return frozenset((names[self.__first[uid]],))
+        return frozenset([names[self.__first[uid]], *[names[cid] for cid in more]])
+
+    def channel_names(self) -> FrozenSet[str]:
+        """ Channels with members """
+        return frozenset(
+            name
+            for name, members in zip(self.__channel_names, self.__members)
+            if members
+        )
+
+    def __channel_id(self, channel_name: str) -> int:
+        """ Id of a channel, added on first sight """
+        key = normalize_channel_name(channel_name)
+        cid = self.__channel_ids.get(key)
+        if cid is None:
+            cid = self.__channel_ids[key] = len(self.__channel_names)
+            self.__channel_names.append(key)
+            self.__members.append(MemberSet())
+        return cid
+
+    def __nick_id(self, nick: str) -> int:
+        """ Id of a nick, reusing a freed one for a new nick """
+        uid = self.__nick_ids.get(nick)
+        if uid is not None:
+            return uid
+        if self.__free:
+            uid = self.__free.pop()
+            self.__nicks[uid] = nick
+        else:
+            uid = len(self.__nicks)
+            self.__nicks.append(nick)
+            self.__first.append(NO_CHANNEL)
+        self.__nick_ids[nick] = uid
+        return uid
+
+    def __channel_ids_of(self, uid: int) -> Tuple[int, ...]:
+        """ Channel ids of a nick id """
+        first = self.__first[uid]
+        if first == NO_CHANNEL:
+            return ()
+        return (first,) + self.__more.get(uid, ())
+
+    def __link(self, uid: int, cid: int) -> None:
+        """ Record channel cid in the reverse entry of nick uid """
+        if self.__first[uid] == NO_CHANNEL:
+            self.__first[uid] = cid
+        else:
+            self.__more[uid] = self.__more.get(uid, ()) + (cid,)
+
+    def __unlink(self, uid: int, cid: int) -> None:
+        """ Remove channel cid from nick uid, freeing the id if it was the last """
+        more = self.__more.get(uid)
+        if self.__first[uid] == cid:
+            if more:
+                self.__first[uid] = more[0]
+                more = more[1:]
+            else:
+                self.__first[uid] = NO_CHANNEL
+                del self.__nick_ids[self.__nicks[uid]]
+                self.__nicks[uid] = ""
+                self.__free.append(uid)
+                return
+        elif more and cid in more:
+            more = tuple(other for other in more if other != cid)
+        else:
+            return
+        if more:
+            self.__more[uid] = more
+        else:
+            del self.__more[uid]
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Runtime counters and histograms for IRCClient, with pluggable exporters
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import time
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.000_01,
+    0.000_05,
+    0.000_1,
+    0.000_5,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+)
+# Latency histograms time one message in this many, counters stay exact
+LATENCY_SAMPLE_EVERY = 16
+# Seconds between snapshots handed to a SnapshotExporter callback
+SNAPSHOT_INTERVAL = 10.0
+
+COUNTERS = (
+    "bytes_read",
+    "lines_read",
+    "bytes_written",
+    "lines_written",
+    "throttle_drops",
+    "read_drops",
+    "reconnects",
+)
+HISTOGRAMS = ("parse_time", "handler_latency", "ping_rtt", "reconnect_downtime")
+
+GaugeValue = Union[int, float, Mapping[str, float]]
+Snapshot = Dict[str, Any]
+
+
+class Histogram:
+    """Fixed bucket latency histogram
+
+    observe() is one bisect and three additions. Bucket counts are not
+    cumulative here, prometheus_text() accumulates them on export.
+    """
+
+    __slots__ = ["bounds", "buckets", "count", "sum"]
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """ bounds are the ascending upper bounds, +Inf is implied """
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    @property
+    def mean(self) -> float:
+        """ Mean observed value """
+        return self.sum / self.count if self.count else 0.0
+
+    def observe(self, value: float) -> None:
+        """ Record one value """
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction: float) -> float:
+        """ Upper bound of the bucket holding the given fraction of values """
+        target = fraction * self.count
+        seen = 0
+        for idx, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return self.bounds[idx] if idx < len(self.bounds) else float("inf")
+        return 0.0
+
+
+class ClientMetrics:
+    """Counters, histograms, and gauges of one IRC connection
+
+    Every counter and histogram is written by a single thread (reader,
+    writer, or dispatcher), so plain attribute updates are safe and no
+    lock is taken on the hot path. Parse time and handler latency time
+    one message in sample_every, the clock reads and bisect cost more than
+    the counters. Gauges are callables sampled only when a snapshot is
+    taken, so queue depths cost nothing between exports.
+    """
+
+    __slots__ = [*COUNTERS, *HISTOGRAMS, "started", "sample_every", "__gauges"]
+
+    def __init__(self, sample_every: int = LATENCY_SAMPLE_EVERY) -> None:
+        """ All zero, sample_every of 1 times every message """
+        self.sample_every = sample_every
+        self.bytes_read = 0
+        self.lines_read = 0
+        self.bytes_written = 0
+        self.lines_written = 0
+        self.throttle_drops = 0
+        self.read_drops = 0
+        self.reconnects = 0
+        self.parse_time = Histogram()
+        self.handler_latency = Histogram()
+        self.ping_rtt = Histogram()
+        self.reconnect_downtime = Histogram()
+        self.started = time.monotonic()
+        self.__gauges: Dict[str, Callable[[], GaugeValue]] = {}
+
+    def gauge(self, name: str, sample: Callable[[], GaugeValue]) -> None:
+        """ Register a gauge, sample returns a number or numbers by channel """
+        self.__gauges[name] = sample
+
+    def snapshot(self) -> Snapshot:
+        """ Current value of every metric, a plain dict """
+        snap: Snapshot = {name: getattr(self, name) for name in COUNTERS}
+        snap["uptime"] = time.monotonic() - self.started
+        for name in HISTOGRAMS:
+            hist: Histogram = getattr(self, name)
+            snap[name] = {
+                "count": hist.count,
+                "sum": hist.sum,
+                "mean": hist.mean,
+                "p99": hist.quantile(0.99),
+                "bounds": hist.bounds,
+                "buckets": list(hist.buckets),
+            }
+        for name, sample in self.__gauges.items():
+            snap[name] = sample()
+        return snap
+
+
+def prometheus_text(snapshot: Snapshot, prefix: str = "irc") -> str:
+    """ Render a snapshot in the Prometheus text exposition format """
+    lines: List[str] = []
+    for name in COUNTERS:
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {snapshot[name]}")
+    for name in HISTOGRAMS:
+        hist = snapshot[name]
+        metric = f"{prefix}_{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        seen = 0
+        for bound, count in zip(hist["bounds"] + (float("inf"),), hist["buckets"]):
+            seen += count
+            label = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_bucket{{le="{label}"}} {seen}')
+        lines.append(f"{metric}_sum {hist['sum']}")
+        lines.append(f"{metric}_count {hist['count']}")
+    known = set(COUNTERS) | set(HISTOGRAMS) | {"uptime"}
+    for name, value in snapshot.items():
+        if name in known:
+            continue
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        if isinstance(value, dict):
+            for label, item in value.items():
+                lines.append(f'{prefix}_{name}{{channel="{label}"}} {item}')
+        else:
+            lines.append(f"{prefix}_{name} {value}")
+    lines.append(f"# TYPE {prefix}_uptime_seconds gauge")
+    lines.append(f"{prefix}_uptime_seconds {snapshot['uptime']}")
+    return "\n".join(lines) + "\n"
+
+
+def rates(previous: Snapshot, current: Snapshot) -> Dict[str, float]:
+    """ Per second rate of every counter between two snapshots """
+    elapsed = current["uptime"] - previous["uptime"]
+    if elapsed <= 0:
+        return {name: 0.0 for name in COUNTERS}
+    return {name: (current[name] - previous[name]) / elapsed for name in COUNTERS}
+
+
+class SnapshotExporter:
+    """Calls callback with a snapshot and counter rates every interval seconds
+
+    The callback runs on the exporter's own thread and receives the
+    snapshot dict and the per second rates since the previous call.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        metrics: ClientMetrics,
+        callback: Callable[[Snapshot, Dict[str, float]], None],
+        interval: float = SNAPSHOT_INTERVAL,
+    ) -> None:
+        """ No thread until start() """
+        self.metrics = metrics
+        self.callback = callback
+        self.interval = interval
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+
+    def start(self) -> SnapshotExporter:
+        """ Start the exporter thread """
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ Stop the exporter thread, blocking until it exits """
+        self.__stop.set()
+        self.__thread.join()
+
+    def __run(self) -> None:
+        """ Export until stopped """
+        previous = self.metrics.snapshot()
+        while not self.__stop.wait(self.interval):
+            current = self.metrics.snapshot()
+            try:
+                self.callback(current, rates(previous, current))
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("Snapshot callback failed")
+            previous = current
+
+
+class PrometheusExporter:
+    """ Serves prometheus_text() of one or more clients over HTTP at /metrics """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        metrics: Dict[str, ClientMetrics],
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """Bind the endpoint, no thread until start()
+
+        Args:
+            metrics: ClientMetrics by metric prefix, e.g. {"irc": client.metrics}
+            port: Port to listen on, 0 picks a free one
+        """
+        exporter = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            """ Answers GET /metrics """
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                """ Render every registered client """
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("UTF-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                """ Route access logs to debug instead of stderr """
+                exporter.logger.debug(*args)
+
+        self.metrics = metrics
+        self.__server = ThreadingHTTPServer((host, port), _Handler)
+        self.port: int = self.__server.server_address[1]
+        self.__thread: Optional[threading.Thread] = None
+
+    def render(self) -> str:
+        """ Prometheus text of every registered client """
+        return "".join(
+            prometheus_text(metrics.snapshot(), prefix)
+            for prefix, metrics in self.metrics.items()
+        )
+
+    def start(self) -> PrometheusExporter:
+        """ Serve in a background thread """
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, daemon=True
+        )
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ Stop serving and close the socket """
+        self.__server.shutdown()
+        self.__server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Compact, interned message forms for holding many messages at once
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+from array import array
+from collections import Counter
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Union
+
+from src.model.message import Message
+
+# Column id of an absent channel or nick
+NO_ID = -1
+
+
+class Interner:
+    """Hands out one shared string, and a small integer id, per distinct value
+
+    Unlike sys.intern the table belongs to its owner and is freed with it,
+    so each store of messages keeps its own rather than sharing one that
+    grows with every nick and channel the process ever sees.
+    """
+
+    __slots__ = ["ids", "strings"]
+
+    def __init__(self) -> None:
+        """ Empty table """
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def __len__(self) -> int:
+        """ Distinct strings held """
+        return len(self.strings)
+
+    def intern(self, value: str) -> str:
+        """ The shared copy of value """
+        return self.strings[self.id(value)]
+
+    def id(self, value: str) -> int:
+        """ Id of value, added on first sight """
+        found = self.ids.get(value)
+        if found is None:
+            found = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return found
+
+
+def trailing_offset(message: Message) -> int:
+    """ Index in message.message where the trailing text starts, -1 if none """
+    if message.trailing is None:
+        return -1
+    return len(message.message) - len(message.trailing)
+
+
+class CompactMessage:
+    """A Message kept as its raw line plus interned fields
+
+    command, channel, and nick point at the strings of the interner the
+    owner passes in, so a million messages from a few channels and users
+    hold one copy of each. The trailing text is not stored, it is sliced
+    from the raw line on access. to_message() re-parses the raw line for
+    everything else.
+    """
+
+    __slots__ = ["message", "command", "channel", "nick", "trail_at"]
+
+    def __init__(
+        self,
+        message: str,
+        command: str,
+        channel: Optional[str],
+        nick: Optional[str],
+        trail_at: int,
+    ) -> None:
+        """ Use from_message() or from_string() """
+        self.message = message
+        self.command = command
+        self.channel = channel
+        self.nick = nick
+        self.trail_at = trail_at
+
+    def __repr__(self) -> str:
+        """ Shows the raw line """
+        return f"CompactMessage({self.message!r})"
+
+    @property
+    def trailing(self) -> Optional[str]:
+        """ Trailing text, sliced from the raw line """
+        return self.message[self.trail_at :] if self.trail_at >= 0 else None
+
+    @property
+    def content(self) -> str:
+        """ Trailing text, empty if none """
+        return self.message[self.trail_at :] if self.trail_at >= 0 else ""
+
+    def to_message(self) -> Message:
+        """ Full Message parsed from the raw line """
+        return Message.from_string(self.message)
+
+    @classmethod
+    def from_message(cls, message: Message, interner: Interner) -> CompactMessage:
+        """ Compact form of a parsed message """
+        channel = message.channel
+        nick = message.nick
+        return cls(
+            message.message,
+            interner.intern(message.command),
+            interner.intern(channel) if channel is not None else None,
+            interner.intern(nick) if nick is not None else None,
+            trailing_offset(message),
+        )
+
+    @classmethod
+    def from_string(cls, message: str, interner: Interner) -> CompactMessage:
+        """ Compact form of a raw line """
+        return cls.from_message(Message.from_string(message), interner)
+
+
+class MessageBatch:
+    """Columnar container of many messages for analytics
+
+    Commands, channels, and nicks are stored as integer ids into one
+    Interner, in machine-sized arrays, next to the raw lines and the
+    trailing offsets. Counting or filtering by a column walks a flat
+    array of ints instead of millions of objects.
+    """
+
+    COLUMNS = ("command", "channel", "nick")
+
+    def __init__(self, interner: Optional[Interner] = None) -> None:
+        """ Empty batch, sharing interner if given """
+        self.interner = interner if interner is not None else Interner()
+        self.lines: List[str] = []
+        self.trail_at = array("i")
+        self.columns: Dict[str, "array[int]"] = {
+            name: array("i") for name in self.COLUMNS
+        }
+
+    def __len__(self) -> int:
+        """ Messages held """
+        return len(self.lines)
+
+    def __getitem__(self, index: int) -> CompactMessage:
+        """ Message at index """
+        strings = self.interner.strings
+        channel = self.columns["channel"][index]
+        nick = self.columns["nick"][index]
+        return CompactMessage(
+            self.lines[index],
+            strings[self.columns["command"][index]],
+            strings[channel] if channel != NO_ID else None,
+            strings[nick] if nick != NO_ID else None,
+            self.trail_at[index],
+        )
+
+    def __iter__(self) -> Iterator[CompactMessage]:
+        """ Every message in order """
+        return (self[index] for index in range(len(self)))
+
+    def append(self, message: Union[Message, str]) -> None:
+        """ Add a Message or a raw line """
+        if isinstance(message, str):
+            message = Message.from_string(message)
+        intern_id = self.interner.id
+        channel = message.channel
+        nick = message.nick
+        self.lines.append(message.message)
+        self.trail_at.append(trailing_offset(message))
+        self.columns["command"].append(intern_id(message.command))
+        self.columns["channel"].append(
+            intern_id(channel) if channel is not None else NO_ID
+        )
+        self.columns["nick"].append(intern_id(nick) if nick is not None else NO_ID)
+
+    def extend(self, messages: Iterable[Union[Message, str]]) -> None:
+        """ Add many Messages or raw lines """
+        for message in messages:
+            self.append(message)
+
+    def count_by(self, column: str) -> Counter[str]:
+        """ Messages per distinct value of column, absent values skipped """
+        strings = self.interner.strings
+        counts = Counter(self.columns[column])
+        counts.pop(NO_ID, None)
+        return Counter({strings[key]: value for key, value in counts.items()})
+
+    def select(self, **criteria: str) -> List[int]:
+        """ Indexes of messages whose columns equal every given value """
+        wanted = []
+        for column, value in criteria.items():
+            found = self.interner.ids.get(value)
+            if found is None:
+                return []
+            wanted.append((self.columns[column], found))
+        return [
+            index
+            for index in range(len(self))
+            if all(values[index] == key for values, key in wanted)
+        ]
@@ -1,15 +1,38 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-""" Data-type class to process IRC message by RFC 1459 standard
+""" Data-type class to process IRC message by RFC 1459 standard, with IRCv3 tags
 
 Author: Preocts <preocts@preocts.com>
 """
 from __future__ import annotations
 
+from typing import Dict
+from typing import List
 from typing import NamedTuple
 from typing import Optional
 from typing import Tuple
 
+TAG_ESCAPES = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+
+
+def unescape_tag_value(value: str) -> str:
+    """ Unescape an IRCv3 tag value, unknown escapes drop the backslash """
+    if "\\" not in value:
+        return value
+    result: List[str] = []
+    idx = 0
+    length = len(value)
+    while idx < length:
+        char = value[idx]
+        if char == "\\":
+            idx += 1
+            if idx < length:
+                result.append(TAG_ESCAPES.get(value[idx], value[idx]))
+        else:
+            result.append(char)
+        idx += 1
+    return "".join(result)
+
 
 class Message(NamedTuple):
     """IRC message
@@ -26,13 +49,22 @@ class Message(NamedTuple):
     <trailing> ::= <Any, possibly *empty*, sequence of octets not including
                     NUL or CR or LF>
     <crlf>     ::= CR LF
+
+    From IRCv3 message-tags, a message may open with a tag block:
+
+    <message>  ::= ['@' <tags> <SPACE>] [':' <prefix> <SPACE> ] <command> ...
+    <tags>     ::= <tag> [';' <tag>]*
+    <tag>      ::= <key> ['=' <escaped value>]
+
+    The tag block is kept raw and only parsed when tags are accessed.
     """
 
     message: str = ""
     prefix: Optional[str] = None
     command: str = ""
     middle: Optional[Tuple[str, ...]] = None
-    trailing: Optional[Tuple[str, ...]] = None
+    trailing: Optional[str] = None
+    raw_tags: Optional[str] = None
 
     @property
     def params(self) -> str:
@@ -41,30 +73,147 @@ class Message(NamedTuple):
 
     @property
     def content(self) -> str:
-        """ String return message content (trailing) """
-        return (" ".join(self.trailing)).lstrip(":") if self.trailing else ""
+        """ String return message content (trailing), exactly as sent """
+        return self.trailing if self.trailing else ""
+
+    @property
+    def nick(self) -> Optional[str]:
+        """ Nickname from a ':nick!user@host' prefix, None for server prefixes """
+        if not self.prefix or "!" not in self.prefix:
+            return None
+        return self.prefix[1 : self.prefix.index("!")]
+
+    @property
+    def channel(self) -> Optional[str]:
+        """ First channel ('#' prefixed) found in params, None if not addressed """
+        if self.middle:
+            for param in self.middle:
+                if param.startswith("#"):
+                    return param
+        if self.trailing and self.trailing.startswith("#") and not self.middle:
+            return self.trailing
+        return None
+
+    @property
+    def tags(self) -> Dict[str, str]:
+        """ All IRCv3 tags, unescaped. Parsed on each access """
+        if not self.raw_tags:
+            return {}
+        tags: Dict[str, str] = {}
+        for tag in self.raw_tags.split(";"):
+            key, _, value = tag.partition("=")
+            if key:
+                tags[key] = unescape_tag_value(value)
+        return tags
+
+    def get_tag(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """ Single unescaped tag value, found without parsing the whole block """
+        raw = self.raw_tags
+        if not raw:
+            return default
+        start = 0
+        while True:
+            idx = raw.find(key, start)
+            if idx == -1:
+                return default
+            end = idx + len(key)
+            if (idx == 0 or raw[idx - 1] == ";") and (
+                end == len(raw) or raw[end] in "=;"
+            ):
+                break
+            start = end
+        if end == len(raw) or raw[end] == ";":
+            return ""
+        stop = raw.find(";", end)
+        return unescape_tag_value(raw[end + 1 : stop if stop != -1 else len(raw)])
+
+    @property
+    def badges(self) -> Dict[str, str]:
+        """ Badge name to version from the 'badges' tag """
+        badges: Dict[str, str] = {}
+        for badge in (self.get_tag("badges") or "").split(","):
+            name, _, version = badge.partition("/")
+            if name:
+                badges[name] = version
+        return badges
+
+    @property
+    def emotes(self) -> Dict[str, List[Tuple[int, int]]]:
+        """ Emote id to inclusive (start, end) positions from the 'emotes' tag """
+        emotes: Dict[str, List[Tuple[int, int]]] = {}
+        for emote in (self.get_tag("emotes") or "").split("/"):
+            emote_id, _, spans = emote.partition(":")
+            if not emote_id or not spans:
+                continue
+            ranges = emotes.setdefault(emote_id, [])
+            for span in spans.split(","):
+                start, _, end = span.partition("-")
+                if start.isdigit() and end.isdigit():
+                    ranges.append((int(start), int(end)))
+        return emotes
+
+    @property
+    def sent_ts(self) -> Optional[int]:
+        """ Server send time, epoch milliseconds, from the 'tmi-sent-ts' tag """
+        value = self.get_tag("tmi-sent-ts")
+        return int(value) if value and value.isdigit() else None
+
+    @classmethod
+    def from_bytes(cls, message: bytes) -> Message:
+        """Create Message object from a single raw line, without the CRLF
+
+        The line is decoded whole, invalid UTF-8 replaced, then sliced by
+        from_string. Message keeps the full decoded line in message, so
+        slicing the bytes first would add decodes rather than skip one;
+        what the reader saves is decoding and re-encoding its buffer.
+        """
+        return cls.from_string(message.decode("UTF-8", errors="replace"))
 
     @classmethod
     def from_string(cls, message: str) -> Message:
-        """ Create Message object from string """
+        """ Create Message object from string, slicing the line in one pass """
         if not message:
             return cls()
-        prefix = message.split()[0] if message.startswith(":") else None
-        command = message.split()[1] if prefix else message.split()[0]
-        params = message.split()[2:] if prefix else message.split()[1:]
-        middle, trailing, idx = [None, None, 0]
-        if params:
-            for idx, param in enumerate(params):
-                if param.startswith(":"):
-                    break
-            middle = (
-                params[0:idx] if params[idx].startswith(":") else params[0 : idx + 1]
+        raw_tags = None
+        start = 0
+        if message[0] == "@":
+            start = message.find(" ")
+            if start == -1:
+                return cls(message=message, raw_tags=message[1:])
+            raw_tags = message[1:start]
+            while start < len(message) and message[start] == " ":
+                start += 1
+        prefix = None
+        if message.startswith(":", start):
+            end = message.find(" ", start)
+            if end == -1:
+                return cls(message=message, prefix=message[start:], raw_tags=raw_tags)
+            prefix = message[start:end]
+            start = end
+        length = len(message)
+        while start < length and message[start] == " ":
+            start += 1
+        end = message.find(" ", start)
+        if end == -1:
+            return cls(
+                message=message,
+                prefix=prefix,
+                command=message[start:],
+                raw_tags=raw_tags,
             )
-            trailing = params[idx:] if params[idx].startswith(":") else []
+
+        trailing = None
+        trail_at = message.find(" :", end)
+        if trail_at == -1:
+            middle = message[end:].split()
+        else:
+            middle = message[end:trail_at].split()
+            trailing = message[trail_at + 2 :]
         return cls(
             message=message,
             prefix=prefix,
-            command=command,
+            command=message[start:end],
             middle=tuple(middle) if middle else None,
-            trailing=tuple(trailing) if trailing else None,
+            trailing=trailing,
+            raw_tags=raw_tags,
         )
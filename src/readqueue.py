@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Inbound queue between the socket reader and dispatch, with a priority lane
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from src.model.message import Message
+
+if TYPE_CHECKING:
+    from src.metrics import ClientMetrics
+
+# Policies for a full chat lane
+READ_BLOCK = "block"
+READ_DROP_OLDEST = "drop-oldest"
+READ_DROP_NEWEST = "drop-newest"
+READ_SAMPLE = "sample"
+READ_POLICIES = (READ_BLOCK, READ_DROP_OLDEST, READ_DROP_NEWEST, READ_SAMPLE)
+
+# Protocol and system commands queued ahead of chat and never dropped
+PRIORITY_READ_COMMANDS = frozenset(
+    ("PING", "PONG", "RECONNECT", "NOTICE", "ERROR", "CAP", "GLOBALUSERSTATE")
+)
+# Under "sample", a channel keeps one in this many messages once the lane
+# is half full
+SAMPLE_EVERY = 4
+# A blocked put() wakes this often to notice close()
+BLOCK_WAIT = 0.25
+
+# Drop count key of messages not addressed to a channel
+NO_CHANNEL = ""
+
+
+def is_priority(message: Message) -> bool:
+    """ True for protocol and system messages: PRIORITY_READ_COMMANDS and numerics """
+    command = message.command
+    return command in PRIORITY_READ_COMMANDS or command.isdigit()
+
+
+class ReadQueue:
+    """Two lanes from the socket reader to dispatch
+
+    Priority messages go in their own unbounded lane, which is always
+    emptied first, so a PING or RECONNECT is never stuck behind chat
+    and never dropped. Chat goes in a lane of max_size messages with a
+    policy for when it is full:
+
+    block: put() waits for room. That stalls the reader, so a PING read
+        after the chat is not answered until dispatch catches up, and
+        TCP backpressure may get a client far behind disconnected.
+    drop-oldest: the oldest queued chat message is dropped. The default.
+    drop-newest: the incoming message is dropped.
+    sample: once the lane is half full each channel keeps one in
+        sample_every of its messages, spreading the loss over every
+        channel instead of losing whole stretches of one; when full the
+        oldest is dropped.
+
+    Drops are counted in dropped, per channel in drops, and in
+    metrics.read_drops when given. put() runs on the reader thread,
+    get_batch() on the dispatcher.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        policy: str = READ_DROP_OLDEST,
+        sample_every: int = SAMPLE_EVERY,
+        metrics: Optional[ClientMetrics] = None,
+    ) -> None:
+        """ Empty queue, raises ValueError on an unknown policy """
+        if policy not in READ_POLICIES:
+            raise ValueError(f"Unknown read queue policy: {policy}")
+        self.max_size = max_size
+        self.policy = policy
+        self.sample_every = sample_every
+        self.metrics = metrics
+        self.dropped = 0
+        self.drops: Dict[str, int] = {}
+        self.__priority: Deque[Message] = deque()
+        self.__chat: Deque[Message] = deque()
+        self.__seen: Dict[str, int] = {}
+        self.__lock = threading.Lock()
+        self.__ready = threading.Condition(self.__lock)
+        self.__space = threading.Condition(self.__lock)
+        self.__closed = False
+
+    def __len__(self) -> int:
+        """ Messages queued in both lanes """
+        return len(self.__priority) + len(self.__chat)
+
+    def qsize(self) -> int:
+        """ Same as len(), named like queue.Queue """
+        return len(self)
+
+    def empty(self) -> bool:
+        """ True if both lanes are empty """
+        return not self.__priority and not self.__chat
+
+    def close(self) -> None:
+        """ Release a put() blocked on a full lane, later puts never block """
+        with self.__lock:
+            self.__closed = True
+            self.__space.notify_all()
+            self.__ready.notify_all()
+
+    def put(self, message: Message) -> bool:
+        """ Queue message in its lane, False if the policy dropped it """
+        with self.__lock:
+            if is_priority(message):
+                self.__priority.append(message)
+            elif not self.__admit(message):
+                return False
+            self.__ready.notify()
+        return True
+
+    def get_batch(self, limit: int, timeout: Optional[float] = None) -> List[Message]:
+        """ Up to limit messages, priority lane first, empty after timeout """
+        with self.__lock:
+            if not self.__priority and not self.__chat:
+                self.__ready.wait(timeout)
+            priority = self.__priority
+            chat = self.__chat
+            batch = [priority.popleft() for _ in range(min(limit, len(priority)))]
+            if len(batch) < limit and chat:
+                batch.extend(
+                    chat.popleft() for _ in range(min(limit - len(batch), len(chat)))
+                )
+                if self.policy == READ_BLOCK:
+                    self.__space.notify()
+            return batch
+
+    def __admit(self, message: Message) -> bool:
+        """ Apply the policy to a chat message, lock held, False if dropped """
+        chat = self.__chat
+        if self.policy == READ_SAMPLE and len(chat) * 2 >= self.max_size:
+            key = message.channel or NO_CHANNEL
+            seen = self.__seen.get(key, 0)
+            self.__seen[key] = seen + 1
+            if seen % self.sample_every:
+                self.__drop(message)
+                return False
+        if len(chat) >= self.max_size:
+            if self.policy == READ_DROP_NEWEST:
+                self.__drop(message)
+                return False
+            if self.policy == READ_BLOCK:
+                while len(chat) >= self.max_size and not self.__closed:
+                    self.__space.wait(BLOCK_WAIT)
+            else:
+                self.__drop(chat.popleft())
+        chat.append(message)
+        return True
+
+    def __drop(self, message: Message) -> None:
+        """ Count a dropped message against its channel """
+        key = message.channel or NO_CHANNEL
+        self.drops[key] = self.drops.get(key, 0) + 1
+        self.dropped += 1
+        if self.metrics is not None:
+            self.metrics.read_drops += 1
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Records raw inbound IRC traffic and replays it over loopback
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import os
+import time
+import socket
+import struct
+import logging
+import threading
+from typing import IO
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Written once at the start of a recording file
+RECORDING_MAGIC = b"IRCREC1\n"
+# Chunk header: wall clock timestamp of the read, then its length
+CHUNK_HEADER = struct.Struct("<dI")
+# Bytes of chunks gathered into one send when replaying at maximum speed
+REPLAY_SEND_BYTES = 65_536
+# Seconds to wait for the client to hang up after the last chunk
+REPLAY_LINGER = 5.0
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, bytes]]:
+    """ Yields (timestamp, raw bytes) of every chunk of a recording """
+    with open(path, "rb") as recording:
+        if recording.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise ValueError(f"Not a recording: {path}")
+        while True:
+            header = recording.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                return
+            stamp, size = CHUNK_HEADER.unpack(header)
+            data = recording.read(size)
+            if len(data) < size:
+                return
+            yield stamp, data
+
+
+class TrafficRecorder:
+    """Appends every chunk read from the socket to a recording file
+
+    Each chunk is stored as received, before framing, behind a 12 byte
+    header of timestamp and length, so a recording costs little more
+    than the traffic itself. Files are opened for append; a new file
+    starts with RECORDING_MAGIC. record() is called by the reader thread
+    only and takes no lock.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, path: str) -> None:
+        """ Open path for append """
+        self.path = path
+        self.chunks = 0
+        fresh = not os.path.exists(path) or not os.path.getsize(path)
+        self.__file: Optional[IO[bytes]] = open(path, "ab")
+        if fresh:
+            self.__file.write(RECORDING_MAGIC)
+
+    def record(self, data: bytes, stamp: Optional[float] = None) -> None:
+        """ Append one chunk stamped with stamp, or the current time """
+        if self.__file is None:
+            return
+        stamp = time.time() if stamp is None else stamp
+        self.__file.write(CHUNK_HEADER.pack(stamp, len(data)) + data)
+        self.chunks += 1
+
+    def close(self) -> None:
+        """ Flush and close the file """
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+class ReplayServer:
+    """Loopback server feeding a recording to the first client that connects
+
+    Chunks are sent with the gaps they were recorded with divided by
+    speed, so 1.0 replays in real time and 10.0 ten times faster. A speed
+    of 0 sends everything as fast as the socket takes it. Lines sent by
+    the client are read and discarded. When the recording ends done is
+    set, the sending side is shut down, and the socket is closed once the
+    client hangs up, so no unread bytes turn the close into a reset.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, path: str, speed: float = 1.0, host: str = "127.0.0.1"):
+        """ Binds to a free port on host, call start() to begin accepting """
+        self.path = path
+        self.speed = speed
+        self.host = host
+        self.sent = 0
+        self.done = threading.Event()
+        self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__server.bind((host, 0))
+        self.port: int = self.__server.getsockname()[1]
+        self.__thread = threading.Thread(target=self.__serve, daemon=True)
+
+    def start(self) -> ReplayServer:
+        """ Listen and replay to the first client in a background thread """
+        self.__server.listen(1)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ Close the listening socket and wait for the replay to end """
+        try:
+            self.__server.close()
+        except OSError:
+            pass
+        self.__thread.join()
+
+    def __serve(self) -> None:
+        """ Accept one client and replay to it """
+        try:
+            client, _ = self.__server.accept()
+        except OSError:
+            self.done.set()
+            return
+        drain = threading.Thread(target=self.__drain, args=(client,), daemon=True)
+        drain.start()
+        try:
+            if self.speed:
+                self.__paced(client)
+            else:
+                self.__flat_out(client)
+        except OSError as err:
+            self.logger.error("Replay stopped: %s", err)
+        finally:
+            self.done.set()
+            try:
+                client.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            drain.join(REPLAY_LINGER)
+            client.close()
+
+    def __paced(self, client: socket.socket) -> None:
+        """ Send each chunk at its recorded offset divided by speed """
+        start = time.perf_counter()
+        first: Optional[float] = None
+        for stamp, data in read_recording(self.path):
+            if first is None:
+                first = stamp
+            delay = start + (stamp - first) / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            client.sendall(data)
+            self.sent += len(data)
+
+    def __flat_out(self, client: socket.socket) -> None:
+        """ Send every chunk as fast as possible, gathered into large sends """
+        pending: List[bytes] = []
+        size = 0
+        for _, data in read_recording(self.path):
+            pending.append(data)
+            size += len(data)
+            if size >= REPLAY_SEND_BYTES:
+                client.sendall(b"".join(pending))
+                self.sent += size
+                pending, size = [], 0
+        if pending:
+            client.sendall(b"".join(pending))
+            self.sent += size
+
+    @staticmethod
+    def __drain(client: socket.socket) -> None:
+        """ Read and discard whatever the client sends """
+        while True:
+            try:
+                if not client.recv(65_536):
+                    break
+            except OSError:
+                break
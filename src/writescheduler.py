@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Paces queued channel messages out at the rate the throttles allow
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+from typing import Deque
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from src.model.message import Message
+from src.decayingcounter import DecayingCounter
+
+if TYPE_CHECKING:
+    from src.ircchannel import IRCChannel
+    from src.metrics import ClientMetrics
+
+# Overflow policies for a full channel write queue
+OVERFLOW_DROP_OLDEST = "drop-oldest"
+OVERFLOW_DROP_NEWEST = "drop-newest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_COALESCE)
+
+GLOBAL_GROUP = "GLOBAL"
+
+
+class WriteScheduler:
+    """Releases channel messages at the earliest moment their budgets allow
+
+    Channels hold their own bounded write_queue and throttle. When a
+    channel has pending messages it sits in a heap keyed by the time it
+    may next send. The writer blocks in next_batch() until the head of
+    that heap is due, then takes every message due at that moment with
+    due channels rotating round-robin.
+    A global throttle, shared by every channel with global_budget set,
+    applies on top of each channel's own throttle. While held, channels
+    with global_budget set are parked and only the others are released.
+    Priority messages skip all of this: they wait in their own lane, are
+    never throttled or held, and open every batch.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        global_count: int,
+        global_span: int,
+        metrics: Optional[ClientMetrics] = None,
+    ) -> None:
+        """Global budget of global_count messages per global_span seconds
+
+        Overflow drops are counted in metrics.throttle_drops when given.
+        """
+        self.metrics = metrics
+        self.global_throttle = DecayingCounter(global_span, global_count)
+        self.__condition = threading.Condition()
+        self.__heap: List[Tuple[float, int, IRCChannel]] = []
+        self.__sequence = itertools.count()
+        self.__parked: List[IRCChannel] = []
+        self.__priority: Deque[Message] = deque()
+        self.__held = False
+        self.__closed = False
+        self.__generation = 0
+
+    @property
+    def closed(self) -> bool:
+        """ True once close() has been called """
+        return self.__closed
+
+    @property
+    def generation(self) -> int:
+        """ Bumped by new_generation(), batches taken before it are stale """
+        return self.__generation
+
+    def submit(self, channel: IRCChannel, message: Message) -> bool:
+        """ Queue message on channel under its overflow policy, False if dropped """
+        with self.__condition:
+            pending = channel.write_queue
+            if channel.overflow == OVERFLOW_COALESCE and message in pending:
+                self.logger.debug("Coalesced duplicate on %s", channel.name)
+                return False
+            if len(pending) >= channel.max_queue:
+                if channel.overflow == OVERFLOW_DROP_NEWEST:
+                    self.logger.warning(
+                        "Write queue full on %s, dropping '%s'", channel.name, message
+                    )
+                    self.__count_drop()
+                    return False
+                dropped = pending.popleft()
+                self.__count_drop()
+                self.logger.warning(
+                    "Write queue full on %s, dropping '%s'", channel.name, dropped
+                )
+            pending.append(message)
+            if not channel.scheduled:
+                channel.scheduled = True
+                self.__push(time.monotonic(), channel)
+                self.__condition.notify()
+        return True
+
+    def submit_priority(self, message: Message) -> None:
+        """ Queue message ahead of every channel, unthrottled """
+        with self.__condition:
+            self.__priority.append(message)
+            self.__condition.notify()
+
+    def discard_priority(self) -> None:
+        """ Drop every pending priority message """
+        with self.__condition:
+            self.__priority.clear()
+
+    def discard(self, channel: IRCChannel) -> None:
+        """ Drop every pending message of channel """
+        with self.__condition:
+            channel.write_queue.clear()
+
+    def new_generation(self) -> None:
+        """ Start a new generation, a next_batch() waiting on an older one returns """
+        with self.__condition:
+            self.__generation += 1
+            self.__condition.notify_all()
+
+    def hold(self, held: bool) -> None:
+        """ Hold or release every channel with global_budget set """
+        with self.__condition:
+            self.__held = held
+            if held:
+                return
+            now = time.monotonic()
+            for channel in self.__parked:
+                self.__push(now, channel)
+            self.__parked.clear()
+            self.__condition.notify()
+
+    def close(self) -> None:
+        """ Wake the writer, next_message() returns None from now on """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+    def next_message(self) -> Optional[Message]:
+        """ Block until a message may be sent and return it, None once closed """
+        batch = self.next_batch(1)
+        return batch.pop() if batch else None
+
+    def next_batch(
+        self, max_bytes: int, generation: Optional[int] = None
+    ) -> List[Message]:
+        """Block until at least one message may be sent, empty list once closed
+
+        Returns every message releasable right now, in release order, until
+        their encoded lines reach max_bytes. At least one is always returned.
+        Given a generation, returns an empty list as soon as it is not the
+        current one.
+        """
+        with self.__condition:
+            while not self.__closed:
+                if generation is not None and generation != self.__generation:
+                    break
+                now = time.monotonic()
+                batch = self.__collect(now, max_bytes)
+                if batch:
+                    return batch
+                timeout = self.__heap[0][0] - now if self.__heap else None
+                self.__condition.wait(timeout)
+        return []
+
+    def __collect(self, now: float, max_bytes: int) -> List[Message]:
+        """ Release due messages until max_bytes or nothing more is due """
+        batch: List[Message] = []
+        size = 0
+        priority = self.__priority
+        while priority and size < max_bytes:
+            message = priority.popleft()
+            batch.append(message)
+            size += len(message.message) + 2
+        while self.__heap and self.__heap[0][0] <= now and size < max_bytes:
+            _, _, channel = heapq.heappop(self.__heap)
+            if not channel.write_queue:
+                channel.scheduled = False
+                continue
+            if self.__held and channel.global_budget:
+                self.__parked.append(channel)
+                continue
+            delay = self.__delay(channel)
+            if delay > 0:
+                self.__push(now + delay, channel)
+                continue
+            message = self.__release(channel, now)
+            batch.append(message)
+            size += len(message.message) + 2
+        return batch
+
+    def __count_drop(self) -> None:
+        """ Record one overflow drop, called with the lock held """
+        if self.metrics is not None:
+            self.metrics.throttle_drops += 1
+
+    def __delay(self, channel: IRCChannel) -> float:
+        """ Seconds until both channel and global budgets allow a send """
+        delay = channel.throttle.wait_time(channel.name)
+        if channel.global_budget:
+            delay = max(delay, self.global_throttle.wait_time(GLOBAL_GROUP))
+        return delay
+
+    def __release(self, channel: IRCChannel, now: float) -> Message:
+        """ Pop the next message of channel and charge it to the budgets """
+        message = channel.write_queue.popleft()
+        channel.throttle.inc(channel.name)
+        if channel.global_budget:
+            self.global_throttle.inc(GLOBAL_GROUP)
+        if channel.write_queue:
+            self.__push(now, channel)
+        else:
+            channel.scheduled = False
+        return message
+
+    def __push(self, due: float, channel: IRCChannel) -> None:
+        """ Schedule channel at due, sequence breaks ties round-robin """
+        heapq.heappush(self.__heap, (due, next(self.__sequence), channel))
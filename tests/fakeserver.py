@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Minimal loopback IRC server used by tests and benchmarks
+
+Author: Preocts <preocts@preocts.com>
+"""
+from __future__ import annotations
+
+import time
+import socket
+import threading
+from typing import List
+from typing import Tuple
+
+
+class FakeIRCServer:
+    """ Threaded loopback server, records lines, answers logins and JOINs """
+
+    def __init__(self, host: str = "127.0.0.1") -> None:
+        """ Binds to a free port on host, call start() to begin accepting """
+        self.host = host
+        self.received: List[Tuple[float, str]] = []
+        self.answer_pings = True
+        self.clients: List[socket.socket] = []
+        self.__lock = threading.Lock()
+        self.__running = False
+        self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__server.bind((host, 0))
+        self.port: int = self.__server.getsockname()[1]
+        self.__acceptor = threading.Thread(target=self.__accept_loop, daemon=True)
+
+    def start(self) -> FakeIRCServer:
+        """ Start accepting connections """
+        self.__running = True
+        self.__server.listen()
+        self.__acceptor.start()
+        return self
+
+    def stop(self) -> None:
+        """ Close all client connections and the listening socket """
+        self.__running = False
+        for client in list(self.clients):
+            self.__close(client)
+        try:
+            self.__server.close()
+        except OSError:
+            pass
+
+    def send_all(self, line: str) -> None:
+        """ Send a line to every connected client """
+        self.send_raw(f"{line}\r\n".encode("UTF-8"))
+
+    def send_raw(self, data: bytes) -> None:
+        """ Send raw bytes to every connected client """
+        for client in list(self.clients):
+            try:
+                client.sendall(data)
+            except OSError:
+                self.__close(client)
+
+    def drop_client(self, index: int = 0) -> None:
+        """ Close one client connection from the server side """
+        self.__close(self.clients[index])
+
+    def wait_for_clients(self, count: int = 1, timeout: float = 5.0) -> bool:
+        """ Block until count clients are connected """
+        expire = time.monotonic() + timeout
+        while len(self.clients) < count and time.monotonic() < expire:
+            time.sleep(0.001)
+        return len(self.clients) >= count
+
+    def wait_for_lines(self, count: int, timeout: float = 5.0) -> bool:
+        """ Block until count lines have been received """
+        expire = time.monotonic() + timeout
+        while len(self.received) < count and time.monotonic() < expire:
+            time.sleep(0.0005)
+        return len(self.received) >= count
+
+    def lines(self) -> List[str]:
+        """ Returns all received lines in arrival order """
+        with self.__lock:
+            return [line for _, line in self.received]
+
+    def __accept_loop(self) -> None:
+        """ Accept clients until stopped """
+        while self.__running:
+            try:
+                client, _ = self.__server.accept()
+            except OSError:
+                break
+            self.clients.append(client)
+            threading.Thread(
+                target=self.__client_loop, args=(client,), daemon=True
+            ).start()
+
+    def __client_loop(self, client: socket.socket) -> None:
+        """ Read lines from a client, auto-answer JOIN and PING """
+        buffer = b""
+        while self.__running:
+            try:
+                segment = client.recv(65536)
+            except OSError:
+                break
+            if not segment:
+                break
+            buffer += segment
+            *lines, buffer = buffer.split(b"\r\n")
+            now = time.perf_counter()
+            with self.__lock:
+                self.received.extend((now, ln.decode("UTF-8")) for ln in lines)
+            for line in lines:
+                self.__auto_reply(client, line.decode("UTF-8"))
+        self.__close(client)
+
+    def __auto_reply(self, client: socket.socket, line: str) -> None:
+        """ Answers the server side of NICK, JOIN and PING """
+        reply = ""
+        if line.startswith("JOIN "):
+            for channel in line[5:].split(","):
+                reply += (
+                    f":tmi.twitch.tv 353 fake_bot = {channel} :fake_bot\r\n"
+                    f":tmi.twitch.tv 366 fake_bot {channel} :End of /NAMES list\r\n"
+                )
+        elif line.startswith("NICK "):
+            reply = (
+                f":tmi.twitch.tv 001 {line[5:]} :Welcome, GLHF!\r\n"
+                f":tmi.twitch.tv 376 {line[5:]} :>\r\n"
+            )
+        elif line.startswith("PING ") and self.answer_pings:
+            reply = f":tmi.twitch.tv PONG tmi.twitch.tv {line[5:]}\r\n"
+        if reply:
+            try:
+                client.sendall(reply.encode("UTF-8"))
+            except OSError:
+                pass
+
+    def __close(self, client: socket.socket) -> None:
+        """ Close and forget a client socket """
+        try:
+            client.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client.close()
+        if client in self.clients:
+            self.clients.remove(client)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for asyncio IRC client
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import asyncio
+from typing import List
+
+from src import asyncircclient
+from src.asyncircclient import AsyncIRCClient
+from src.ircclient import READ_QUEUE_MAX_SIZE
+from src.model.message import Message
+
+
+async def run_session(received: List[str]) -> List[Message]:
+    """ Serve one scripted session on loopback, returns messages the client saw """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b"PING :tmi.twitch.tv\r\n")
+        writer.write(b":mock!mock@mock PRIVMSG #mock :hello  there\r\n")
+        await writer.drain()
+        while True:
+            try:
+                line = await reader.readuntil(b"\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            received.append(line.decode().strip())
+            if {"PONG", "PRIVMSG"} <= {ln.split()[0] for ln in received}:
+                writer.close()
+                break
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    messages: List[Message] = []
+    async with AsyncIRCClient("mock_bot", "oauth:mock", "127.0.0.1", port) as client:
+        await client.join_channel("#mock")
+        await client.join_channel("#Mock")
+        await client.send_to_channel("#nope", "dropped")
+        await client.send_to_channel("#MOCK", "PRIVMSG #mock :hi")
+        async for message in client:
+            messages.append(message)
+    server.close()
+    await server.wait_closed()
+    return messages
+
+
+def test_session() -> None:
+    """ Authenticates, answers PING, iterates messages, stops on close """
+    received: List[str] = []
+    messages = asyncio.run(asyncio.wait_for(run_session(received), 10))
+    assert received[:2] == ["PASS oauth:mock", "NICK mock_bot"]
+    assert "PONG :tmi.twitch.tv" in received
+    assert [line for line in received if line.startswith("JOIN")] == ["JOIN #mock"]
+    assert "PRIVMSG #mock :hi" in received
+    assert [msg.command for msg in messages] == ["PING", "PRIVMSG"]
+
+
+async def run_flood(received: List[str]) -> AsyncIRCClient:
+    """ Flood a client that never reads, returns it once PONG is seen """
+    ponged = asyncio.Event()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        flood = b":mock!mock@mock PRIVMSG #mock :flood\r\n" * (READ_QUEUE_MAX_SIZE + 5)
+        writer.write(flood + b"PING :late\r\n")
+        await writer.drain()
+        while not ponged.is_set():
+            try:
+                line = await reader.readuntil(b"\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            received.append(line.decode().strip())
+            if line.startswith(b"PONG"):
+                ponged.set()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = AsyncIRCClient("mock_bot", None, "127.0.0.1", port)
+    await client.connect()
+    await ponged.wait()
+    await client.disconnect()
+    server.close()
+    await server.wait_closed()
+    return client
+
+
+def test_full_read_queue_still_answers_ping() -> None:
+    """ A consumer that never reads costs the oldest messages, not the PONG """
+    received: List[str] = []
+    client = asyncio.run(asyncio.wait_for(run_flood(received), 10))
+    assert "PONG :late" in received
+    assert client.dropped == 6
+
+
+def test_flood_control_paces_sends(monkeypatch) -> None:
+    """ Sends over the throttle wait for it instead of being dropped """
+    monkeypatch.setattr(asyncircclient, "WRITE_THROTTLE_MSG_COUNT", 1)
+    monkeypatch.setattr(asyncircclient, "WRITE_THROTTLE_SEC_SPAN", 1)
+    received: List[str] = []
+    tic = time.perf_counter()
+    asyncio.run(asyncio.wait_for(run_session(received), 10))
+    assert time.perf_counter() - tic >= 2.0
+    sent = [line.split()[0] for line in received if not line.startswith("PONG")]
+    assert sent == ["PASS", "NICK", "USER", "JOIN", "PRIVMSG"]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for chat logging
+
+Author: Preocts <preocts@preocts.com>
+"""
+import os
+import gzip
+
+import pytest
+
+from src.chatlog import ChatLogger
+from src.chatlog import read_log
+from src.ircchannel import IRCChannel
+from src.model.message import Message
+
+
+def chat(idx: int) -> Message:
+    """ A PRIVMSG numbered idx """
+    return Message.from_string(f":mock!mock@mock PRIVMSG #Mock :hello {idx} ✓")
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "bin"])
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip_and_rotation(tmp_path, fmt: str, compress: bool) -> None:
+    """ Records read back in order across rotated files """
+    chat_log = ChatLogger(str(tmp_path), fmt, compress, rotate_bytes=500)
+    channel = IRCChannel("#Mock", 20, 30, True, chat_log=chat_log)
+    chat_log.start()
+    for idx in range(100):
+        channel.handle_message(chat(idx))
+    chat_log.stop()
+
+    path = chat_log.path("#Mock")
+    assert os.path.basename(path) == f"mock.{fmt}{'.gz' if compress else ''}"
+    files = [f"{path}.{idx}" for idx in range(5, 0, -1)] + [path]
+    files = [name for name in files if os.path.exists(name)]
+    lines = [line for name in files for _, line in read_log(name)]
+    assert os.path.exists(f"{path}.5")
+    assert not os.path.exists(f"{path}.6")
+    assert lines == [chat(idx).message for idx in range(100)][-len(lines) :]
+    assert lines[-1] == chat(99).message
+
+
+def test_drop_policy_counts_drops(tmp_path) -> None:
+    """ A full queue drops under "drop" without blocking the caller """
+    chat_log = ChatLogger(str(tmp_path), queue_size=3)
+    results = [chat_log.log("#mock", chat(idx)) for idx in range(5)]
+    assert results == [True, True, True, False, False]
+    assert chat_log.dropped == 2
+    chat_log.start()
+    chat_log.stop()
+    assert len(list(read_log(chat_log.path("#mock")))) == 3
+
+
+def test_block_policy_without_writer_drops(tmp_path) -> None:
+    """ A full queue with no writer running drops instead of blocking forever """
+    chat_log = ChatLogger(str(tmp_path), policy="block", queue_size=2)
+    results = [chat_log.log("#mock", chat(idx)) for idx in range(3)]
+    assert results == [True, True, False]
+    chat_log.start()
+    chat_log.stop()
+    assert [chat_log.log("#mock", chat(idx)) for idx in range(3)] == [
+        True,
+        True,
+        False,
+    ]
+    assert chat_log.dropped == 2
+
+
+def test_reopened_gzip_log_rotates_on_record_bytes(tmp_path) -> None:
+    """ An existing gzip log counts toward rotation by its decompressed size """
+    first = ChatLogger(str(tmp_path), compress=True).start()
+    for idx in range(10):
+        first.log("#mock", chat(idx))
+    first.stop()
+    path = first.path("#mock")
+    with gzip.open(path, "rb") as log_file:
+        written = len(log_file.read())
+    assert os.path.getsize(path) < written // 2
+
+    second = ChatLogger(str(tmp_path), compress=True, rotate_bytes=written * 3 // 2)
+    second.start()
+    for idx in range(10, 20):
+        second.log("#mock", chat(idx))
+    second.stop()
+    assert os.path.exists(f"{path}.1")
+
+
+def test_bad_options() -> None:
+    """ Unknown format or policy is rejected """
+    with pytest.raises(ValueError):
+        ChatLogger("logs", fmt="xml")
+    with pytest.raises(ValueError):
+        ChatLogger("logs", policy="maybe")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for chat statistics sketches
+
+Author: Preocts <preocts@preocts.com>
+"""
+import random
+from collections import Counter
+
+from src.chatstats import ChatAnalytics
+from src.chatstats import HyperLogLog
+from src.chatstats import RateWindow
+from src.chatstats import TopK
+from src.chatstats import UniqueWindow
+from src.model.message import Message
+
+
+def test_top_k_finds_heavy_hitters() -> None:
+    """ Heavy items rank first and are never underestimated """
+    rng = random.Random(22)
+    items = [f"user{int(rng.paretovariate(1.2))}" for _ in range(20_000)]
+    exact = Counter(items)
+    top_k = TopK(5)
+    for item in items:
+        top_k.add(item)
+    assert [item for item, _ in top_k.top()] == [
+        item for item, _ in exact.most_common(5)
+    ]
+    for item, count in exact.items():
+        assert top_k.estimate(item) >= count
+    assert top_k.total == len(items)
+
+
+def test_top_k_keeps_heavy_hitters_over_a_late_light_item() -> None:
+    """ An item enters only by beating the smallest kept estimate """
+    top_k = TopK(2)
+    for item in ["a"] * 100 + ["b"] * 100 + ["c"]:
+        top_k.add(item)
+    assert top_k.top() == [("a", 100), ("b", 100)]
+
+
+def test_hyperloglog_estimate() -> None:
+    """Small counts are near exact, large ones within about 4 standard errors
+
+    hash() is salted per process, so estimates vary from run to run.
+    """
+    sketch = HyperLogLog()
+    for idx in range(100):
+        sketch.add(f"user{idx}")
+        sketch.add(f"user{idx}")
+    assert abs(sketch.count() - 100) <= 7
+    for idx in range(50_000):
+        sketch.add(f"user{idx}")
+    assert abs(sketch.count() - 50_000) < 50_000 * 0.12
+    other = HyperLogLog()
+    for idx in range(50_000, 60_000):
+        other.add(f"user{idx}")
+    sketch.merge(other)
+    assert abs(sketch.count() - 60_000) < 60_000 * 0.12
+
+
+def test_windows_slide() -> None:
+    """ Old buckets fall out of rate and unique windows """
+    rate = RateWindow(60, 6)
+    users = UniqueWindow(60, 6)
+    for second in range(60):
+        rate.add(1000.0 + second, 2)
+        users.add(f"user{second}", 1000.0 + second)
+    assert rate.rate(1059.0) == 2.0
+    assert abs(users.count(1059.0) - 60) <= 4
+    assert rate.rate(1079.0) == 80 / 60
+    assert abs(users.count(1079.0) - 40) <= 3
+    assert rate.rate(5000.0) == 0.0
+    assert users.count(5000.0) == 0
+
+
+def test_analytics_snapshot() -> None:
+    """ Chat is counted per channel, emotes read from the emotes tag """
+    analytics = ChatAnalytics()
+    lines = [
+        "@emotes=25:0-4,6-10 :alice!alice@alice PRIVMSG #Mock :Kappa Kappa hi",
+        "@emotes= :bob!bob@bob PRIVMSG #mock :hello",
+        "@emotes=88:4-11 :alice!alice@alice PRIVMSG #mock :wow PogChamp",
+        ":alice!alice@alice JOIN #mock",
+    ]
+    for line in lines:
+        analytics.add(Message.from_string(line), 10.0)
+    snapshot = analytics.snapshot("#MOCK", 11.0)
+    assert snapshot is not None
+    assert snapshot["messages"] == 3
+    assert snapshot["messages_per_second"] == 3 / 60
+    assert snapshot["unique_users"] in (1, 2)
+    assert snapshot["top_chatters"] == [("alice", 2), ("bob", 1)]
+    assert snapshot["top_emotes"] == [("Kappa", 2), ("PogChamp", 1)]
+    assert analytics.channels() == ["#mock"]
+    analytics.reset("#Mock")
+    assert analytics.snapshot("#mock") is None
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for command router
+
+Author: Preocts <preocts@preocts.com>
+"""
+from typing import List
+
+import pytest
+
+from src.commandrouter import CommandContext
+from src.commandrouter import CommandRouter
+from src.model.message import Message
+
+
+def chat(channel: str, text: str, user: str = "mock") -> str:
+    """ Raw PRIVMSG line """
+    return f":{user}!{user}@{user}.tmi.twitch.tv PRIVMSG {channel} :{text}"
+
+
+def test_channel_and_global_routes() -> None:
+    """ Channel routes win over global routes of the same name """
+    router = CommandRouter()
+    calls: List[str] = []
+
+    @router.command("start", channel="#Mock")
+    def start_mock(ctx: CommandContext) -> None:
+        calls.append(f"mock {ctx.args}")
+
+    @router.command("start")
+    def start_any(ctx: CommandContext) -> None:
+        calls.append(f"any {ctx.channel} {ctx.user} {ctx.text!r}")
+
+    assert router.route(Message.from_string(chat("#mock", "!START now  please")))
+    assert router.route(Message.from_string(chat("#other", "!start")))
+    assert not router.route(Message.from_string(chat("#mock", "start")))
+    assert not router.route(Message.from_string(chat("#mock", "!stop")))
+    assert not router.route(Message.from_string("PING :tmi.twitch.tv"))
+    assert calls == ["mock ('now', 'please')", "any #other mock ''"]
+    assert len(router) == 2
+
+
+def test_cooldown_per_user() -> None:
+    """ A user waits out the cooldown, other users do not """
+    router = CommandRouter()
+    calls: List[str] = []
+    router.register("hug", lambda ctx: calls.append(ctx.user or ""), cooldown=30)
+    for user in ("alice", "alice", "bob"):
+        router(Message.from_string(chat("#mock", "!hug", user)))
+    assert calls == ["alice", "bob"]
+
+
+def test_duplicate_registration() -> None:
+    """ Same command, channel, and IRC command may only be registered once """
+    router = CommandRouter()
+    router.register("a", lambda ctx: None, channel="#mock")
+    router.register("a", lambda ctx: None)
+    with pytest.raises(ValueError):
+        router.register("A", lambda ctx: None, channel="#MOCK")
@@ -4,10 +4,13 @@
 
 Author: Preocts <preocts@preocts.com>
 """
+import time
 import random
 from string import ascii_letters
 import datetime
 
+import pytest
+
 from src.decayingcounter import DecayingCounter
 
 
@@ -54,3 +57,49 @@ class TestDecayingCounter:
         for _ in range(1_000):
             self.groups_with_max.inc_to_max("group_limit")
         assert self.groups_with_max.count("group_limit") == 10
+
+    def test_idle_groups_evicted(self) -> None:
+        """ Groups are dropped once everything in them has decayed """
+        groups = DecayingCounter(1)
+        for idx in range(1_000):
+            groups.inc(str(idx))
+        assert len(groups) == 1_000
+        time.sleep(1.1)
+        assert groups.count("0") == 0
+        groups.inc("fresh")
+        assert len(groups) == 1
+
+
+class TestDecayingCounterGCRA:
+    """ Test suite for GCRA mode """
+
+    def test_requires_max(self) -> None:
+        """ GCRA spacing is derived from max_count """
+        with pytest.raises(ValueError):
+            DecayingCounter(2, gcra=True)
+
+    def test_burst_then_spacing(self) -> None:
+        """ Allows a burst of max_count, then one per life_span / max_count """
+        groups = DecayingCounter(1, 10, gcra=True)
+        for _ in range(10):
+            assert groups.inc_to_max("burst")
+        assert not groups.inc_to_max("burst")
+        assert groups.count("burst") == 10
+        time.sleep(0.15)
+        assert groups.inc_to_max("burst")
+        assert not groups.inc_to_max("burst")
+        time.sleep(1.1)
+        assert groups.count("burst") == 0
+        assert len(groups) == 0
+
+
+def test_wait_time() -> None:
+    """ Wait time is zero under max and the time to the next slot at max """
+    for gcra in (False, True):
+        groups = DecayingCounter(1, 4, gcra=gcra)
+        assert groups.wait_time("wait") == 0.0
+        for _ in range(4):
+            groups.inc_to_max("wait")
+        assert 0.0 < groups.wait_time("wait") <= 1.0
+        time.sleep(groups.wait_time("wait"))
+        assert groups.inc_to_max("wait")
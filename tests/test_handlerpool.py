@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for handler pool
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import threading
+from typing import Dict
+from typing import List
+
+import pytest
+
+from src.handlerpool import HandlerPool
+from src.model.message import Message
+
+
+def slow_handler(message: Message) -> None:
+    """ Stands in for a handler doing I/O """
+    time.sleep(0.01)
+
+
+def failing_handler(message: Message) -> None:
+    """ Always raises """
+    raise RuntimeError("mock failure")
+
+
+def test_ordered_per_channel_parallel_across() -> None:
+    """ Channel order holds while channels overlap in time """
+    seen: Dict[str, List[int]] = {}
+    lock = threading.Lock()
+
+    def record(message: Message) -> None:
+        time.sleep(0.005)
+        with lock:
+            seen.setdefault(message.params, []).append(int(message.content))
+
+    tic = time.perf_counter()
+    with HandlerPool([record], workers=8) as pool:
+        for idx in range(20):
+            for channel in range(8):
+                pool.submit(Message.from_string(f"PRIVMSG #mock{channel} :{idx}"))
+    elapsed = time.perf_counter() - tic
+    assert all(order == list(range(20)) for order in seen.values())
+    assert sum(len(order) for order in seen.values()) == 160
+    assert elapsed < 160 * 0.005
+
+
+def test_channel_case_shares_a_lane() -> None:
+    """ Spellings of one channel keep their order on one lane """
+    seen: List[int] = []
+
+    def record(message: Message) -> None:
+        time.sleep(0.001)
+        seen.append(int(message.content))
+
+    with HandlerPool([record], workers=8) as pool:
+        for idx in range(40):
+            channel = "#Mock" if idx % 2 else "#mock"
+            pool.submit(Message.from_string(f"PRIVMSG {channel} :{idx}"))
+    assert seen == list(range(40))
+
+
+def test_backpressure_and_drops() -> None:
+    """ Non-blocking pools drop once a lane is full and count the drops """
+    with HandlerPool([slow_handler], workers=1, lane_size=2, block=False) as pool:
+        results = [pool.submit(Message.from_string("PRIVMSG #m :x")) for _ in range(10)]
+    assert results.count(False) == pool.dropped
+    assert pool.dropped >= 6
+
+
+def test_metrics_and_errors() -> None:
+    """ Latency and failures are tracked per handler """
+    with HandlerPool([slow_handler, failing_handler], workers=2) as pool:
+        for _ in range(4):
+            pool(Message.from_string("PRIVMSG #mock :x"))
+    metrics = pool.metrics()
+    assert metrics["slow_handler"].count == 4
+    assert metrics["slow_handler"].mean >= 0.01
+    assert metrics["failing_handler"].errors == 4
+    metrics["slow_handler"].add(1.0, True)
+    assert pool.metrics()["slow_handler"].errors == 0
+
+
+def test_process_mode() -> None:
+    """ Handlers run in worker processes and report timings back """
+    with HandlerPool([slow_handler], workers=2, mode="process") as pool:
+        for idx in range(6):
+            pool.submit(Message.from_string(f"PRIVMSG #mock{idx} :x"))
+    assert pool.metrics()["slow_handler"].count == 6
+
+
+def test_unknown_mode() -> None:
+    """ Mode is validated """
+    with pytest.raises(ValueError):
+        HandlerPool([slow_handler], mode="fibers")
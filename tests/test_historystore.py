@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for chat history store
+
+Author: Preocts <preocts@preocts.com>
+"""
+from src.historystore import HistoryStore
+from src.model.message import Message
+
+
+def chat(nick: str, channel: str, text: str) -> Message:
+    """ A PRIVMSG from nick """
+    return Message.from_string(f":{nick}!{nick}@{nick} PRIVMSG {channel} :{text}")
+
+
+def test_store_and_query(tmp_path) -> None:
+    """ Chat is stored off the caller and found by user and by term """
+    store = HistoryStore(str(tmp_path / "history.db")).start()
+    try:
+        for idx in range(30):
+            store(chat("alice", "#Mock", f"alice says {idx}"))
+            sale = " 50% off" if idx == 7 else ""
+            store(chat("bob", "#mock", f"bob says {idx}{sale}"))
+            store(chat("alice", "#other", f"elsewhere {idx}"))
+        assert not store.add(Message.from_string("PING :tmi.twitch.tv"))
+        assert store.flush(5)
+
+        assert store.count() == 90
+        last = store.last_by_user("#MOCK", "alice", 5)
+        expected = [f"alice says {idx}" for idx in range(29, 24, -1)]
+        assert [row.content for row in last] == expected
+        assert {row.channel for row in last} == {"#mock"}
+        assert len(store.last_in_channel("#other", 100)) == 30
+        assert [row.nick for row in store.search("50% OFF")] == ["bob"]
+        assert len(store.search("says", channel_name="#mock")) == 60
+        assert store.search("says", window=-1) == []
+    finally:
+        store.stop()
+
+
+def test_retention(tmp_path) -> None:
+    """ Rows past max_rows, then past retention, are pruned """
+    store = HistoryStore(str(tmp_path / "history.db"), max_rows=10).start()
+    try:
+        for idx in range(25):
+            store(chat("alice", "#mock", str(idx)))
+        assert store.flush(5)
+        store.prune()
+        assert [row.content for row in store.last_in_channel("#mock", 1)] == ["24"]
+        assert store.count() == 10
+        store.retention = 0
+        store.prune()
+        assert store.count() == 0
+    finally:
+        store.stop()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for IRC client connection lifecycle
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import threading
+from typing import Callable
+from typing import List
+
+from src.ircclient import IRCClient
+from tests.fakeserver import FakeIRCServer
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    """ Poll condition until true or timeout """
+    expire = time.monotonic() + timeout
+    while not condition() and time.monotonic() < expire:
+        time.sleep(0.005)
+    return condition()
+
+
+def count_lines(server: FakeIRCServer, prefix: str) -> int:
+    """ Lines received by server starting with prefix """
+    return sum(line.startswith(prefix) for line in server.lines())
+
+
+def test_disconnect_is_immediate() -> None:
+    """ Threads stop without waiting out the select timeout """
+    server = FakeIRCServer().start()
+    client = IRCClient("mock_bot", None, server.host, server.port)
+    client.connect()
+    dispatcher = threading.Thread(target=client.dispatch)
+    dispatcher.start()
+    assert wait_until(lambda: count_lines(server, "NICK") == 1)
+    tic = time.monotonic()
+    client.disconnect()
+    dispatcher.join()
+    assert time.monotonic() - tic < 1.0
+    assert not client.running
+    server.stop()
+
+
+def test_reconnect_replays_login_and_joins() -> None:
+    """ A dropped link is back within milliseconds, logged in and re-joined """
+    server = FakeIRCServer().start()
+    client = IRCClient("mock_bot", "oauth:mock", server.host, server.port)
+    client.connect()
+    dispatcher = threading.Thread(target=client.dispatch)
+    dispatcher.start()
+    try:
+        client.join_channels([f"#mock{idx}" for idx in range(3)])
+        assert wait_until(lambda: count_lines(server, "JOIN") == 1)
+
+        server.drop_client()
+        assert wait_until(lambda: count_lines(server, "JOIN") == 2)
+        assert count_lines(server, "PASS") == 2
+        assert count_lines(server, "NICK") == 2
+        assert server.lines()[-1] == "JOIN #mock0,#mock1,#mock2"
+        assert client.metrics is not None
+        assert client.metrics.reconnects == 1
+        assert client.metrics.reconnect_downtime.sum < 0.1
+
+        client.send_to_channel("#mock1", "PRIVMSG #mock1 :back")
+        assert wait_until(lambda: server.lines()[-1] == "PRIVMSG #mock1 :back")
+    finally:
+        client.disconnect()
+        dispatcher.join()
+        server.stop()
+
+
+def test_unanswered_ping_drops_link() -> None:
+    """ A silent server is pinged, then the link is dropped and reconnected """
+    server = FakeIRCServer().start()
+    server.answer_pings = False
+    client = IRCClient(
+        "mock_bot", None, server.host, server.port, keepalive=0.1, pong_timeout=0.1
+    )
+    client.connect()
+    try:
+        assert wait_until(lambda: count_lines(server, "NICK") == 2)
+        assert count_lines(server, "PING") >= 1
+        assert client.metrics is not None
+        assert client.metrics.reconnects >= 1
+    finally:
+        client.disconnect()
+        server.stop()
+
+
+def test_pong_latency_with_chat_backlog() -> None:
+    """ PONGs skip 10k queued chat lines and the SYSTEM throttle """
+    server = FakeIRCServer().start()
+    client = IRCClient("mock_bot", "oauth:mock", server.host, server.port)
+    client.connect()
+    try:
+        channels = [f"#mock{idx}" for idx in range(10)]
+        client.join_channels(channels)
+        assert wait_until(lambda: count_lines(server, "JOIN") == 1)
+        for channel in channels:
+            for idx in range(1_000):
+                client.send_to_channel(channel, f"PRIVMSG {channel} :{idx}")
+
+        latencies = []
+        for idx in range(50):
+            tic = time.perf_counter()
+            server.send_all(f"PING :{idx}")
+
+            def ponged(pong: str = f"PONG :{idx}") -> bool:
+                return pong in server.lines()
+
+            assert wait_until(ponged, 2.0)
+            latencies.append(time.perf_counter() - tic)
+        assert max(latencies) < 0.5
+        assert count_lines(server, "PRIVMSG") <= 100
+    finally:
+        client.disconnect()
+        server.stop()
+
+
+def joined(server: FakeIRCServer) -> List[str]:
+    """ Channels named in every JOIN line server received """
+    return [
+        name
+        for line in server.lines()
+        if line.startswith("JOIN ")
+        for name in line[5:].split(",")
+    ]
+
+
+def test_first_joins_follow_join_rate() -> None:
+    """ join_channels() sends no more JOINs than the join rate allows """
+    server = FakeIRCServer().start()
+    client = IRCClient("mock_bot", None, server.host, server.port, join_rate_count=2)
+    client.connect()
+    try:
+        client.join_channels([f"#mock{idx}" for idx in range(5)])
+        assert wait_until(lambda: len(joined(server)) == 2)
+        time.sleep(0.2)
+        assert joined(server) == ["#mock0", "#mock1"]
+    finally:
+        client.disconnect()
+        server.stop()
+
+
+def test_parted_channels_spend_no_join_rate() -> None:
+    """ A channel parted before its JOIN goes out leaves its slot to the next """
+    server = FakeIRCServer().start()
+    client = IRCClient("mock_bot", None, server.host, server.port, join_rate_count=2)
+    client.join_channels(["#mock0", "#mock1", "#mock2"])
+    client.part_channel("#mock0")
+    client.connect()
+    try:
+        assert wait_until(lambda: len(joined(server)) == 2)
+        assert joined(server) == ["#mock1", "#mock2"]
+    finally:
+        client.disconnect()
+        server.stop()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for IRC client pool
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import threading
+from typing import List
+
+from src.ircpool import IRCClientPool
+from src.model.message import Message
+from tests.fakeserver import FakeIRCServer
+
+
+def joined_channels(server: FakeIRCServer) -> List[str]:
+    """ Every channel name the server saw in a JOIN """
+    return [
+        name
+        for line in server.lines()
+        if line.startswith("JOIN ")
+        for name in line[5:].split(",")
+    ]
+
+
+def test_pool_balances_paces_and_rebalances() -> None:
+    """ Channels spread evenly, joins are paced, dead connections are replaced """
+    server = FakeIRCServer().start()
+    pool = IRCClientPool("mock_bot", None, server.host, server.port, 3, False, 10, 1)
+    merged: List[Message] = []
+    pool.connect()
+    dispatcher = threading.Thread(target=pool.dispatch, args=(merged.append,))
+    dispatcher.start()
+    try:
+        for idx in range(30):
+            pool.join_channel(f"#mock{idx}")
+        time.sleep(0.5)
+        assert len(joined_channels(server)) == 10
+        deadline = time.monotonic() + 10
+        while len(joined_channels(server)) < 30 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert sorted(pool.connections().values()) == [10, 10, 10]
+        assert any(msg.command == "366" for msg in merged)
+
+        server.drop_client(0)
+        deadline = time.monotonic() + 10
+        while len(joined_channels(server)) < 40 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert len(joined_channels(server)) == 40
+        assert sorted(pool.connections().values()) == [10, 10, 10]
+        assert len(pool.channels) == 30
+    finally:
+        pool.disconnect()
+        dispatcher.join()
+        server.stop()
+
+
+def test_pool_retries_failed_connections() -> None:
+    """ Connections that fail to open are retried until the server is up """
+    server = FakeIRCServer()
+    pool = IRCClientPool("mock_bot", None, server.host, server.port, 2)
+    pool.connect()
+    try:
+        assert pool.connections() == {}
+        pool.join_channel("#mock")
+        server.start()
+        deadline = time.monotonic() + 10
+        while len(pool.connections()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert len(pool.connections()) == 2
+        assert server.wait_for_clients(2)
+        while "#mock" not in joined_channels(server) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert joined_channels(server) == ["#mock"]
+    finally:
+        pool.disconnect()
+        server.stop()
+
+
+def test_pending_channels_join_once_and_part_cleanly() -> None:
+    """ A pending channel is queued once, and parting it cancels its JOIN """
+    server = FakeIRCServer().start()
+    pool = IRCClientPool("mock_bot", None, server.host, server.port, 1)
+    pool.join_channel("#mock0")
+    pool.join_channel("#Mock0")
+    pool.join_channel("#mock1")
+    pool.part_channel("#MOCK1")
+    assert pool.channels == ["#mock0"]
+    pool.connect()
+    try:
+        assert server.wait_for_clients()
+        deadline = time.monotonic() + 5
+        while not joined_channels(server) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+        assert joined_channels(server) == ["#mock0"]
+    finally:
+        pool.disconnect()
+        server.stop()
+
+
+def test_disconnect_before_connect() -> None:
+    """ A pool that never connected disconnects without error """
+    pool = IRCClientPool("mock_bot", None, "127.0.0.1", 6667, 1)
+    pool.disconnect()
+    assert not pool.connected
+
+
+def test_worker_that_cannot_connect_is_not_started() -> None:
+    """ A worker process whose connect fails counts as a failed connection """
+    server = FakeIRCServer()
+    pool = IRCClientPool("mock_bot", None, server.host, server.port, 1, True)
+    pool.connect()
+    try:
+        assert pool.connections() == {}
+    finally:
+        pool.disconnect()
+        server.stop()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for line buffer
+
+Author: Preocts <preocts@preocts.com>
+"""
+import socket
+
+from src.linebuffer import LineBuffer
+
+
+def test_partial_lines_across_feeds() -> None:
+    """ Lines are only returned once their CRLF arrives """
+    buffer = LineBuffer(read_size=8)
+    buffer.feed(b"PING :a\r\nPRIV")
+    assert list(buffer.lines()) == [b"PING :a"]
+    buffer.feed(b"MSG #mock :hi\r")
+    assert list(buffer.lines()) == []
+    buffer.feed(b"\n\r\n")
+    assert list(buffer.lines()) == [b"PRIVMSG #mock :hi", b""]
+    assert len(buffer) == 0
+
+
+def test_split_multibyte_character() -> None:
+    """ A UTF-8 character split between reads decodes once the line completes """
+    line = "PRIVMSG #mock :café \U0001F600\r\n".encode("UTF-8")
+    buffer = LineBuffer(read_size=4)
+    found = []
+    for idx in range(0, len(line), 3):
+        buffer.feed(line[idx : idx + 3])
+        found.extend(buffer.lines())
+    assert [ln.decode("UTF-8") for ln in found] == ["PRIVMSG #mock :café \U0001F600"]
+
+
+def test_grows_for_long_lines_and_drops_runaway() -> None:
+    """ Lines longer than the buffer grow it, lines past max_line are dropped whole """
+    buffer = LineBuffer(read_size=4, max_line=64)
+    buffer.feed(b"x" * 40 + b"\r\n")
+    assert list(buffer.lines()) == [b"x" * 40]
+    buffer.feed(b"y" * 100)
+    assert list(buffer.lines()) == []
+    assert len(buffer) == 0
+    buffer.feed(b"y" * 10 + b"\r")
+    assert list(buffer.lines()) == []
+    buffer.feed(b"\nPING :a\r\n")
+    assert list(buffer.lines()) == [b"PING :a"]
+
+
+def test_recv_into() -> None:
+    """ Reads straight from a socket """
+    left, right = socket.socketpair()
+    with left, right:
+        buffer = LineBuffer(read_size=16)
+        left.sendall(b"PING :tmi.twitch.tv\r\nPO")
+        total = 0
+        while total < 23:
+            total += buffer.recv_into(right)
+        assert list(buffer.lines()) == [b"PING :tmi.twitch.tv"]
+        left.close()
+        assert buffer.recv_into(right) == 0
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for channel membership index
+
+Author: Preocts <preocts@preocts.com>
+"""
+import random
+from typing import Set
+
+from src.membership import ARRAY_LIMIT
+from src.membership import MemberSet
+from src.membership import MembershipIndex
+from src.model.message import Message
+
+
+def feed(index: MembershipIndex, *lines: str) -> None:
+    """ Hand raw lines to the index """
+    for line in lines:
+        index(Message.from_string(line))
+
+
+def test_names_join_part_quit() -> None:
+    """ Membership follows NAMES, JOIN, PART and QUIT in both directions """
+    index = MembershipIndex("Bot")
+    feed(
+        index,
+        ":bot.tmi.twitch.tv 353 bot = #One :bot alice @Bob",
+        ":bot.tmi.twitch.tv 353 bot = #one :carol",
+        ":bot.tmi.twitch.tv 366 bot #one :End of /NAMES list",
+        ":alice!alice@alice JOIN #two",
+        ":dave!dave@dave JOIN #two,#three",
+    )
+    assert index.members("#ONE") == {"bot", "alice", "bob", "carol"}
+    assert index.channels_of("Alice") == {"#one", "#two"}
+    assert index.channels_of("dave") == {"#two", "#three"}
+    assert index.is_member("#two", "DAVE")
+    assert len(index) == 5
+
+    feed(index, ":alice!alice@alice PART #one", ":dave!dave@dave QUIT :bye")
+    assert index.channels_of("alice") == {"#two"}
+    assert index.channels_of("dave") == frozenset()
+    assert index.member_count("#two") == 1
+    assert index.member_count("#three") == 0
+
+    feed(index, ":bot!bot@bot PART #one")
+    assert index.channel_names() == {"#two"}
+    assert index.channels_of("bob") == frozenset()
+    assert len(index) == 1
+
+
+def test_member_set_switches_storage() -> None:
+    """ A MemberSet matches a plain set through array and bitmap forms """
+    rng = random.Random(23)
+    members = MemberSet()
+    expected: Set[int] = set()
+    for _ in range(30_000):
+        uid = rng.randrange(20_000)
+        if rng.random() < 0.7:
+            assert members.add(uid) == (uid not in expected)
+            expected.add(uid)
+        else:
+            assert members.discard(uid) == (uid in expected)
+            expected.discard(uid)
+        if len(expected) > ARRAY_LIMIT:
+            assert members.bits is not None
+    assert len(members) == len(expected)
+    assert list(members) == sorted(expected)
+    for uid in expected:
+        members.discard(uid)
+    assert members.bits is None
+    assert len(members) == 0
+
+
+def test_nick_ids_are_reused() -> None:
+    """ A nick in no channel gives back its id and string """
+    index = MembershipIndex()
+    index.add("#a", "alice")
+    index.remove("#a", "alice")
+    assert len(index) == 0
+    index.add("#a", "bob")
+    assert index.members("#a") == {"bob"}
+    assert index.channels_of("alice") == frozenset()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for runtime metrics
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import threading
+import urllib.request
+from typing import Any
+from typing import List
+
+from src.ircclient import IRCClient
+from src.ircchannel import IRCChannel
+from src.metrics import ClientMetrics
+from src.metrics import Histogram
+from src.metrics import PrometheusExporter
+from src.metrics import SnapshotExporter
+from src.metrics import prometheus_text
+from src.model.message import Message
+from src.writescheduler import WriteScheduler
+from tests.fakeserver import FakeIRCServer
+
+
+def test_histogram_buckets_and_text() -> None:
+    """ Observations land in their bucket and export cumulatively """
+    hist = Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 2.0):
+        hist.observe(value)
+    assert hist.buckets == [1, 2, 1]
+    assert hist.quantile(0.5) == 1.0
+    assert hist.quantile(1.0) == float("inf")
+
+    metrics = ClientMetrics()
+    metrics.bytes_read = 42
+    metrics.gauge("write_queue_depth", lambda: {"#mock": 3})
+    text = prometheus_text(metrics.snapshot())
+    assert "irc_bytes_read_total 42" in text
+    assert 'irc_parse_time_seconds_bucket{le="+Inf"} 0' in text
+    assert 'irc_write_queue_depth{channel="#mock"} 3' in text
+
+
+def test_scheduler_counts_drops() -> None:
+    """ Overflow drops are counted as throttle drops """
+    metrics = ClientMetrics()
+    scheduler = WriteScheduler(100, 30, metrics)
+    channel = IRCChannel("#mock", 1, 30, True, scheduler, max_queue=2)
+    for idx in range(5):
+        channel.send(Message.from_string(f"PRIVMSG #mock :{idx}"))
+    assert metrics.throttle_drops == 3
+
+
+def test_client_metrics_and_exporters() -> None:
+    """ A live client fills its metrics, both exporters publish them """
+    server = FakeIRCServer().start()
+    client = IRCClient("mock_bot", None, server.host, server.port)
+    snapshots: List[Any] = []
+    assert client.metrics is not None
+    client.connect()
+    server.wait_for_clients()
+    dispatcher = threading.Thread(target=client.dispatch, args=(lambda msg: None,))
+    dispatcher.start()
+    snapshot_exporter = SnapshotExporter(
+        client.metrics, lambda snap, rate: snapshots.append(rate), 0.05
+    ).start()
+    http_exporter = PrometheusExporter({"irc": client.metrics}).start()
+    try:
+        client.join_channel("#mock")
+        client.ping()
+        server.send_all(":mock!mock@mock PRIVMSG #mock :hello")
+        deadline = time.monotonic() + 5
+        while client.metrics.ping_rtt.count < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+
+        snap = client.metrics.snapshot()
+        assert snap["ping_rtt"]["count"] == 1
+        assert snap["lines_read"] >= 4
+        assert snap["lines_written"] >= 4
+        assert snap["bytes_written"] == sum(len(line) + 2 for line in server.lines())
+        assert snap["parse_time"]["count"] >= 1
+        assert snap["handler_latency"]["count"] >= 1
+        assert snap["read_queue_depth"] == 0
+        assert snap["write_queue_depth"] == {"SYSTEM": 0, "#mock": 0}
+        assert any(rate["lines_read"] > 0 for rate in snapshots)
+
+        url = f"http://127.0.0.1:{http_exporter.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode("UTF-8")
+        assert "irc_ping_rtt_seconds_count 1" in body
+    finally:
+        snapshot_exporter.stop()
+        http_exporter.stop()
+        client.disconnect()
+        dispatcher.join()
+        server.stop()
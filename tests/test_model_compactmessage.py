@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for model: compactmessage.py
+
+Author: Preocts <preocts@preocts.com>
+"""
+from src.model.compactmessage import CompactMessage
+from src.model.compactmessage import Interner
+from src.model.compactmessage import MessageBatch
+from src.model.message import Message
+
+LINES = [
+    "@badges=;color= :alice!alice@alice.tmi.twitch.tv PRIVMSG #Chan :hi :) there",
+    ":bob!bob@bob.tmi.twitch.tv PRIVMSG #chan :",
+    ":alice!alice@alice.tmi.twitch.tv JOIN #other",
+    "PING :tmi.twitch.tv",
+]
+
+
+def test_compact_matches_message() -> None:
+    """ Compact fields agree with the full parse and share interned strings """
+    interner = Interner()
+    for line in LINES:
+        message = Message.from_string(line)
+        compact = CompactMessage.from_string(line, interner)
+        assert compact.command == message.command
+        assert compact.channel == message.channel
+        assert compact.nick == message.nick
+        assert compact.trailing == message.trailing
+        assert compact.content == message.content
+        assert compact.to_message() == message
+    first = CompactMessage.from_string(LINES[0], interner)
+    second = CompactMessage.from_string(LINES[2], interner)
+    assert first.nick is second.nick
+
+
+def test_batch_columns() -> None:
+    """ Counting and selecting by column """
+    batch = MessageBatch()
+    batch.extend(LINES * 3)
+    assert len(batch) == 12
+    assert batch.count_by("command") == {"PRIVMSG": 6, "JOIN": 3, "PING": 3}
+    assert batch.count_by("nick") == {"alice": 6, "bob": 3}
+    assert batch.select(command="PRIVMSG", nick="alice") == [0, 4, 8]
+    assert batch.select(nick="carol") == []
+    assert [msg.content for msg in batch][:4] == [
+        "hi :) there",
+        "",
+        "",
+        "tmi.twitch.tv",
+    ]
+    assert batch[3].channel is None
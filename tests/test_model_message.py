@@ -23,7 +23,7 @@ def test_no_prefix_no_middle() -> None:
     message = Message.from_string(mock)
     assert message.prefix is None
     assert message.middle is None
-    assert message.trailing == (":tmi.twitch.tv", "callback")
+    assert message.trailing == "tmi.twitch.tv callback"
     assert message.content == "tmi.twitch.tv callback"
 
 
@@ -39,3 +39,72 @@ def test_bad_message() -> None:
     assert Message.from_string("break").command == "break"
     assert Message.from_string("")
     assert Message.from_string(": : : : : : : :  : : : : : :  ")
+
+
+def test_trailing_is_exact() -> None:
+    """ Trailing keeps runs of spaces and leading colons of the chat text """
+    mock = ":mock!mock@mock.tmi.twitch.tv PRIVMSG  #mock   :::)  spaced   out "
+    message = Message.from_string(mock)
+    assert message.command == "PRIVMSG"
+    assert message.middle == ("#mock",)
+    assert message.content == "::)  spaced   out "
+    assert Message.from_string("PRIVMSG #mock :").trailing == ""
+
+
+def test_from_bytes() -> None:
+    """ Bytes path matches string path and survives invalid UTF-8 """
+    mock = b":mock PRIVMSG #mock :caf\xc3\xa9 time"
+    assert Message.from_bytes(mock) == Message.from_string(mock.decode("UTF-8"))
+    assert Message.from_bytes(b"PRIVMSG #mock :\xc3").content == "\ufffd"
+
+
+def test_tagged_privmsg() -> None:
+    """ IRCv3 tag block is split off before prefix and command """
+    mock = (
+        "@badge-info=subscriber/8;badges=subscriber/6,premium/1;"
+        "emotes=25:0-4,12-16/1902:6-10;flags=;tmi-sent-ts=1600000000123;"
+        "system-msg=a\\sb\\:c\\\\d\\ne\\q :mock!mock@mock.tmi.twitch.tv "
+        "PRIVMSG #mock :Kappa Keepo Kappa"
+    )
+    message = Message.from_string(mock)
+    assert message.prefix == ":mock!mock@mock.tmi.twitch.tv"
+    assert message.command == "PRIVMSG"
+    assert message.params == "#mock"
+    assert message.content == "Kappa Keepo Kappa"
+    assert message.tags["system-msg"] == "a b;c\\d\neq"
+    assert message.tags["flags"] == ""
+    assert message.get_tag("flags") == ""
+    assert message.get_tag("system-msg") == "a b;c\\d\neq"
+    assert message.get_tag("info") is None
+    assert message.badges == {"subscriber": "6", "premium": "1"}
+    assert message.emotes == {"25": [(0, 4), (12, 16)], "1902": [(6, 10)]}
+    assert message.sent_ts == 1600000000123
+
+
+def test_untagged_accessors() -> None:
+    """ Messages without tags return empty accessors """
+    message = Message.from_string("PING :tmi.twitch.tv")
+    assert message.raw_tags is None
+    assert message.tags == {}
+    assert message.badges == {}
+    assert message.emotes == {}
+    assert message.sent_ts is None
+    assert Message.from_string("@a=b").raw_tags == "a=b"
+
+
+def test_channel() -> None:
+    """ Channel target is found for chat, membership and NAMES lines """
+    assert Message.from_string(":a!a@a PRIVMSG #Mock :hi").channel == "#Mock"
+    assert Message.from_string(":a!a@a JOIN #mock").channel == "#mock"
+    assert Message.from_string(":a!a@a JOIN :#mock").channel == "#mock"
+    assert Message.from_string(":tmi 353 bot = #mock :a b c").channel == "#mock"
+    assert Message.from_string(":tmi 366 bot #mock :End").channel == "#mock"
+    assert Message.from_string(":tmi 372 bot :#not a channel").channel is None
+    assert Message.from_string("PING :tmi.twitch.tv").channel is None
+
+
+def test_nick() -> None:
+    """ Nick comes from user prefixes only """
+    assert Message.from_string(":Mock!mock@mock.tmi PRIVMSG #m :hi").nick == "Mock"
+    assert Message.from_string(":tmi.twitch.tv 372 bot :motd").nick is None
+    assert Message.from_string("PING :tmi.twitch.tv").nick is None
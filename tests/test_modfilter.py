@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for the moderation filter
+
+Author: Preocts <preocts@preocts.com>
+"""
+import os
+import re
+import json
+import time
+import random
+from typing import List
+from typing import Tuple
+
+import pytest
+
+from src.model.message import Message
+from src.modfilter import ANY_CHANNEL
+from src.modfilter import ModerationFilter
+from src.modfilter import Rule
+from src.modfilter import RuleSet
+from src.modfilter import trie_pattern
+
+
+def chat(text: str, channel: str = "#mock", badges: str = "") -> Message:
+    """ A tagged PRIVMSG from mock """
+    return Message.from_string(
+        f"@badges={badges};id=abc-123 :mock!mock@mock PRIVMSG {channel} :{text}"
+    )
+
+
+def test_trie_pattern_matches_like_alternation() -> None:
+    """ The trie regex finds a phrase exactly where plain alternation does """
+    rng = random.Random(21)
+    phrases = [
+        "".join(rng.choice("abc.") for _ in range(rng.randint(2, 6))) for _ in range(20)
+    ]
+    phrases += ["abc", "ab", "abcd", "b.c"]
+    trie = re.compile(trie_pattern(phrases))
+    naive = re.compile("|".join(re.escape(phrase) for phrase in phrases))
+    for _ in range(500):
+        text = "".join(rng.choice("abcd.") for _ in range(12))
+        assert bool(trie.search(text)) == bool(naive.search(text)), text
+
+
+def test_rule_set_identifies_rule() -> None:
+    """ Phrases match case-insensitively, regex rules after them """
+    rules = RuleSet(
+        [
+            Rule("buy followers", "timeout"),
+            Rule(r"https?://\S+\.ru\b", "delete", regex=True),
+            Rule("spam"),
+        ]
+    )
+    assert rules.match("cheap BUY Followers here") == rules.rules[0]
+    assert rules.match("see http://x.ru now") == rules.rules[1]
+    assert rules.match("no SPAM please") == rules.rules[2]
+    assert rules.match("all clean") is None
+    assert RuleSet([]).match("anything") is None
+
+
+def test_regex_rules_keep_their_meaning_when_joined() -> None:
+    """ Inline flags, backreferences and lookaheads match as they do alone """
+    rules = RuleSet(
+        [
+            Rule(r"(?s)foo.bar", "delete", regex=True),
+            Rule(r"(b)\1", "delete", regex=True),
+            Rule(r"foo(?=bar)", "delete", regex=True),
+            Rule(r"(x|y)z", "delete", regex=True),
+        ]
+    )
+    assert rules.match("foo\nbar") == rules.rules[0]
+    assert rules.match("abba") == rules.rules[1]
+    assert rules.match("foobar") == rules.rules[2]
+    assert rules.match("yz") == rules.rules[3]
+    assert rules.match("ab foo") is None
+    with pytest.raises(ValueError):
+        RuleSet([Rule("(unclosed", regex=True)])
+    with pytest.raises(ValueError):
+        RuleSet([Rule("x", "ban")])
+
+
+def test_actions_and_channels() -> None:
+    """ Channel rules add to shared ones, actions go out through send """
+    sent: List[Tuple[str, str]] = []
+    mod_filter = ModerationFilter(
+        lambda channel, line: sent.append((channel, line)),
+        {
+            ANY_CHANNEL: [Rule("spam", "delete")],
+            "#Strict": [Rule("lol", "timeout", duration=30, reason="no fun")],
+        },
+    )
+    mod_filter(chat("lol spam"))
+    mod_filter(chat("lol", "#strict"))
+    mod_filter(chat("lol"))
+    mod_filter(chat("spam", badges="moderator/1"))
+    assert sent == [
+        ("#mock", "PRIVMSG #mock :/delete abc-123"),
+        ("#strict", "PRIVMSG #strict :/timeout mock 30 no fun"),
+    ]
+    assert mod_filter.matches == 2
+
+
+def test_hot_reload(tmp_path) -> None:
+    """ A changed rule file replaces the rules, a broken one is ignored """
+    path = str(tmp_path / "rules.json")
+    with open(path, "w", encoding="UTF-8") as rule_file:
+        json.dump({ANY_CHANNEL: [{"pattern": "old"}]}, rule_file)
+    mod_filter = ModerationFilter(print, path=path, reload_interval=0.01).start()
+    try:
+        assert mod_filter.rules_for("#mock").match("old") is not None
+        with open(path, "w", encoding="UTF-8") as rule_file:
+            json.dump({"#mock": [{"pattern": "new", "action": "log"}]}, rule_file)
+        os.utime(path, (0, 12345))
+        deadline = time.monotonic() + 5
+        while mod_filter.rules_for("#mock").match("new") is None:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert mod_filter.rules_for("#mock").match("old") is None
+
+        with open(path, "w", encoding="UTF-8") as rule_file:
+            rule_file.write("{not json")
+        os.utime(path, (0, 23456))
+        time.sleep(0.1)
+        assert mod_filter.rules_for("#mock").match("new") is not None
+    finally:
+        mod_filter.stop()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for the inbound read queue
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import threading
+from typing import List
+
+import pytest
+
+from src.ircclient import IRCClient
+from src.model.message import Message
+from src.readqueue import ReadQueue
+from tests.fakeserver import FakeIRCServer
+
+
+def chat(channel: str, idx: int) -> Message:
+    """ A PRIVMSG numbered idx """
+    return Message.from_string(f":mock!mock@mock PRIVMSG {channel} :{idx}")
+
+
+def contents(batch: List[Message]) -> List[str]:
+    """ Trailing text of each message """
+    return [message.content for message in batch]
+
+
+def test_overflow_policies() -> None:
+    """ Each policy keeps the expected chat, priority is never dropped """
+    oldest = ReadQueue(3, "drop-oldest")
+    newest = ReadQueue(3, "drop-newest")
+    for idx in range(5):
+        oldest.put(chat("#mock", idx))
+        newest.put(chat("#mock", idx))
+    oldest.put(Message.from_string("PING :tmi.twitch.tv"))
+    oldest.put(Message.from_string(":tmi.twitch.tv 001 bot :Welcome"))
+    assert contents(oldest.get_batch(10)) == [
+        "tmi.twitch.tv",
+        "Welcome",
+        "2",
+        "3",
+        "4",
+    ]
+    assert contents(newest.get_batch(10)) == ["0", "1", "2"]
+    assert oldest.drops == {"#mock": 2} and newest.dropped == 2
+
+    sample = ReadQueue(8, "sample", sample_every=2)
+    for idx in range(12):
+        sample.put(chat("#loud", idx))
+    sample.put(chat("#quiet", 0))
+    sample.put(chat("#quiet", 1))
+    kept = sample.get_batch(20)
+    assert [message.channel for message in kept].count("#quiet") == 1
+    assert sample.dropped == 14 - len(kept)
+    with pytest.raises(ValueError):
+        ReadQueue(3, "maybe")
+
+
+def test_block_waits_for_room() -> None:
+    """ A blocked put() resumes when dispatch takes a batch or on close() """
+    queue = ReadQueue(1, "block")
+    queue.put(chat("#mock", 0))
+    putter = threading.Thread(target=queue.put, args=(chat("#mock", 1),))
+    putter.start()
+    putter.join(0.1)
+    assert putter.is_alive()
+    assert contents(queue.get_batch(10)) == ["0"]
+    putter.join(1)
+    assert not putter.is_alive()
+    assert contents(queue.get_batch(10, 1)) == ["1"]
+
+
+@pytest.mark.parametrize("policy", ["drop-oldest", "drop-newest", "sample"])
+def test_slow_handlers_keep_link_alive(policy: str) -> None:
+    """ With handlers slower than the input, PINGs are answered and kept """
+    server = FakeIRCServer().start()
+    client = IRCClient("mock_bot", None, server.host, server.port, read_policy=policy)
+    seen: List[Message] = []
+
+    def slow_handler(message: Message) -> None:
+        """ About 2k messages a second at best """
+        seen.append(message)
+        time.sleep(0.0005)
+
+    client.connect()
+    server.wait_for_clients()
+    dispatcher = threading.Thread(target=client.dispatch, args=(slow_handler,))
+    dispatcher.start()
+    try:
+        flood = "".join(
+            f":mock!mock@mock PRIVMSG #mock{idx % 4} :chat {idx}\r\n"
+            for idx in range(2_000)
+        )
+        latencies = []
+        for burst in range(10):
+            server.send_raw(flood.encode())
+            tic = time.perf_counter()
+            server.send_all(f"PING :{burst}")
+            deadline = time.monotonic() + 5
+            while f"PONG :{burst}" not in server.lines():
+                assert time.monotonic() < deadline
+                time.sleep(0.001)
+            latencies.append(time.perf_counter() - tic)
+            server.send_all(f":tmi.twitch.tv NOTICE #mock0 :notice {burst}")
+    finally:
+        client.disconnect()
+        dispatcher.join()
+        server.stop()
+
+    assert max(latencies) < 1.0
+    notices = [msg.content for msg in seen if msg.command == "NOTICE"]
+    assert notices == [f"notice {burst}" for burst in range(10)]
+    assert [msg.content for msg in seen if msg.command == "PING"] == [
+        str(burst) for burst in range(10)
+    ]
+    drops = client.read_drops()
+    assert client.metrics is not None
+    assert sum(drops.values()) == client.metrics.read_drops > 0
+    handled = len([msg for msg in seen if msg.command == "PRIVMSG"])
+    assert handled + sum(drops.values()) == 20_000
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for traffic record and replay
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import threading
+from typing import List
+
+import pytest
+
+from src.ircclient import IRCClient
+from src.model.message import Message
+from src.recorder import ReplayServer
+from src.recorder import TrafficRecorder
+from src.recorder import read_recording
+from tests.fakeserver import FakeIRCServer
+
+
+def chat_lines(count: int) -> List[str]:
+    """ Numbered PRIVMSG lines """
+    return [f":mock!mock@mock PRIVMSG #mock :line {idx}" for idx in range(count)]
+
+
+def test_client_records_inbound_stream(tmp_path) -> None:
+    """ Every byte the client reads lands in the recording, in order """
+    path = str(tmp_path / "traffic.rec")
+    server = FakeIRCServer().start()
+    recorder = TrafficRecorder(path)
+    client = IRCClient(
+        "mock_bot", None, server.host, server.port, reconnect=False, recorder=recorder
+    )
+    client.connect()
+    server.wait_for_clients()
+    for line in chat_lines(50):
+        server.send_all(line)
+    time.sleep(0.2)
+    client.disconnect()
+    server.stop()
+    recorder.close()
+
+    appended = TrafficRecorder(path)
+    appended.record(b"PING :appended\r\n")
+    appended.close()
+    stream = b"".join(data for _, data in read_recording(path))
+    lines = stream.decode("UTF-8").split("\r\n")
+    assert [line for line in lines if "PRIVMSG" in line] == chat_lines(50)
+    assert any(line.startswith(":tmi.twitch.tv 001 ") for line in lines)
+    assert lines[-2:] == ["PING :appended", ""]
+
+
+@pytest.mark.parametrize("speed", [0, 1.0, 4.0])
+def test_replay_to_client(tmp_path, speed: float) -> None:
+    """ A replay reaches the client handlers in order at the requested speed """
+    path = str(tmp_path / "traffic.rec")
+    recorder = TrafficRecorder(path)
+    for idx, line in enumerate(chat_lines(200)):
+        recorder.record(f"{line}\r\n".encode("UTF-8"), 1_000.0 + idx * 0.001)
+    recorder.close()
+
+    replay = ReplayServer(path, speed).start()
+    client = IRCClient("mock_bot", None, replay.host, replay.port, reconnect=False)
+    received: List[Message] = []
+    tic = time.perf_counter()
+    client.connect()
+    dispatcher = threading.Thread(target=client.dispatch, args=(received.append,))
+    dispatcher.start()
+    assert replay.done.wait(10)
+    elapsed = time.perf_counter() - tic
+    dispatcher.join(10)
+    client.disconnect()
+    replay.stop()
+
+    assert [msg.content for msg in received] == [f"line {i}" for i in range(200)]
+    if speed:
+        assert 0.199 / speed <= elapsed < 0.199 / speed + 0.5
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Unit tests for write scheduler
+
+Author: Preocts <preocts@preocts.com>
+"""
+import time
+import threading
+
+import pytest
+
+from src.ircchannel import IRCChannel
+from src.model.message import Message
+from src.writescheduler import WriteScheduler
+
+
+def make_channel(scheduler: WriteScheduler, name: str, **kwargs) -> IRCChannel:
+    """ Joined channel allowing 2 messages a second """
+    return IRCChannel(name, 2, 1, True, scheduler, **kwargs)
+
+
+def test_paces_instead_of_dropping() -> None:
+    """ Messages past the throttle wait for budget rather than being dropped """
+    scheduler = WriteScheduler(100, 1)
+    channel = make_channel(scheduler, "#mock")
+    for idx in range(4):
+        channel.send(Message.from_string(f"PRIVMSG #mock :{idx}"))
+
+    tic = time.monotonic()
+    released = [scheduler.next_message() for _ in range(4)]
+    elapsed = time.monotonic() - tic
+    assert [msg.content for msg in released if msg] == ["0", "1", "2", "3"]
+    assert 0.9 < elapsed < 1.5
+
+
+def test_global_budget() -> None:
+    """ The global budget caps sends across channels """
+    scheduler = WriteScheduler(3, 1)
+    channels = [make_channel(scheduler, f"#mock{idx}") for idx in range(3)]
+    for channel in channels:
+        channel.send(Message.from_string(f"PRIVMSG {channel.name} :a"))
+        channel.send(Message.from_string(f"PRIVMSG {channel.name} :b"))
+
+    first = [scheduler.next_message() for _ in range(3)]
+    assert [msg.params for msg in first if msg] == ["#mock0", "#mock1", "#mock2"]
+    tic = time.monotonic()
+    assert scheduler.next_message()
+    assert time.monotonic() - tic > 0.9
+
+
+@pytest.mark.parametrize(
+    "overflow, sent, expected",
+    [
+        ("drop-oldest", "abc", ["b", "c"]),
+        ("drop-newest", "abc", ["a", "b"]),
+        ("coalesce", "aab", ["a", "b"]),
+        ("coalesce", "aabc", ["b", "c"]),
+    ],
+)
+def test_overflow_policies(overflow: str, sent: str, expected) -> None:
+    """ Full queues follow the channel's overflow policy """
+    scheduler = WriteScheduler(100, 1)
+    channel = make_channel(scheduler, "#mock", max_queue=2, overflow=overflow)
+    for text in sent:
+        channel.send(Message.from_string(f"PRIVMSG #mock :{text}"))
+    released = [scheduler.next_message() for _ in range(2)]
+    assert [msg.content for msg in released if msg] == expected
+
+
+def test_close_wakes_writer() -> None:
+    """ close() returns None to a blocked writer immediately """
+    scheduler = WriteScheduler(100, 1)
+    results = []
+    writer = threading.Thread(target=lambda: results.append(scheduler.next_message()))
+    writer.start()
+    scheduler.close()
+    writer.join(timeout=1)
+    assert results == [None]
+
+
+def test_unknown_policy() -> None:
+    """ Overflow policy is validated """
+    with pytest.raises(ValueError):
+        make_channel(WriteScheduler(100, 1), "#mock", overflow="nope")
+
+
+def test_next_batch_gathers_everything_due() -> None:
+    """ One batch holds every message the budgets allow right now """
+    scheduler = WriteScheduler(100, 1)
+    channels = [make_channel(scheduler, f"#mock{idx}") for idx in range(3)]
+    for channel in channels:
+        for text in "abc":
+            channel.send(Message.from_string(f"PRIVMSG {channel.name} :{text}"))
+
+    batch = scheduler.next_batch(10_000)
+    assert [msg.message[8:] for msg in batch] == [
+        "#mock0 :a",
+        "#mock1 :a",
+        "#mock2 :a",
+        "#mock0 :b",
+        "#mock1 :b",
+        "#mock2 :b",
+    ]
+    assert len(scheduler.next_batch(10_000)) == 3
+
+
+def test_hold_parks_budgeted_channels() -> None:
+    """ While held only channels outside the global budget are released """
+    scheduler = WriteScheduler(100, 1)
+    chat = make_channel(scheduler, "#mock")
+    system = make_channel(scheduler, "SYSTEM", global_budget=False)
+    scheduler.hold(True)
+    chat.send(Message.from_string("PRIVMSG #mock :held"))
+    system.send(Message.from_string("NICK mock"))
+
+    assert [msg.message for msg in scheduler.next_batch(10_000)] == ["NICK mock"]
+    threading.Timer(0.1, scheduler.hold, (False,)).start()
+    tic = time.monotonic()
+    assert [msg.content for msg in scheduler.next_batch(10_000)] == ["held"]
+    assert time.monotonic() - tic >= 0.09
+
+
+def test_priority_messages_leave_one_at_a_time() -> None:
+    """ next_message() takes one priority message and leaves the rest queued """
+    scheduler = WriteScheduler(100, 1)
+    channel = make_channel(scheduler, "#mock")
+    channel.send(Message.from_string("PRIVMSG #mock :chat"))
+    for idx in range(3):
+        scheduler.submit_priority(Message.from_string(f"PONG :{idx}"))
+
+    released = [scheduler.next_message() for _ in range(4)]
+    assert [msg.message for msg in released if msg] == [
+        "PONG :0",
+        "PONG :1",
+        "PONG :2",
+        "PRIVMSG #mock :chat",
+    ]
+    for idx in range(3):
+        scheduler.submit_priority(Message.from_string(f"PONG :{idx}"))
+    assert len(scheduler.next_batch(len("PONG :0") + 3)) == 2
+    assert len(scheduler.next_batch(10_000)) == 1
+
+
+def test_new_generation_wakes_writer() -> None:
+    """ A writer waiting on an older generation gets an empty batch """
+    scheduler = WriteScheduler(100, 1)
+    generation = scheduler.generation
+    results = []
+    writer = threading.Thread(
+        target=lambda: results.append(scheduler.next_batch(100, generation))
+    )
+    writer.start()
+    scheduler.new_generation()
+    writer.join(timeout=1)
+    assert results == [[]]
+    scheduler.submit_priority(Message.from_string("PASS oauth:mock"))
+    assert scheduler.next_batch(100, generation) == []
+    assert len(scheduler.next_batch(100, scheduler.generation)) == 1